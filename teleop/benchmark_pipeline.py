@@ -0,0 +1,276 @@
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import Array
+import numpy as np
+import logging_mp
+logging_mp.basic_config(level=logging_mp.WARNING)
+logger_mp = logging_mp.get_logger(__name__)
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+from teleop.utils.shm_channel import ShmChannel
+
+"""
+End-to-end benchmark of the teleop pipeline against synthetic XR input and the DDS loopback robot (utils/loopback_robot.py),
+one process per robot type (the DDS ChannelFactory of a process is bound to one domain, and the hg / go LowCmd_ types
+cannot share the rt/lowcmd topic in one process):
+
+    xr_read         copy of the wrist poses (shared array) and hand keypoints (shared memory channels) written by the XR source
+    hand_retarget   left and right hand retargeting (dex3, inspire1, brainco)
+    ik              ArmIK.solve_ik, without its smoothing filter
+    filter          the smoothing filter of ArmIK.solve_ik (arm_ik.smooth_filter.add_data), timed inside solve_ik
+    lowcmd_encode   LowCmdEncoder.update (arm motor targets and crc)
+    publish         ChannelPublisher.Write of the lowcmd
+    dds_delivery    publish to arrival at the loopback robot's subscriber
+    record_enqueue  EpisodeWriter.add_item
+    pipeline        sum of the stages above, except dds_delivery
+
+Run from teleop/ (asset paths are relative), e.g.
+    python benchmark_pipeline.py --arm G1_29 H1 --ee dex3 --iterations 2000 --output bench.json
+    python benchmark_pipeline.py --arm G1_29 --ee dex3 --baseline bench.json   # exit code 1 on a p99 regression
+"""
+
+STAGES = ("xr_read", "hand_retarget", "ik", "filter", "lowcmd_encode", "publish", "dds_delivery", "record_enqueue")
+HAND_TYPES = {"dex3": "UNITREE_DEX3", "inspire1": "INSPIRE_HAND", "brainco": "BRAINCO_HAND"}
+
+
+def stage_summary(durations_ns):
+    """Return the count, throughput and latency percentiles (us) of one stage."""
+    durations_us = np.asarray(durations_ns, dtype=np.float64) * 1e-3
+    p50, p90, p99, p999 = np.percentile(durations_us, [50, 90, 99, 99.9])
+    mean = float(np.mean(durations_us))
+    return {"count": len(durations_us), "throughput_hz": 1e6 / max(mean, 1e-9), "mean_us": mean,
+            "p50_us": float(p50), "p90_us": float(p90), "p99_us": float(p99), "p999_us": float(p999),
+            "max_us": float(np.max(durations_us))}
+
+
+class TimedFilter:
+    """Stands in for the smoothing filter of an ArmIK and times its add_data, to split the filter out of solve_ik."""
+    def __init__(self, smooth_filter):
+        self.smooth_filter = smooth_filter
+        self.duration_ns = 0
+
+    def add_data(self, new_data):
+        start = time.perf_counter_ns()
+        self.smooth_filter.add_data(new_data)
+        self.duration_ns = time.perf_counter_ns() - start
+
+    @property
+    def filtered_data(self):
+        return self.smooth_filter.filtered_data
+
+
+class SyntheticXR:
+    """Smooth wrist and finger motion written into shared memory, like the XR tracking process and the main loop do."""
+    def __init__(self, seed = 0):
+        self.wrist_array = Array('d', 32, lock = True)       # left, right 4x4 wrist poses
+        self.left_hand_channel = ShmChannel((25, 3))         # left, right 25x3 hand keypoints
+        self.right_hand_channel = ShmChannel((25, 3))
+        rng = np.random.default_rng(seed)
+        self._phase = rng.uniform(0, 2 * np.pi, 6)
+        # rest pose of the 25 keypoints: wrist, then 4 thumb and 4 x 5 finger joints
+        directions = np.deg2rad([-40, -10, 0, 10, 20])
+        self._finger_directions = np.stack([np.cos(directions), np.sin(directions)], axis=1)
+
+    def _hand(self, t, side):
+        curl = 0.5 + 0.5 * np.sin(2.0 * t + self._phase[side])
+        keypoints = [np.zeros(3)]
+        for finger, direction in enumerate(self._finger_directions):
+            point = np.zeros(3)
+            for joint in range(4 if finger == 0 else 5):
+                angle = curl * 0.4 * joint
+                step = 0.025 * np.array([direction[0] * np.cos(angle), direction[1] * np.cos(angle), -np.sin(angle)])
+                point = point + step
+                keypoints.append(point)
+        return np.array(keypoints[:25])
+
+    def write(self, t):
+        poses = []
+        for side, y in ((0, 0.25), (1, -0.25)):
+            pose = np.eye(4)
+            angle = 0.3 * np.sin(1.3 * t + self._phase[2 + side])
+            pose[:3, :3] = [[np.cos(angle), 0, np.sin(angle)], [0, 1, 0], [-np.sin(angle), 0, np.cos(angle)]]
+            pose[:3, 3] = [0.25 + 0.05 * np.sin(t + self._phase[4 + side]), y + 0.05 * np.cos(0.7 * t), 0.1 + 0.05 * np.sin(0.9 * t)]
+            poses.append(pose)
+        with self.wrist_array.get_lock():
+            self.wrist_array[:] = np.concatenate([pose.flatten() for pose in poses])
+        self.left_hand_channel.write(self._hand(t, 0))
+        self.right_hand_channel.write(self._hand(t, 1))
+
+    def read(self):
+        with self.wrist_array.get_lock():
+            wrists = np.array(self.wrist_array[:]).reshape(2, 4, 4)
+        left_hand, _, _ = self.left_hand_channel.read()
+        right_hand, _, _ = self.right_hand_channel.read()
+        return wrists[0], wrists[1], left_hand, right_hand
+
+    def close(self):
+        self.left_hand_channel.close()
+        self.right_hand_channel.close()
+
+
+def run_benchmark(arm, ee, iterations, warmup, frequency, ik_kwargs, domain):
+    """Run the pipeline iterations + warmup times for one robot type, return the per stage summaries."""
+    from unitree_sdk2py.core.channel import ChannelPublisher, ChannelFactoryInitialize
+    from unitree_sdk2py.idl.unitree_hg.msg.dds_ import LowCmd_ as hg_LowCmd
+    from unitree_sdk2py.idl.unitree_go.msg.dds_ import LowCmd_ as go_LowCmd
+    from unitree_sdk2py.idl.default import unitree_hg_msg_dds__LowCmd_, unitree_go_msg_dds__LowCmd_
+    from teleop.robot_control.robot_arm import (G1_29_JointArmIndex, G1_23_JointArmIndex, H1_2_JointArmIndex, H1_JointArmIndex)
+    from teleop.robot_control.robot_arm_ik import G1_29_ArmIK, G1_23_ArmIK, H1_2_ArmIK, H1_ArmIK
+    from teleop.robot_control.lowcmd_encoder import LowCmdEncoder
+    from teleop.utils.loopback_robot import create_devices
+    from teleop.utils.episode_writer import EpisodeWriter
+
+    arm_ik_classes = {"G1_29": G1_29_ArmIK, "G1_23": G1_23_ArmIK, "H1_2": H1_2_ArmIK, "H1": H1_ArmIK}
+    arm_indices = {"G1_29": G1_29_JointArmIndex, "G1_23": G1_23_JointArmIndex, "H1_2": H1_2_JointArmIndex, "H1": H1_JointArmIndex}
+
+    ChannelFactoryInitialize(domain)
+    loopback = create_devices(arm, None, record_size = iterations + warmup)[0]
+    loopback.start()
+    if arm == "H1":
+        msg, lowcmd_type = unitree_go_msg_dds__LowCmd_(), go_LowCmd
+    else:
+        msg, lowcmd_type = unitree_hg_msg_dds__LowCmd_(), hg_LowCmd
+    publisher = ChannelPublisher("rt/lowcmd", lowcmd_type)
+    publisher.Init()
+    encoder = LowCmdEncoder(msg, [id.value for id in arm_indices[arm]])
+
+    arm_ik = arm_ik_classes[arm](**ik_kwargs)
+    ik_filter = TimedFilter(arm_ik.smooth_filter)
+    arm_ik.smooth_filter = ik_filter
+    hand_retargeting = None
+    if ee in HAND_TYPES:
+        from teleop.robot_control.hand_retargeting import get_hand_retargeting, HandType
+        hand_retargeting = get_hand_retargeting(HandType[HAND_TYPES[ee]])
+
+    record_dir = tempfile.mkdtemp(prefix="benchmark-episodes-")
+    recorder = EpisodeWriter(task_dir = record_dir, frequency = frequency or 30.0, rerun_log = False)
+    recorder.create_episode()
+    colors = {"color_0": np.zeros((480, 640, 3), dtype=np.uint8)}
+
+    xr = SyntheticXR()
+    durations = {stage: np.zeros(iterations + warmup, dtype=np.int64) for stage in STAGES}
+    publish_times = np.zeros(iterations + warmup, dtype=np.float64)
+    sol_q = np.zeros(arm_ik.reduced_robot.model.nq)
+    period = 1.0 / frequency if frequency else 0.0
+    for i in range(iterations + warmup):
+        start_time = time.monotonic()
+        xr.write(i / 30.0)
+
+        t0 = time.perf_counter_ns()
+        left_wrist, right_wrist, left_hand, right_hand = xr.read()
+        t1 = time.perf_counter_ns()
+        if hand_retargeting is not None:
+            ref_left = left_hand[hand_retargeting.left_indices[1, :]] - left_hand[hand_retargeting.left_indices[0, :]]
+            ref_right = right_hand[hand_retargeting.right_indices[1, :]] - right_hand[hand_retargeting.right_indices[0, :]]
+            left_q = hand_retargeting.left_retargeting.retarget(ref_left)[hand_retargeting.left_dex_retargeting_to_hardware]
+            right_q = hand_retargeting.right_retargeting.retarget(ref_right)[hand_retargeting.right_dex_retargeting_to_hardware]
+        t2 = time.perf_counter_ns()
+        ik_filter.duration_ns = 0
+        sol_q, sol_tauff = arm_ik.solve_ik(left_wrist, right_wrist, sol_q)
+        t4 = time.perf_counter_ns()
+        t3 = t4 - ik_filter.duration_ns
+        encoder.update(sol_q, sol_tauff)
+        t5 = time.perf_counter_ns()
+        publish_times[i] = time.monotonic()
+        publisher.Write(msg)
+        t6 = time.perf_counter_ns()
+        recorder.add_item(colors = colors, states = {"left_arm": {"qpos": sol_q[:len(sol_q) // 2].tolist()}},
+                          actions = {"left_arm": {"qpos": sol_q[:len(sol_q) // 2].tolist()}})
+        t7 = time.perf_counter_ns()
+
+        for stage, duration in zip(("xr_read", "hand_retarget", "ik", "filter", "lowcmd_encode", "publish", "record_enqueue"),
+                                   (t1 - t0, t2 - t1, t3 - t2, t4 - t3, t5 - t4, t6 - t5, t7 - t6)):
+            durations[stage][i] = duration
+        if period:
+            time.sleep(max(0.0, period - (time.monotonic() - start_time)))
+
+    time.sleep(0.1)
+    loopback.stop()
+    arrival_times, _ = loopback.records()
+    recorder.close()
+    xr.close()
+
+    results = {}
+    for stage in STAGES:
+        if stage == "hand_retarget" and hand_retargeting is None:
+            continue
+        if stage == "dds_delivery":
+            if len(arrival_times) != iterations + warmup:
+                logger_mp.warning(f"[Benchmark] {len(arrival_times)} of {iterations + warmup} lowcmds arrived, dds_delivery skipped")
+                continue
+            stage_durations = (arrival_times - publish_times) * 1e9
+        else:
+            stage_durations = durations[stage]
+        results[stage] = stage_summary(stage_durations[warmup:])
+    pipeline = sum(durations[stage] for stage in STAGES if stage != "dds_delivery")
+    results["pipeline"] = stage_summary(pipeline[warmup:])
+    return results
+
+
+def compare(report, baseline, tolerance):
+    """Return the (arm, stage, p99, baseline p99) of the stages whose p99 latency grew by more than tolerance."""
+    regressions = []
+    baseline_runs = {run["arm"]: run for run in baseline["runs"]}
+    for run in report["runs"]:
+        if run["arm"] not in baseline_runs:
+            continue
+        for stage, summary in run["stages"].items():
+            reference = baseline_runs[run["arm"]]["stages"].get(stage)
+            if reference is not None and summary["p99_us"] > reference["p99_us"] * (1.0 + tolerance):
+                regressions.append((run["arm"], stage, summary["p99_us"], reference["p99_us"]))
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark the per stage latency of the teleop pipeline.")
+    parser.add_argument('--arm', type=str, nargs='+', choices=['G1_29', 'G1_23', 'H1_2', 'H1'], default=['G1_29'], help='Robot types to benchmark')
+    parser.add_argument('--ee', type=str, choices=['dex1', 'dex3', 'inspire1', 'brainco'], default=None, help='End effector (hand retargeting stage)')
+    parser.add_argument('--iterations', type=int, default=1000, help='Measured pipeline iterations per robot type')
+    parser.add_argument('--warmup', type=int, default=50, help='Iterations run before measuring')
+    parser.add_argument('--frequency', type=float, default=0.0, help='Pipeline rate (Hz), 0 to run back to back (throughput)')
+    parser.add_argument('--ik-solver', type=str, choices=['opti', 'nlpsol'], default='opti', help='Arm IK solver backend')
+    parser.add_argument('--ik-dls', action='store_true', help='Enable the damped least squares IK fast path')
+    parser.add_argument('--domain', type=int, default=1, help='DDS domain of the benchmark and its loopback robot')
+    parser.add_argument('--output', type=str, default=None, help='Write the JSON report to this file instead of stdout')
+    parser.add_argument('--baseline', type=str, default=None, help='JSON report to compare with, exit code 1 on regressions')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed relative p99 increase over the baseline')
+    args = parser.parse_args()
+
+    ik_kwargs = dict(solver_backend=args.ik_solver, dls_fast_path=args.ik_dls)
+    report = {
+        "ee": args.ee,
+        "iterations": args.iterations,
+        "frequency": args.frequency,
+        "ik": ik_kwargs,
+        "host": {"platform": platform.platform(), "python": platform.python_version(), "cpu_count": os.cpu_count()},
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "runs": [],
+    }
+    for arm in args.arm:
+        # a fresh process per robot type
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+            stages = pool.submit(run_benchmark, arm, args.ee, args.iterations, args.warmup, args.frequency, ik_kwargs, args.domain).result()
+        report["runs"].append({"arm": arm, "stages": stages})
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    else:
+        print(text)
+
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for arm, stage, p99, reference in regressions:
+            logger_mp.warning(f"[Benchmark] {arm} {stage}: p99 {p99:.1f}us > baseline {reference:.1f}us")
+        sys.exit(1 if regressions else 0)
@@ -1,11 +1,11 @@
 # dex_dds_helper.py
 import numpy as np
-from robot_control.hand_retargeting import HandRetargeting, HandType  # 这行名字你对一下
-# 上面这个类名你在 dex_server.py 里已经有了，就照那个 import 路径来:contentReference[oaicite:2]{index=2}
+# 与手部控制器同一个模块路径 (teleop.robot_control)，才能共用进程内的 HandRetargeting 缓存
+from teleop.robot_control.hand_retargeting import get_hand_retargeting, HandType
 
 class DexDDSTeleopHelper:
     def __init__(self):
-        self.retarget = HandRetargeting(HandType.UNITREE_DEX3)
+        self._retarget = None   # 第一次用到时才构建 (或取缓存里已有的)
         self.last_q = np.zeros(14, dtype=np.float64)   # 左7右7
         # self.temp_limit_factor = np.ones(14, dtype=np.float64)
 
@@ -37,6 +37,12 @@ class DexDDSTeleopHelper:
 
         return q14
 
+    @property
+    def retarget(self):
+        if self._retarget is None:
+            self._retarget = get_hand_retargeting(HandType.UNITREE_DEX3)
+        return self._retarget
+
     def update_temp(self, right_temp_list):
         """
         可选：如果你从 rt/dex3/right/state 拿到了温度，就在这里限制
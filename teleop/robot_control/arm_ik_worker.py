@@ -0,0 +1,171 @@
+import numpy as np
+import time
+from multiprocessing import Process, Array, Event
+import os
+import sys
+import logging_mp
+logger_mp = logging_mp.get_logger(__name__)
+parent2_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(parent2_dir)
+
+from teleop.robot_control.robot_arm_ik import ArmIK
+from teleop.utils.ik_telemetry import IKTelemetry
+from teleop.utils.realtime_loop import RealtimeLoop
+
+# request layout: [seq, timestamp, left_wrist(16), right_wrist(16), current_q(nq), current_dq(nq)]
+# result layout:  [seq, request timestamp, solution timestamp, dropped requests, sol_q(nq), sol_tauff(nv),
+#                  solve_time, iterations, translation_residual, rotation_residual, path, dls_fallback]
+_HEADER_SIZE = 2
+_RESULT_HEADER_SIZE = 4
+_STATS_SIZE = 6
+
+class ArmIKWorker:
+    """
+    Runs ArmIK.solve_ik in a separate process, so that the main loop never blocks on the optimizer.
+
+    submit() overwrites the single request slot in shared memory and wakes the worker, which always solves the newest
+    request: requests that arrive while it is busy are dropped. The latest solution is published with the sequence
+    number and timestamp of the request it answers, get_solution() reads it without waiting.
+    The worker builds its own solver from the spec and options of arm_ik (loaded from the IK cache).
+
+    Requests submitted by the caller's loop are solved at that loop's rate. start_feed() decouples the IK rate from it:
+    a loop thread then submits the newest wrist poses and motor state at its own rate and hands every new solution on.
+    """
+    def __init__(self, arm_ik):
+        """
+        arm_ik: ArmIK instance whose spec and solver options are used in the worker process.
+                Solves published by the worker are recorded into its telemetry, if enabled.
+        """
+        self.nq = arm_ik.reduced_robot.model.nq
+        self.nv = arm_ik.reduced_robot.model.nv
+        self.telemetry = arm_ik.telemetry
+
+        self._q_offset = _HEADER_SIZE + 32
+        self._sol_offset = _RESULT_HEADER_SIZE
+        self._stats_offset = _RESULT_HEADER_SIZE + self.nq + self.nv
+        self.request_array = Array('d', self._q_offset + 2 * self.nq, lock = True)
+        self.result_array = Array('d', self._stats_offset + _STATS_SIZE, lock = True)
+        self.request_event = Event()
+        self.stop_event = Event()
+        self.ready_event = Event()
+
+        self.request_seq = 0
+        self.last_result_seq = 0
+        self.dropped_requests = 0
+        self.sol_q = None
+        self.sol_tauff = None
+        self.sol_timestamp = 0.0
+        self.feed_loop = None
+
+        self.ik_process = Process(target = self._ik_process, args = (arm_ik.spec, arm_ik.Unit_Test, arm_ik.build_kwargs))
+        self.ik_process.daemon = True
+        self.ik_process.start()
+        if not self.ready_event.wait(timeout = 60.0):
+            logger_mp.warning("[ArmIKWorker] IK worker process is not ready after 60s")
+        logger_mp.info("[ArmIKWorker] Initialize ArmIKWorker OK!\n")
+
+    def submit(self, left_wrist, right_wrist, current_lr_arm_motor_q = None, current_lr_arm_motor_dq = None):
+        """Publish a new IK request (same arguments as solve_ik) and return its sequence number."""
+        self.request_seq += 1
+        with self.request_array.get_lock():
+            request = np.frombuffer(self.request_array.get_obj(), dtype=np.float64)
+            request[0] = self.request_seq
+            request[1] = time.time()
+            request[2:18] = np.asarray(left_wrist).reshape(16)
+            request[18:34] = np.asarray(right_wrist).reshape(16)
+            q = request[self._q_offset:self._q_offset + self.nq]
+            dq = request[self._q_offset + self.nq:]
+            q[:] = current_lr_arm_motor_q if current_lr_arm_motor_q is not None else np.nan
+            dq[:] = current_lr_arm_motor_dq if current_lr_arm_motor_dq is not None else np.nan
+        self.request_event.set()
+        return self.request_seq
+
+    def get_solution(self):
+        """
+        return: sol_q, sol_tauff, seq, timestamp of the newest solution (sol_q and sol_tauff are None before the first one).
+                seq and timestamp are those of the answered request, so seq < submitted seq means the solution lags behind.
+        """
+        with self.result_array.get_lock():
+            seq = int(self.result_array[0])
+            if seq != self.last_result_seq:
+                result = np.frombuffer(self.result_array.get_obj(), dtype=np.float64).copy()
+        if seq != self.last_result_seq:
+            self.last_result_seq = seq
+            self.sol_timestamp = result[1]
+            self.dropped_requests = int(result[3])
+            self.sol_q = result[self._sol_offset:self._sol_offset + self.nq]
+            self.sol_tauff = result[self._sol_offset + self.nq:self._stats_offset]
+            if self.telemetry is not None:
+                stats = result[self._stats_offset:]
+                self.telemetry.record(stats[0], stats[1], stats[2], stats[3], IKTelemetry.PATHS[int(stats[4])], bool(stats[5]))
+        return self.sol_q, self.sol_tauff, self.last_result_seq, self.sol_timestamp
+
+    def start_feed(self, get_request, on_solution, rate):
+        """
+        Solve at rate (Hz) independently of the caller's loop: a RealtimeLoop thread submits get_request() every 1/rate
+        seconds and passes each new solution to on_solution(sol_q, sol_tauff, seq, timestamp). The worker solves the
+        newest request whenever it is free, so IK runs as fast as the solver allows, up to rate.
+
+        get_request: returns the solve_ik arguments (left_wrist, right_wrist, current_lr_arm_motor_q, current_lr_arm_motor_dq).
+        on_solution: called in the loop thread, e.g. to send the solution to the arm controller.
+        The loop is then the only caller of submit() and get_solution(), other threads read sol_q / sol_tauff.
+        """
+        self._get_request = get_request
+        self._on_solution = on_solution
+        self.feed_loop = RealtimeLoop(1.0 / rate, self._feed_step, name = "ArmIKFeed")
+        self.feed_loop.start()
+
+    def _feed_step(self):
+        self.submit(*self._get_request())
+        last_result_seq = self.last_result_seq
+        sol_q, sol_tauff, seq, timestamp = self.get_solution()
+        if seq != last_result_seq:
+            self._on_solution(sol_q, sol_tauff, seq, timestamp)
+
+    def stop(self):
+        if self.feed_loop is not None:
+            self.feed_loop.stop()
+        self.stop_event.set()
+        self.request_event.set()
+        self.ik_process.join(timeout = 1.0)
+        if self.ik_process.is_alive():
+            self.ik_process.terminate()
+
+    def _ik_process(self, spec, Unit_Test, build_kwargs):
+        arm_ik = ArmIK(spec, Unit_Test, False, **build_kwargs)
+        self.ready_event.set()
+        last_seq = 0
+        dropped = 0
+        while not self.stop_event.is_set():
+            if not self.request_event.wait(timeout = 0.1):
+                continue
+            self.request_event.clear()
+            with self.request_array.get_lock():
+                request = np.frombuffer(self.request_array.get_obj(), dtype=np.float64).copy()
+            seq = int(request[0])
+            if seq == last_seq:
+                continue
+            dropped += seq - last_seq - 1
+            last_seq = seq
+
+            q = request[self._q_offset:self._q_offset + self.nq]
+            dq = request[self._q_offset + self.nq:]
+            sol_q, sol_tauff = arm_ik.solve_ik(request[2:18].reshape(4, 4), request[18:34].reshape(4, 4),
+                                               None if np.isnan(q[0]) else q, None if np.isnan(dq[0]) else dq)
+            if sol_q is None: # solve_ik returns the given motor q when ipopt fails
+                sol_q = arm_ik.init_data
+
+            stats = np.zeros(_STATS_SIZE)
+            if arm_ik.telemetry is not None and arm_ik.telemetry.last is not None:
+                solve_time, iterations, translation_residual, rotation_residual, path = arm_ik.telemetry.last
+                stats[:] = (solve_time, iterations, translation_residual, rotation_residual, IKTelemetry.PATHS.index(path),
+                            arm_ik.dls_solver is not None and arm_ik.last_solve_path == "ipopt")
+            with self.result_array.get_lock():
+                result = np.frombuffer(self.result_array.get_obj(), dtype=np.float64)
+                result[1] = request[1]
+                result[2] = time.time()
+                result[3] = dropped
+                result[self._sol_offset:self._sol_offset + self.nq] = sol_q
+                result[self._sol_offset + self.nq:self._stats_offset] = sol_tauff
+                result[self._stats_offset:] = stats
+                result[0] = seq
@@ -0,0 +1,94 @@
+import numpy as np
+
+"""
+Hot loop helpers of the hand controllers whose commands are normalized positions (Inspire, Brainco):
+
+- JointRangeNormalizer maps the retargeted joint angles (rad) of a hand to its [0, 1] command range, all joints at once.
+- MotorCmdPacker writes joint targets into the q of the motor commands of a message, through the command objects
+  looked up once at construction instead of enumerating the joint index enum on every call.
+
+    python robot_control/hand_command.py    # microbenchmark against the per-joint loops they replace
+"""
+
+
+class JointRangeNormalizer:
+    def __init__(self, lower, upper, open_value = 1.0):
+        """
+        lower, upper: joint range (rad) of each motor, lower is the open hand.
+        open_value: normalized command of an open joint, 1.0 (inspire: 1.0 open, 0.0 closed) or 0.0 (brainco).
+        """
+        lower = np.asarray(lower, dtype=np.float64)
+        upper = np.asarray(upper, dtype=np.float64)
+        if open_value == 1.0:
+            self._origin = upper
+            self._scale = -1.0 / (upper - lower)
+        else:
+            self._origin = lower
+            self._scale = 1.0 / (upper - lower)
+
+    def __call__(self, q, out = None):
+        """Return q (rad) normalized and clipped to [0, 1], written into out if given (may be q itself)."""
+        out = np.subtract(q, self._origin, out=out)
+        out *= self._scale
+        return np.clip(out, 0.0, 1.0, out=out)
+
+
+class MotorCmdPacker:
+    def __init__(self, cmds, ids):
+        """
+        cmds: motor command list of the message (e.g. MotorCmds_.cmds), ids: index in cmds of each joint target.
+        """
+        self._cmds = [cmds[id] for id in ids]
+
+    def pack(self, q):
+        for cmd, q_i in zip(self._cmds, np.asarray(q, dtype=np.float64).tolist()):
+            cmd.q = q_i
+
+
+if __name__ == '__main__':
+    import timeit
+    from enum import IntEnum
+    from unitree_sdk2py.idl.default import unitree_go_msg_dds__MotorCmd_
+
+    class Left_JointIndex(IntEnum):
+        kPinky = 6
+        kRing = 7
+        kMiddle = 8
+        kIndex = 9
+        kThumbBend = 10
+        kThumbRotation = 11
+
+    cmds = [unitree_go_msg_dds__MotorCmd_() for _ in range(12)]
+    rng = np.random.default_rng(0)
+    q_target = rng.uniform(-0.2, 1.8, 6)
+
+    # per-joint normalization and packing of the inspire controller before JointRangeNormalizer / MotorCmdPacker
+    def normalize_per_joint(q):
+        q = q.copy()
+        def normalize(val, min_val, max_val):
+            return np.clip((max_val - val) / (max_val - min_val), 0.0, 1.0)
+        for idx in range(6):
+            if idx <= 3:
+                q[idx] = normalize(q[idx], 0.0, 1.7)
+            elif idx == 4:
+                q[idx] = normalize(q[idx], 0.0, 0.5)
+            elif idx == 5:
+                q[idx] = normalize(q[idx], -0.1, 1.3)
+        return q
+
+    def pack_per_joint(q):
+        for idx, id in enumerate(Left_JointIndex):
+            cmds[id].q = q[idx]
+
+    normalizer = JointRangeNormalizer([0.0, 0.0, 0.0, 0.0, 0.0, -0.1], [1.7, 1.7, 1.7, 1.7, 0.5, 1.3], open_value = 1.0)
+    packer = MotorCmdPacker(cmds, Left_JointIndex)
+    out = np.empty(6)
+    assert np.allclose(normalize_per_joint(q_target), normalizer(q_target))
+
+    number = 20000
+    for name, stmt in (("normalize per joint", lambda: normalize_per_joint(q_target)),
+                       ("normalize vectorized", lambda: normalizer(q_target, out = out)),
+                       ("pack per joint", lambda: pack_per_joint(q_target)),
+                       ("pack precomputed", lambda: packer.pack(q_target))):
+        duration = min(timeit.repeat(stmt, number = number, repeat = 5)) / number
+        print(f"{name:22s} {duration * 1e6:8.2f} us per hand")
@@ -0,0 +1,68 @@
+import os
+from multiprocessing import Process, Pipe
+
+import logging_mp
+logger_mp = logging_mp.get_logger(__name__)
+
+
+class HandRetargetWorker:
+    """
+    Retargets the right hand of a HandRetargeting in a separate process, while the caller retargets the left hand, so
+    the two hands of a controller are retargeted concurrently. The dex_retargeting optimizers evaluate their objective
+    in Python callbacks of nlopt and hold the GIL, two threads would not overlap.
+
+        worker.submit(right_hand_data)   # (25, 3) skeleton, returns at once
+        ...                              # retarget the left hand meanwhile
+        right_q_target = worker.result() # blocks until the right hand is retargeted
+
+    The worker process is forked with the retargeting optimizers already built (and keeps their state, e.g. the low
+    pass filter and warm start of the right hand), it must be created before the process that calls submit(), and
+    outside of a daemon process.
+    """
+    def __init__(self, hand_retargeting):
+        """
+        hand_retargeting: HandRetargeting whose right_retargeting runs in the worker.
+        """
+        self.hand_retargeting = hand_retargeting
+        self._conn, worker_conn = Pipe()
+        self._owner_pid = os.getpid()
+        self.retarget_process = Process(target = self._retarget_process, args = (worker_conn,))
+        self.retarget_process.daemon = True
+        self.retarget_process.start()
+        logger_mp.info("[HandRetargetWorker] Initialize HandRetargetWorker OK!")
+
+    def submit(self, right_hand_data):
+        """Start retargeting the right hand skeleton right_hand_data (25, 3)."""
+        self._conn.send(right_hand_data)
+
+    def result(self):
+        """Wait for and return the right hand joint targets of the last submit(), in hardware order."""
+        return self._conn.recv()
+
+    def stop(self):
+        """
+        Ask the worker process to exit. Called from the control process of the controller (a sibling of the worker), it
+        only sends the request; the process that created the worker also waits for it, and terminates it if needed.
+        """
+        try:
+            self._conn.send(None)
+        except OSError:  # the worker is gone already (e.g. interrupted by ctrl+c with the rest of the process group)
+            pass
+        if os.getpid() == self._owner_pid:
+            self.retarget_process.join(timeout = 1.0)
+            if self.retarget_process.is_alive():
+                self.retarget_process.terminate()
+
+    def _retarget_process(self, conn):
+        indices = self.hand_retargeting.right_indices
+        to_hardware = self.hand_retargeting.right_dex_retargeting_to_hardware
+        retargeting = self.hand_retargeting.right_retargeting
+        while True:
+            try:
+                right_hand_data = conn.recv()
+            except (EOFError, KeyboardInterrupt):
+                break
+            if right_hand_data is None:
+                break
+            ref_right_value = right_hand_data[indices[1,:]] - right_hand_data[indices[0,:]]
+            conn.send(retargeting.retarget(ref_right_value)[to_hardware])
@@ -1,6 +1,10 @@
 from dex_retargeting import RetargetingConfig
 from pathlib import Path
+import os
+import hashlib
+import threading
 import yaml
+import numpy as np
 from enum import Enum
 import logging_mp
 logger_mp = logging_mp.get_logger(__name__)
@@ -13,27 +17,28 @@ class HandType(Enum):
     BRAINCO_HAND = "../assets/brainco_hand/brainco.yml"
     BRAINCO_HAND_Unit_Test = "../../assets/brainco_hand/brainco.yml"
 
+def hand_urdf_dir(hand_type: HandType):
+    return '../../assets' if hand_type.name.endswith('_Unit_Test') else '../assets'
+
+def hand_config_key(hand_type: HandType, config_bytes = None):
+    """Cache key of a hand type: its name, and a hash of its YAML config and of the URDF directory it resolves to."""
+    if config_bytes is None:
+        config_bytes = Path(hand_type.value).read_bytes()
+    h = hashlib.sha256(config_bytes)
+    h.update(os.path.abspath(hand_urdf_dir(hand_type)).encode())
+    return hand_type.name, h.hexdigest()[:16]
+
 class HandRetargeting:
     def __init__(self, hand_type: HandType):
-        if hand_type == HandType.UNITREE_DEX3:
-            RetargetingConfig.set_default_urdf_dir('../assets')
-        elif hand_type == HandType.UNITREE_DEX3_Unit_Test:
-            RetargetingConfig.set_default_urdf_dir('../../assets')
-        elif hand_type == HandType.INSPIRE_HAND:
-            RetargetingConfig.set_default_urdf_dir('../assets')
-        elif hand_type == HandType.INSPIRE_HAND_Unit_Test:
-            RetargetingConfig.set_default_urdf_dir('../../assets')
-        elif hand_type == HandType.BRAINCO_HAND:
-            RetargetingConfig.set_default_urdf_dir('../assets')
-        elif hand_type == HandType.BRAINCO_HAND_Unit_Test:
-            RetargetingConfig.set_default_urdf_dir('../../assets')
+        RetargetingConfig.set_default_urdf_dir(hand_urdf_dir(hand_type))
 
         config_file_path = Path(hand_type.value)
 
         try:
-            with config_file_path.open('r') as f:
-                self.cfg = yaml.safe_load(f)
-                
+            config_bytes = config_file_path.read_bytes()
+            self.config_key = hand_config_key(hand_type, config_bytes)
+            self.cfg = yaml.safe_load(config_bytes)
+
             if 'left' not in self.cfg or 'right' not in self.cfg:
                 raise ValueError("Configuration file must contain 'left' and 'right' keys.")
 
@@ -55,8 +60,8 @@ class HandRetargeting:
                 self.right_dex3_api_joint_names = [ 'right_hand_thumb_0_joint', 'right_hand_thumb_1_joint', 'right_hand_thumb_2_joint',
                                                     'right_hand_middle_0_joint', 'right_hand_middle_1_joint',
                                                     'right_hand_index_0_joint', 'right_hand_index_1_joint' ]
-                self.left_dex_retargeting_to_hardware = [ self.left_retargeting_joint_names.index(name) for name in self.left_dex3_api_joint_names]
-                self.right_dex_retargeting_to_hardware = [ self.right_retargeting_joint_names.index(name) for name in self.right_dex3_api_joint_names]
+                self.left_dex_retargeting_to_hardware = np.array([ self.left_retargeting_joint_names.index(name) for name in self.left_dex3_api_joint_names], dtype=np.intp)
+                self.right_dex_retargeting_to_hardware = np.array([ self.right_retargeting_joint_names.index(name) for name in self.right_dex3_api_joint_names], dtype=np.intp)
 
             elif hand_type == HandType.INSPIRE_HAND or hand_type == HandType.INSPIRE_HAND_Unit_Test:
                 # "Joint Motor Sequence" of https://support.unitree.com/home/en/G1_developer/inspire_dfx_dexterous_hand
@@ -64,8 +69,8 @@ class HandRetargeting:
                                                        'L_index_proximal_joint', 'L_thumb_proximal_pitch_joint', 'L_thumb_proximal_yaw_joint' ]
                 self.right_inspire_api_joint_names = [ 'R_pinky_proximal_joint', 'R_ring_proximal_joint', 'R_middle_proximal_joint',
                                                        'R_index_proximal_joint', 'R_thumb_proximal_pitch_joint', 'R_thumb_proximal_yaw_joint' ]
-                self.left_dex_retargeting_to_hardware = [ self.left_retargeting_joint_names.index(name) for name in self.left_inspire_api_joint_names]
-                self.right_dex_retargeting_to_hardware = [ self.right_retargeting_joint_names.index(name) for name in self.right_inspire_api_joint_names]
+                self.left_dex_retargeting_to_hardware = np.array([ self.left_retargeting_joint_names.index(name) for name in self.left_inspire_api_joint_names], dtype=np.intp)
+                self.right_dex_retargeting_to_hardware = np.array([ self.right_retargeting_joint_names.index(name) for name in self.right_inspire_api_joint_names], dtype=np.intp)
             
             elif hand_type == HandType.BRAINCO_HAND or hand_type == HandType.BRAINCO_HAND_Unit_Test:
                 # "Driver Motor ID" of https://www.brainco-hz.com/docs/revolimb-hand/product/parameters.html
@@ -73,8 +78,8 @@ class HandRetargeting:
                                                        'left_middle_proximal_joint', 'left_ring_proximal_joint', 'left_pinky_proximal_joint' ]
                 self.right_brainco_api_joint_names = [ 'right_thumb_metacarpal_joint', 'right_thumb_proximal_joint', 'right_index_proximal_joint',
                                                        'right_middle_proximal_joint', 'right_ring_proximal_joint', 'right_pinky_proximal_joint' ]
-                self.left_dex_retargeting_to_hardware = [ self.left_retargeting_joint_names.index(name) for name in self.left_brainco_api_joint_names]
-                self.right_dex_retargeting_to_hardware = [ self.right_retargeting_joint_names.index(name) for name in self.right_brainco_api_joint_names]
+                self.left_dex_retargeting_to_hardware = np.array([ self.left_retargeting_joint_names.index(name) for name in self.left_brainco_api_joint_names], dtype=np.intp)
+                self.right_dex_retargeting_to_hardware = np.array([ self.right_retargeting_joint_names.index(name) for name in self.right_brainco_api_joint_names], dtype=np.intp)
         
         except FileNotFoundError:
             logger_mp.warning(f"Configuration file not found: {config_file_path}")
@@ -84,4 +89,26 @@ class HandRetargeting:
             raise
         except Exception as e:
             logger_mp.error(f"An error occurred: {e}")
-            raise
\ No newline at end of file
+            raise
+
+
+_hand_retargeting_cache = {}
+_hand_retargeting_cache_lock = threading.Lock()
+
+def get_hand_retargeting(hand_type: HandType):
+    """
+    Process wide HandRetargeting of hand_type, built on the first call and returned again by later calls while its
+    config (see hand_config_key) is unchanged, so the components of a process that retarget the same hand type share
+    one config parse and one load of the URDF models.
+
+    The optimizers keep state between retarget() calls (warm start, low pass filter): the callers of one process share
+    it, while a process forked after the first call (e.g. a hand controller's control_process) gets its own copy.
+    """
+    key = hand_config_key(hand_type)
+    with _hand_retargeting_cache_lock:
+        hand_retargeting = _hand_retargeting_cache.get(key)
+        if hand_retargeting is None:
+            hand_retargeting = HandRetargeting(hand_type)
+            _hand_retargeting_cache[key] = hand_retargeting
+            logger_mp.info(f"[HandRetargeting] Built {hand_type.name} retargeting ({key[1]})")
+        return hand_retargeting
@@ -0,0 +1,130 @@
+import argparse
+import numpy as np
+import pinocchio as pin
+import time
+import os
+import sys
+import logging_mp
+logger_mp = logging_mp.get_logger(__name__)
+parent2_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(parent2_dir)
+
+
+class IKSeedTable:
+    """
+    Nearest neighbour table from sampled end effector poses to joint configurations of the reduced robot model.
+
+    The left and right arm chains are independent, so each side has its own table over the joints supporting L_ee / R_ee,
+    and query() combines the nearest left and right samples into one initial guess for the IK solver.
+    Pose features are [position, rotation_scale * vec(rotation)], searched by brute force in float32
+    (about half a millisecond per side for 100k samples), which is cheap enough for the rare reseeding events.
+    """
+    def __init__(self, left_features, left_q, right_features, right_q, left_idx_q, right_idx_q, rotation_scale):
+        self.left_features = np.asarray(left_features, dtype=np.float32)
+        self.right_features = np.asarray(right_features, dtype=np.float32)
+        self.left_q = np.asarray(left_q)
+        self.right_q = np.asarray(right_q)
+        self.left_idx_q = np.asarray(left_idx_q)
+        self.right_idx_q = np.asarray(right_idx_q)
+        self.rotation_scale = float(rotation_scale)
+        self.left_norms = np.einsum('ij,ij->i', self.left_features, self.left_features)
+        self.right_norms = np.einsum('ij,ij->i', self.right_features, self.right_features)
+        self._feature = np.zeros(12, dtype=np.float32)
+
+    def _nearest(self, features, norms, pose):
+        self._feature[:3] = pose[:3, 3]
+        self._feature[3:] = self.rotation_scale * pose[:3, :3].reshape(9)
+        return np.argmin(norms - 2.0 * (features @ self._feature))
+
+    def query(self, left_wrist, right_wrist, q_default):
+        """Return a copy of q_default with the arm joints replaced by those of the nearest left and right samples."""
+        q = np.array(q_default, dtype=np.float64)
+        q[self.left_idx_q] = self.left_q[self._nearest(self.left_features, self.left_norms, left_wrist)]
+        q[self.right_idx_q] = self.right_q[self._nearest(self.right_features, self.right_norms, right_wrist)]
+        return q
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(tmp_path, left_features=self.left_features, left_q=self.left_q,
+                 right_features=self.right_features, right_q=self.right_q,
+                 left_idx_q=self.left_idx_q, right_idx_q=self.right_idx_q, rotation_scale=self.rotation_scale)
+        os.replace(tmp_path, path)
+
+def load_seed_table(path):
+    with np.load(path) as data:
+        return IKSeedTable(data['left_features'], data['left_q'], data['right_features'], data['right_q'],
+                           data['left_idx_q'], data['right_idx_q'], data['rotation_scale'])
+
+def seed_table_path(spec, urdf_path, cache_dir):
+    return os.path.join(cache_dir, f"{spec.name}-{spec.cache_key(urdf_path)}-seeds.npz")
+
+def _chain_idx_q(model, frame_name):
+    joint_ids = model.supports[model.frames[model.getFrameId(frame_name)].parentJoint]
+    return [idx_q for joint_id in joint_ids if joint_id > 0
+                  for idx_q in range(model.joints[joint_id].idx_q, model.joints[joint_id].idx_q + model.joints[joint_id].nq)]
+
+def build_seed_table(model, num_samples = 100000, rotation_scale = 0.1, random_seed = 0):
+    """Sample joint configurations uniformly within the position limits of model and record the L_ee / R_ee poses."""
+    left_idx_q = _chain_idx_q(model, "L_ee")
+    right_idx_q = _chain_idx_q(model, "R_ee")
+    if set(left_idx_q) & set(right_idx_q):
+        raise ValueError("[IKSeedTable] left and right end effector chains share joints")
+
+    rng = np.random.default_rng(random_seed)
+    samples = rng.uniform(model.lowerPositionLimit, model.upperPositionLimit, (num_samples, model.nq))
+    data = model.createData()
+    L_hand_id = model.getFrameId("L_ee")
+    R_hand_id = model.getFrameId("R_ee")
+    left_features = np.zeros((num_samples, 12), dtype=np.float32)
+    right_features = np.zeros((num_samples, 12), dtype=np.float32)
+    for i in range(num_samples):
+        pin.framesForwardKinematics(model, data, samples[i])
+        for features, frame_id in ((left_features, L_hand_id), (right_features, R_hand_id)):
+            oMf = data.oMf[frame_id]
+            features[i, :3] = oMf.translation
+            features[i, 3:] = rotation_scale * oMf.rotation.reshape(9)
+
+    return IKSeedTable(left_features, samples[:, left_idx_q], right_features, samples[:, right_idx_q],
+                       left_idx_q, right_idx_q, rotation_scale)
+
+def load_or_build_seed_table(spec, model, urdf_path, cache_dir):
+    """Load the seed table of spec from cache_dir, or build it with the default settings and store it there."""
+    path = seed_table_path(spec, urdf_path, cache_dir)
+    if os.path.isfile(path):
+        try:
+            return load_seed_table(path)
+        except Exception as e:
+            logger_mp.warning(f"[IKSeedTable] Failed to load {path}, rebuilding: {e}")
+
+    logger_mp.warning(f"[IKSeedTable] No seed table for {spec.name}, building it now "
+                      f"(build it ahead of time with: python ik_seed_table.py --arm {spec.name})")
+    seed_table = build_seed_table(model)
+    try:
+        seed_table.save(path)
+    except Exception as e:
+        logger_mp.warning(f"[IKSeedTable] Failed to save {path}: {e}")
+    return seed_table
+
+if __name__ == "__main__":
+    from teleop.robot_control.robot_arm_ik import (IK_CACHE_DIR, G1_29_ARM_IK_SPEC, G1_23_ARM_IK_SPEC, H1_2_ARM_IK_SPEC,
+                                                    H1_ARM_IK_SPEC, build_reduced_robot)
+    ARM_IK_SPECS = {spec.name: spec for spec in (G1_29_ARM_IK_SPEC, G1_23_ARM_IK_SPEC, H1_2_ARM_IK_SPEC, H1_ARM_IK_SPEC)}
+
+    parser = argparse.ArgumentParser(description="Build the IK seed table of an arm and store it next to the IK cache.")
+    parser.add_argument('--arm', type=str, choices=list(ARM_IK_SPECS), default='G1_29', help='Select arm')
+    parser.add_argument('--samples', type=int, default=100000, help='Number of sampled joint configurations')
+    parser.add_argument('--rotation-scale', type=float, default=0.1, help='Weight of the rotation matrix in the pose features')
+    parser.add_argument('--cache-dir', type=str, default=IK_CACHE_DIR, help='Directory of the IK cache')
+    parser.add_argument('--assets-dir', type=str, default=os.path.join(parent2_dir, 'assets'), help='Robot assets directory')
+    args = parser.parse_args()
+
+    spec = ARM_IK_SPECS[args.arm]
+    urdf_path = os.path.join(args.assets_dir, spec.urdf_file)
+    reduced_robot = build_reduced_robot(spec, urdf_path, os.path.join(args.assets_dir, spec.mesh_dir))
+
+    start_time = time.time()
+    seed_table = build_seed_table(reduced_robot.model, args.samples, args.rotation_scale)
+    path = seed_table_path(spec, urdf_path, args.cache_dir)
+    seed_table.save(path)
+    logger_mp.info(f"[IKSeedTable] Built {args.samples} samples in {time.time() - start_time:.1f}s, saved to {path}")
@@ -0,0 +1,185 @@
+import struct
+import zlib
+import numpy as np
+import time
+import os
+import sys
+parent2_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(parent2_dir)
+
+"""
+The lowcmd crc of unitree_sdk2 is CRC-32/MPEG-2 (poly 0x04C11DB7, init 0xFFFFFFFF, no reflection, no final xor) over
+the packed message taken as little endian 32 bit words, each fed MSB first, and the last word (the crc itself) excluded.
+zlib.crc32 computes the reflected CRC-32 with the same polynomial, so feeding it the words with all 32 bits reversed
+and reversing its (complemented) register back gives the same value at C speed. zlib.crc32 can also be resumed from a
+previous value, which lets LowCmdEncoder keep the crc of the message prefix that precedes the arm motors.
+"""
+
+_BIT_REVERSED_BYTES = bytes(int(f"{i:08b}"[::-1], 2) for i in range(256))
+
+def _reverse_words(data):
+    """Bytes whose LSB first bit stream is the MSB first bit stream of the little endian words of data."""
+    return np.frombuffer(data, dtype='<u4').byteswap().tobytes().translate(_BIT_REVERSED_BYTES)
+
+def _reverse32(value):
+    return int(f"{value:032b}"[::-1], 2)
+
+def _crc_resume(data, crc_state = 0):
+    """Continue the reflected crc state crc_state (as returned by zlib.crc32, 0 to start) with the words of data."""
+    return zlib.crc32(_reverse_words(data), crc_state)
+
+def _crc_finish(crc_state):
+    return _reverse32(~crc_state & 0xFFFFFFFF)
+
+def lowcmd_crc(packed):
+    """crc of a packed lowcmd (including its trailing crc word), equal to unitree_sdk2py.utils.crc.CRC().Crc(msg)."""
+    return _crc_finish(_crc_resume(memoryview(packed)[:len(packed) - 4]))
+
+
+# layouts of the packed messages, as in unitree_sdk2py.utils.crc
+_HG_HEADER_FORMAT = '<2B2x'
+_HG_MOTOR_DTYPE = np.dtype([('mode', 'u1'), ('pad', 'V3'), ('q', '<f4'), ('dq', '<f4'), ('tau', '<f4'),
+                            ('kp', '<f4'), ('kd', '<f4'), ('reserve', '<u4')])
+_HG_FOOTER_FORMAT = '<5I'
+_HG_NUM_MOTORS = 35
+
+_GO_HEADER_FORMAT = '<4B4IH2x'
+_GO_MOTOR_DTYPE = np.dtype([('mode', 'u1'), ('pad', 'V3'), ('q', '<f4'), ('dq', '<f4'), ('tau', '<f4'),
+                            ('kp', '<f4'), ('kd', '<f4'), ('reserve', '<u4', (3,))])
+_GO_FOOTER_FORMAT = '<4B55Bx2I'
+_GO_NUM_MOTORS = 20
+
+
+class LowCmdEncoder:
+    """
+    Keeps a packed copy of a hg (G1, H1_2) or go (H1) LowCmd_ to compute its crc without repacking the whole message.
+
+    update() writes the commanded motors into msg and, in one vectorized write, into their slots of the packed copy,
+    then sets msg.crc from the cached crc of the unchanged prefix before the first commanded motor and the crc of the rest.
+    Fields written into msg by other means must be synchronized with load() or refresh_motor().
+    """
+    def __init__(self, msg, motor_indices):
+        """
+        msg: LowCmd_ message published by the controller.
+        motor_indices: motor_cmd slots written by update(), e.g. the arm motors.
+        """
+        self.msg = msg
+        self.motor_indices = np.asarray(motor_indices)
+        if msg.__idl_typename__ == 'unitree_hg.msg.dds_.LowCmd_':
+            self._header_format, motor_dtype, self._footer_format, num_motors = (
+                _HG_HEADER_FORMAT, _HG_MOTOR_DTYPE, _HG_FOOTER_FORMAT, _HG_NUM_MOTORS)
+        elif msg.__idl_typename__ == 'unitree_go.msg.dds_.LowCmd_':
+            self._header_format, motor_dtype, self._footer_format, num_motors = (
+                _GO_HEADER_FORMAT, _GO_MOTOR_DTYPE, _GO_FOOTER_FORMAT, _GO_NUM_MOTORS)
+        else:
+            raise ValueError(f"[LowCmdEncoder] unsupported message type {msg.__idl_typename__}")
+
+        self._motors_offset = struct.calcsize(self._header_format)
+        self._footer_offset = self._motors_offset + num_motors * motor_dtype.itemsize
+        self.buffer = bytearray(self._footer_offset + struct.calcsize(self._footer_format))
+        self.motors = np.frombuffer(self.buffer, dtype=motor_dtype, count=num_motors, offset=self._motors_offset)
+        self._motor_cmds = [msg.motor_cmd[id] for id in self.motor_indices]
+        self._resume_offset = self._motors_offset + int(self.motor_indices.min()) * motor_dtype.itemsize
+        self.load()
+
+    def _pack_header(self):
+        msg = self.msg
+        if self._header_format == _HG_HEADER_FORMAT:
+            return struct.pack(self._header_format, msg.mode_pr, msg.mode_machine)
+        return struct.pack(self._header_format, msg.head[0], msg.head[1], msg.level_flag, msg.frame_reserve,
+                           msg.sn[0], msg.sn[1], msg.version[0], msg.version[1], msg.bandwidth)
+
+    def _pack_footer(self):
+        msg = self.msg
+        if self._footer_format == _HG_FOOTER_FORMAT:
+            return struct.pack(self._footer_format, *msg.reserve, msg.crc)
+        return struct.pack(self._footer_format, msg.bms_cmd.off, *msg.bms_cmd.reserve, *msg.wireless_remote,
+                           *msg.led, *msg.fan, msg.gpio, msg.reserve, msg.crc)
+
+    def _pack_motor(self, id):
+        cmd = self.msg.motor_cmd[id]
+        motor = self.motors[id]
+        motor['mode'] = cmd.mode
+        motor['q'] = cmd.q
+        motor['dq'] = cmd.dq
+        motor['tau'] = cmd.tau
+        motor['kp'] = cmd.kp
+        motor['kd'] = cmd.kd
+        motor['reserve'] = cmd.reserve
+
+    def load(self):
+        """Repack the whole message from msg."""
+        header = self._pack_header()
+        self.buffer[:len(header)] = header
+        for id in range(len(self.motors)):
+            self._pack_motor(id)
+        self.buffer[self._footer_offset:] = self._pack_footer()
+        self._prefix_crc = _crc_resume(memoryview(self.buffer)[:self._resume_offset])
+
+    def refresh_motor(self, id):
+        """Repack motor_cmd[id] after it was written directly into msg."""
+        self._pack_motor(id)
+        if self._motors_offset + id * self.motors.itemsize < self._resume_offset:
+            self._prefix_crc = _crc_resume(memoryview(self.buffer)[:self._resume_offset])
+
+    def crc(self):
+        return _crc_finish(_crc_resume(memoryview(self.buffer)[self._resume_offset:len(self.buffer) - 4], self._prefix_crc))
+
+    def update(self, q, tau, dq = None):
+        """
+        q, tau, dq: targets of the motors in motor_indices, dq None to leave it unchanged.
+        Writes them into msg and sets msg.crc.
+        """
+        q = np.asarray(q, dtype=np.float64)
+        tau = np.asarray(tau, dtype=np.float64)
+        for cmd, q_i, tau_i in zip(self._motor_cmds, q.tolist(), tau.tolist()):
+            cmd.q = q_i
+            cmd.tau = tau_i
+        self.motors['q'][self.motor_indices] = q
+        self.motors['tau'][self.motor_indices] = tau
+        if dq is not None:
+            for cmd, dq_i in zip(self._motor_cmds, np.asarray(dq, dtype=np.float64).tolist()):
+                cmd.dq = dq_i
+            self.motors['dq'][self.motor_indices] = dq
+        self.msg.crc = self.crc()
+        return self.msg.crc
+
+
+if __name__ == "__main__":
+    # microbenchmark against the per attribute write + CRC().Crc(msg) path of the arm controllers
+    from unitree_sdk2py.idl.default import unitree_hg_msg_dds__LowCmd_, unitree_go_msg_dds__LowCmd_
+    from unitree_sdk2py.utils.crc import CRC
+    from teleop.robot_control.robot_arm import G1_29_JointArmIndex, H1_JointArmIndex
+
+    crc = CRC()
+    rng = np.random.default_rng(0)
+    num_ticks = 2000
+    for name, msg_factory, arm_index in (("hg LowCmd (G1_29)", unitree_hg_msg_dds__LowCmd_, G1_29_JointArmIndex),
+                                         ("go LowCmd (H1)", unitree_go_msg_dds__LowCmd_, H1_JointArmIndex)):
+        msg = msg_factory()
+        for id in range(len(msg.motor_cmd)):
+            msg.motor_cmd[id].mode = 1
+            msg.motor_cmd[id].kp = 80.0
+            msg.motor_cmd[id].kd = 3.0
+            msg.motor_cmd[id].q = float(rng.uniform(-1, 1))
+        arm_ids = [id.value for id in arm_index]
+        encoder = LowCmdEncoder(msg, arm_ids)
+        targets = rng.uniform(-1, 1, (num_ticks, 2, len(arm_ids)))
+
+        start_time = time.perf_counter()
+        for q, tau in targets:
+            for idx, id in enumerate(arm_index):
+                msg.motor_cmd[id].q = q[idx]
+                msg.motor_cmd[id].dq = 0
+                msg.motor_cmd[id].tau = tau[idx]
+            msg.crc = crc.Crc(msg)
+        sdk_time = (time.perf_counter() - start_time) / num_ticks
+
+        start_time = time.perf_counter()
+        for q, tau in targets:
+            encoder.update(q, tau)
+        encoder_time = (time.perf_counter() - start_time) / num_ticks
+
+        assert encoder.msg.crc == crc.Crc(msg), "[LowCmdEncoder] crc differs from the sdk"
+        print(f"{name}: per tick {sdk_time * 1e6:.1f} us (sdk) -> {encoder_time * 1e6:.1f} us (encoder), "
+              f"{sdk_time / encoder_time:.1f}x")
@@ -1,16 +1,25 @@
 import numpy as np
 import threading
 import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+import os
+import sys
 from enum import IntEnum
 
-from unitree_sdk2py.core.channel import ChannelPublisher, ChannelSubscriber, ChannelFactoryInitialize # dds
+from unitree_sdk2py.core.channel import ChannelPublisher, ChannelFactoryInitialize # dds
 from unitree_sdk2py.idl.unitree_hg.msg.dds_ import ( LowCmd_  as hg_LowCmd, LowState_ as hg_LowState) # idl for g1, h1_2
 from unitree_sdk2py.idl.default import unitree_hg_msg_dds__LowCmd_
-from unitree_sdk2py.utils.crc import CRC
 
 from unitree_sdk2py.idl.unitree_go.msg.dds_ import ( LowCmd_  as go_LowCmd, LowState_ as go_LowState)  # idl for h1
 from unitree_sdk2py.idl.default import unitree_go_msg_dds__LowCmd_
 
+parent2_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(parent2_dir)
+from teleop.utils.dds_subscription import StateSubscription
+from teleop.utils.realtime_loop import RealtimeLoop
+from teleop.robot_control.lowcmd_encoder import LowCmdEncoder
+from teleop.utils.target_interpolator import TargetInterpolator
+
 import logging_mp
 logger_mp = logging_mp.get_logger(__name__)
 
@@ -24,53 +33,134 @@ H1_2_Num_Motors = 35
 H1_Num_Motors = 20
  
 
-class MotorState:
-    def __init__(self):
-        self.q = None
-        self.dq = None
-
-class G1_29_LowState:
-    def __init__(self):
-        self.motor_state = [MotorState() for _ in range(G1_29_Num_Motors)]
-
-class G1_23_LowState:
-    def __init__(self):
-        self.motor_state = [MotorState() for _ in range(G1_23_Num_Motors)]
-
-class H1_2_LowState:
-    def __init__(self):
-        self.motor_state = [MotorState() for _ in range(H1_2_Num_Motors)]
-
-class H1_LowState:
-    def __init__(self):
-        self.motor_state = [MotorState() for _ in range(H1_Num_Motors)]
-
-class DataBuffer:
-    def __init__(self):
-        self.data = None
+class MotorStateBuffer:
+    """
+    Double buffered q, dq and tau_est arrays of all motors, with the timestamp and sequence number of the last lowstate.
+
+    write() fills the back buffer without holding the lock and swaps it in, the getters copy the requested motors
+    from the front buffer under the lock, so a reader never sees a partially written state.
+    """
+    def __init__(self, num_motors):
+        self.num_motors = num_motors
+        self._q = np.zeros((2, num_motors))
+        self._dq = np.zeros((2, num_motors))
+        self._tau_est = np.zeros((2, num_motors))
+        self._front = 0
+        self.timestamp = 0.0   # time.monotonic() of the last write
+        self.seq = 0           # number of writes, 0 until the first lowstate arrived
         self.lock = threading.Lock()
 
-    def GetData(self):
+    def write(self, motor_state):
+        """motor_state: msg.motor_state of a lowstate message."""
+        back = 1 - self._front
+        q, dq, tau_est = self._q[back], self._dq[back], self._tau_est[back]
+        for id in range(self.num_motors):
+            state = motor_state[id]
+            q[id] = state.q
+            dq[id] = state.dq
+            tau_est[id] = state.tau_est
+        with self.lock:
+            self._front = back
+            self.timestamp = time.monotonic()
+            self.seq += 1
+
+    def get_q(self, indices):
         with self.lock:
-            return self.data
+            return self._q[self._front, indices]
 
-    def SetData(self, data):
+    def get_dq(self, indices):
         with self.lock:
-            self.data = data
+            return self._dq[self._front, indices]
 
-class G1_29_ArmController:
-    def __init__(self, motion_mode = False, simulation_mode = False, dds_interface: str = "enx98fc84ec937b"):
-        logger_mp.info("Initialize G1_29_ArmController...")
-        self.q_target = np.zeros(14)
-        self.tauff_target = np.zeros(14)
+    def get_tau_est(self, indices):
+        with self.lock:
+            return self._tau_est[self._front, indices]
+
+class HomingPlan:
+    """Minimum jerk trajectory from start_q to 0 and the state of a go_home() request."""
+    def __init__(self, start_q, start_time, duration, tolerance, settle_timeout, release_time):
+        self.start_q = start_q
+        self.start_time = start_time
+        self.duration = duration
+        self.tolerance = tolerance
+        self.settle_timeout = settle_timeout
+        self.release_time = release_time
+        self.reached_time = None
+        self.future = Future()
+        self.future.set_running_or_notify_cancel()
+
+    def sample(self, t):
+        s = min(max(t / self.duration, 0.0), 1.0)
+        return self.start_q * (1.0 - s ** 3 * (10.0 - 15.0 * s + 6.0 * s ** 2))
+
+class ArmControllerSpec:
+    """
+    Per-robot description of the arm controller, consumed by ArmController.
+
+    joint_index, arm_joint_index: IntEnum of all motors / of the left and right arm motors (left first) in the lowcmd.
+    msg_type: "hg" (G1, H1_2) or "go" (H1) LowCmd_ / LowState_.
+    weak_joints: body (non arm) motors commanded with the low gains, the other body motors use the high gains.
+    wrist_joints: arm motors commanded with the wrist gains, the other arm motors use the low gains.
+    mode_low, mode_high: motor mode of the low gain / high gain motors.
+    motion_joint: motor whose q is the arm_sdk weight in motion mode, None if motion mode is not supported.
+    """
+    def __init__(self, name, joint_index, arm_joint_index, num_motors, msg_type, kp_high, kd_high, kp_low, kd_low,
+                 weak_joints, kp_wrist = None, kd_wrist = None, wrist_joints = (), mode_low = 1, mode_high = 1,
+                 motion_joint = None):
+        self.name = name
+        self.joint_index = joint_index
+        self.arm_joint_index = arm_joint_index
+        self.num_motors = num_motors
+        self.msg_type = msg_type
+        self.kp_high = kp_high
+        self.kd_high = kd_high
+        self.kp_low = kp_low
+        self.kd_low = kd_low
+        self.kp_wrist = kp_wrist
+        self.kd_wrist = kd_wrist
+        self.weak_joints = weak_joints
+        self.wrist_joints = wrist_joints
+        self.mode_low = mode_low
+        self.mode_high = mode_high
+        self.motion_joint = motion_joint
+
+    def motor_gains(self):
+        """Return the mode, kp and kd arrays of the motors in joint_index order."""
+        ids = np.array([id.value for id in self.joint_index])
+        is_arm = np.isin(ids, [id.value for id in self.arm_joint_index])
+        is_weak = np.isin(ids, [id.value for id in self.weak_joints])
+        is_wrist = is_arm & np.isin(ids, [id.value for id in self.wrist_joints])
+        is_low = (is_arm & ~is_wrist) | (~is_arm & is_weak)
+        kp = np.where(is_low, self.kp_low, self.kp_high)
+        kd = np.where(is_low, self.kd_low, self.kd_high)
+        if self.wrist_joints:
+            kp[is_wrist] = self.kp_wrist
+            kd[is_wrist] = self.kd_wrist
+        mode = np.where(is_low | is_wrist, self.mode_low, self.mode_high)
+        return mode, kp, kd
+
+
+class ArmController:
+    def __init__(self, spec, motion_mode = False, simulation_mode = False, dds_interface: str = "enx98fc84ec937b",
+                       control_cpu = None, control_priority = None, interpolation = None, interpolation_params = None):
+        """
+        spec: ArmControllerSpec of the robot.
+        motion_mode: publish to rt/arm_sdk instead of rt/lowcmd, only for specs with a motion_joint.
+        control_cpu, control_priority: cpu core and SCHED_FIFO priority of the 250 Hz command loop, see RealtimeLoop.
+        interpolation: None to send the latest q target at every tick, or one of INTERPOLATION_METHODS to upsample
+                       the targets given to ctrl_dual_arm to the command rate, see TargetInterpolator.
+        interpolation_params: TargetInterpolator arguments, e.g. max_velocity and max_acceleration.
+        """
+        self.spec = spec
+        self.log_prefix = f"[{spec.name}_ArmController]"
+        logger_mp.info(f"Initialize {spec.name}_ArmController...")
+        if motion_mode and spec.motion_joint is None:
+            raise ValueError(f"{self.log_prefix} motion mode is not supported")
         self.motion_mode = motion_mode
         self.simulation_mode = simulation_mode
-        self.kp_high = 300.0
-        self.kd_high = 3.0
-        self.kp_low = 80.0
-        self.kd_low = 3.0
-        self.kp_wrist = 40.0
-        self.kd_wrist = 1.5
+        self.num_arm_motors = len(spec.arm_joint_index)
+        self.q_target = np.zeros(self.num_arm_motors)
+        self.tauff_target = np.zeros(self.num_arm_motors)
 
         self.all_motor_q = None
         self.arm_velocity_limit = 20.0
@@ -79,6 +169,14 @@ class G1_29_ArmController:
         self._speed_gradual_max = False
         self._gradual_start_time = None
         self._gradual_time = None
+        self._homing = None         # HomingPlan executed by the control loop, see go_home()
+        self._homing_results = []   # (future, reached) of ended homings, resolved outside ctrl_lock
+        self._motion_weight = None  # arm_sdk weight to write into the lowcmd at the next tick (motion mode)
+
+        if spec.msg_type == "hg":
+            lowcmd_type, lowstate_type = hg_LowCmd, hg_LowState
+        else:
+            lowcmd_type, lowstate_type = go_LowCmd, go_LowState
 
         # initialize lowcmd publisher and lowstate subscriber
         if self.simulation_mode:
@@ -87,73 +185,64 @@ class G1_29_ArmController:
             ChannelFactoryInitialize(0, dds_interface)
 
         if self.motion_mode:
-            self.lowcmd_publisher = ChannelPublisher(kTopicLowCommand_Motion, hg_LowCmd)
+            self.lowcmd_publisher = ChannelPublisher(kTopicLowCommand_Motion, lowcmd_type)
         else:
-            self.lowcmd_publisher = ChannelPublisher(kTopicLowCommand_Debug, hg_LowCmd)
+            self.lowcmd_publisher = ChannelPublisher(kTopicLowCommand_Debug, lowcmd_type)
         self.lowcmd_publisher.Init()
-        self.lowstate_subscriber = ChannelSubscriber(kTopicLowState, hg_LowState)
-        self.lowstate_subscriber.Init()
-        self.lowstate_buffer = DataBuffer()
-
-        # initialize subscribe thread
-        self.subscribe_thread = threading.Thread(target=self._subscribe_motor_state)
-        self.subscribe_thread.daemon = True
-        self.subscribe_thread.start()
-
-        while not self.lowstate_buffer.GetData():
-            time.sleep(0.1)
-            logger_mp.warning("[G1_29_ArmController] Waiting to subscribe dds...")
-        logger_mp.info("[G1_29_ArmController] Subscribe dds ok.")
-
-        # initialize hg's lowcmd msg
-        self.crc = CRC()
-        self.msg = unitree_hg_msg_dds__LowCmd_()
-        self.msg.mode_pr = 0
-        self.msg.mode_machine = self.get_mode_machine()
+        self.lowstate_buffer = MotorStateBuffer(spec.num_motors)
+        self.all_motor_indices = np.array([id.value for id in spec.joint_index])
+        self.arm_motor_indices = np.array([id.value for id in spec.arm_joint_index])
+        self.lowstate_subscription = StateSubscription(kTopicLowState, lowstate_type, self._on_lowstate)
+
+        while not self.lowstate_subscription.wait_for_sample(timeout = 0.1):
+            logger_mp.warning(f"{self.log_prefix} Waiting to subscribe dds...")
+        logger_mp.info(f"{self.log_prefix} Subscribe dds ok.")
+
+        # initialize lowcmd msg
+        if spec.msg_type == "hg":
+            self.msg = unitree_hg_msg_dds__LowCmd_()
+            self.msg.mode_pr = 0
+            self.msg.mode_machine = self.get_mode_machine()
+        else:
+            self.msg = unitree_go_msg_dds__LowCmd_()
+            self.msg.head[0] = 0xFE
+            self.msg.head[1] = 0xEF
+            self.msg.level_flag = 0xFF
+            self.msg.gpio = 0
 
         self.all_motor_q = self.get_current_motor_q()
         logger_mp.debug(f"Current all body motor state q:\n{self.all_motor_q} \n")
         logger_mp.debug(f"Current two arms motor state q:\n{self.get_current_dual_arm_q()}\n")
         logger_mp.info("Lock all joints except two arms...\n")
 
-        arm_indices = set(member.value for member in G1_29_JointArmIndex)
-        for id in G1_29_JointIndex:
-            self.msg.motor_cmd[id].mode = 1
-            if id.value in arm_indices:
-                if self._Is_wrist_motor(id):
-                    self.msg.motor_cmd[id].kp = self.kp_wrist
-                    self.msg.motor_cmd[id].kd = self.kd_wrist
-                else:
-                    self.msg.motor_cmd[id].kp = self.kp_low
-                    self.msg.motor_cmd[id].kd = self.kd_low
-            else:
-                if self._Is_weak_motor(id):
-                    self.msg.motor_cmd[id].kp = self.kp_low
-                    self.msg.motor_cmd[id].kd = self.kd_low
-                else:
-                    self.msg.motor_cmd[id].kp = self.kp_high
-                    self.msg.motor_cmd[id].kd = self.kd_high
-            self.msg.motor_cmd[id].q  = self.all_motor_q[id]
+        mode, kp, kd = spec.motor_gains()
+        for id, mode_i, kp_i, kd_i, q_i in zip(self.all_motor_indices.tolist(), mode.tolist(), kp.tolist(), kd.tolist(),
+                                               self.all_motor_q.tolist()):
+            self.msg.motor_cmd[id].mode = mode_i
+            self.msg.motor_cmd[id].kp = kp_i
+            self.msg.motor_cmd[id].kd = kd_i
+            self.msg.motor_cmd[id].q  = q_i
         logger_mp.info("Lock OK!\n")
 
-        # initialize publish thread
-        self.publish_thread = threading.Thread(target=self._ctrl_motor_state)
+        # initialize publish loop
+        if self.motion_mode:
+            self.msg.motor_cmd[spec.motion_joint].q = 1.0
+        if interpolation is not None:
+            self.interpolator = TargetInterpolator(self.num_arm_motors, interpolation, **(interpolation_params or {}))
+            self.interpolator.reset(self.get_current_dual_arm_q())
+            self.interpolator.set_target(self.q_target)
+        else:
+            self.interpolator = None
+        self.lowcmd_encoder = LowCmdEncoder(self.msg, self.arm_motor_indices)
         self.ctrl_lock = threading.Lock()
-        self.publish_thread.daemon = True
-        self.publish_thread.start()
+        self.control_loop = RealtimeLoop(self.control_dt, self._ctrl_motor_state, name = "ArmControlLoop",
+                                         cpu = control_cpu, priority = control_priority)
+        self.control_loop.start()
 
-        logger_mp.info("Initialize G1_29_ArmController OK!\n")
+        logger_mp.info(f"Initialize {spec.name}_ArmController OK!\n")
 
-    def _subscribe_motor_state(self):
-        while True:
-            msg = self.lowstate_subscriber.Read()
-            if msg is not None:
-                lowstate = G1_29_LowState()
-                for id in range(G1_29_Num_Motors):
-                    lowstate.motor_state[id].q  = msg.motor_state[id].q
-                    lowstate.motor_state[id].dq = msg.motor_state[id].dq
-                self.lowstate_buffer.SetData(lowstate)
-            time.sleep(0.002)
+    def _on_lowstate(self, msg):
+        self.lowstate_buffer.write(msg.motor_state)
 
     def clip_arm_q_target(self, target_q, velocity_limit):
         current_q = self.get_current_dual_arm_q()
@@ -163,82 +252,141 @@ class G1_29_ArmController:
         return cliped_arm_q_target
 
     def _ctrl_motor_state(self):
-        if self.motion_mode:
-            self.msg.motor_cmd[G1_29_JointIndex.kNotUsedJoint0].q = 1.0;
-
-        while True:
-            start_time = time.time()
-
-            with self.ctrl_lock:
-                arm_q_target     = self.q_target
-                arm_tauff_target = self.tauff_target
-
-            if self.simulation_mode:
-                cliped_arm_q_target = arm_q_target
+        '''Publish the arm motor targets once, called every control_dt by the control loop.'''
+        with self.ctrl_lock:
+            if self._homing is not None:
+                arm_q_target = self._step_homing()
             else:
-                cliped_arm_q_target = self.clip_arm_q_target(arm_q_target, velocity_limit = self.arm_velocity_limit)
-
-            for idx, id in enumerate(G1_29_JointArmIndex):
-                self.msg.motor_cmd[id].q = cliped_arm_q_target[idx]
-                self.msg.motor_cmd[id].dq = 0
-                self.msg.motor_cmd[id].tau = arm_tauff_target[idx]   
+                arm_q_target = self.q_target if self.interpolator is None else self.interpolator.sample()
+            arm_tauff_target = self.tauff_target
+            motion_weight, self._motion_weight = self._motion_weight, None
+        if self._homing_results:
+            self._resolve_homing()
+        if motion_weight is not None:
+            self.msg.motor_cmd[self.spec.motion_joint].q = motion_weight
+            self.lowcmd_encoder.refresh_motor(self.spec.motion_joint)
 
-            self.msg.crc = self.crc.Crc(self.msg)
-            self.lowcmd_publisher.Write(self.msg)
+        if self.simulation_mode:
+            cliped_arm_q_target = arm_q_target
+        else:
+            cliped_arm_q_target = self.clip_arm_q_target(arm_q_target, velocity_limit = self.arm_velocity_limit)
 
-            if self._speed_gradual_max is True:
-                t_elapsed = start_time - self._gradual_start_time
-                self.arm_velocity_limit = 20.0 + (10.0 * min(1.0, t_elapsed / 5.0))
+        self.lowcmd_encoder.update(cliped_arm_q_target, arm_tauff_target)
+        self.lowcmd_publisher.Write(self.msg)
 
-            current_time = time.time()
-            all_t_elapsed = current_time - start_time
-            sleep_time = max(0, (self.control_dt - all_t_elapsed))
-            time.sleep(sleep_time)
-            # logger_mp.debug(f"arm_velocity_limit:{self.arm_velocity_limit}")
-            # logger_mp.debug(f"sleep_time:{sleep_time}")
+        if self._speed_gradual_max is True:
+            t_elapsed = time.time() - self._gradual_start_time
+            self.arm_velocity_limit = 20.0 + (10.0 * min(1.0, t_elapsed / 5.0))
 
-    def ctrl_dual_arm(self, q_target, tauff_target):
-        '''Set control target values q & tau of the left and right arm motors.'''
+    def ctrl_dual_arm(self, q_target, tauff_target, dq_target = None):
+        '''Set control target values q & tau of the left and right arm motors, dq_target is only used by hermite / min_jerk interpolation.'''
         with self.ctrl_lock:
+            if self._homing is not None:
+                self._finish_homing(False, "interrupted by a new target")
             self.q_target = q_target
             self.tauff_target = tauff_target
+            if self.interpolator is not None:
+                self.interpolator.set_target(q_target, dq_target)
+        if self._homing_results:
+            self._resolve_homing()
 
     def get_mode_machine(self):
-        '''Return current dds mode machine.'''
-        return self.lowstate_subscriber.Read().mode_machine
+        '''Return current dds mode machine (hg messages only).'''
+        return self.lowstate_subscription.latest.mode_machine
     
     def get_current_motor_q(self):
         '''Return current state q of all body motors.'''
-        return np.array([self.lowstate_buffer.GetData().motor_state[id].q for id in G1_29_JointIndex])
+        return self.lowstate_buffer.get_q(self.all_motor_indices)
     
     def get_current_dual_arm_q(self):
         '''Return current state q of the left and right arm motors.'''
-        return np.array([self.lowstate_buffer.GetData().motor_state[id].q for id in G1_29_JointArmIndex])
+        return self.lowstate_buffer.get_q(self.arm_motor_indices)
     
     def get_current_dual_arm_dq(self):
         '''Return current state dq of the left and right arm motors.'''
-        return np.array([self.lowstate_buffer.GetData().motor_state[id].dq for id in G1_29_JointArmIndex])
+        return self.lowstate_buffer.get_dq(self.arm_motor_indices)
     
-    def ctrl_dual_arm_go_home(self):
-        '''Move both the left and right arms of the robot to their home position by setting the target joint angles (q) and torques (tau) to zero.'''
-        logger_mp.info("[G1_29_ArmController] ctrl_dual_arm_go_home start...")
-        max_attempts = 100
-        current_attempts = 0
+    def go_home(self, max_velocity = 1.0, min_duration = 1.0, tolerance = 0.05, settle_timeout = 1.0,
+                release_time = 2.0, callback = None):
+        """
+        Move both arms to their home position (q = 0) along a minimum jerk trajectory executed by the control loop,
+        and in motion mode release the arm_sdk weight once they are there.
+
+        max_velocity: peak joint speed of the trajectory (rad/s), which sets its duration (at least min_duration).
+        tolerance, settle_timeout: the arms are home when all joints are within tolerance (rad) of 0, checked for up
+                                   to settle_timeout seconds after the end of the trajectory.
+        release_time: duration of the arm_sdk weight ramp from 1 to 0 (motion mode only).
+        callback: called with the future when homing ends, usually from the control thread, so it should return quickly.
+        return: concurrent.futures.Future resolving to True when the arms reached home (and were released),
+                False if they did not settle or homing was interrupted by ctrl_dual_arm() or another go_home().
+        """
+        logger_mp.info(f"{self.log_prefix} go home start...")
         with self.ctrl_lock:
-            self.q_target = np.zeros(14)
-            # self.tauff_target = np.zeros(14)
-        tolerance = 0.05  # Tolerance threshold for joint angles to determine "close to zero", can be adjusted based on your motor's precision requirements
-        while current_attempts < max_attempts:
-            current_q = self.get_current_dual_arm_q()
-            if np.all(np.abs(current_q) < tolerance):
-                if self.motion_mode:
-                    for weight in np.linspace(1, 0, num=101):
-                        self.msg.motor_cmd[G1_29_JointIndex.kNotUsedJoint0].q = weight;
-                        time.sleep(0.02)
-                logger_mp.info("[G1_29_ArmController] both arms have reached the home position.")
-                break
-            current_attempts += 1
-            time.sleep(0.05)
+            if self._homing is not None:
+                self._finish_homing(False, "interrupted by a new go_home")
+            start_q = np.array(self.lowcmd_encoder.motors['q'][self.arm_motor_indices], dtype=np.float64)
+            # peak speed of the minimum jerk trajectory is 1.875 * distance / duration
+            duration = max(min_duration, 1.875 * np.max(np.abs(start_q)) / max_velocity)
+            release_time = release_time if self.motion_mode else 0.0
+            self._homing = HomingPlan(start_q, time.monotonic(), duration, tolerance, settle_timeout, release_time)
+            self.q_target = np.zeros(self.num_arm_motors)
+            # self.tauff_target = np.zeros(self.num_arm_motors)
+            future = self._homing.future
+        if callback is not None:
+            future.add_done_callback(callback)
+        self._resolve_homing()
+        return future
+
+    def _step_homing(self):
+        # called by the control loop with ctrl_lock held, returns the arm q target of this tick
+        plan = self._homing
+        t = time.monotonic() - plan.start_time
+        if t < plan.duration:
+            return plan.sample(t)
+        if plan.reached_time is None:
+            if np.all(np.abs(self.get_current_dual_arm_q()) < plan.tolerance):
+                plan.reached_time = time.monotonic()
+            elif t > plan.duration + plan.settle_timeout:
+                self._finish_homing(False, "arms did not settle at the home position")
+                return self.q_target
+        if plan.reached_time is not None:
+            t_release = time.monotonic() - plan.reached_time
+            if plan.release_time > 0.0:
+                self._motion_weight = max(0.0, 1.0 - t_release / plan.release_time)
+            if t_release >= plan.release_time:
+                self._finish_homing(True, "both arms have reached the home position")
+        return self.q_target
+
+    def _finish_homing(self, reached, reason):
+        # called with ctrl_lock held, the future is resolved by _resolve_homing()
+        plan = self._homing
+        self._homing = None
+        if self.interpolator is not None:
+            # restart from the last commanded q of the homing trajectory, at rest, not from its home target
+            self.interpolator.reset(np.array(self.lowcmd_encoder.motors['q'][self.arm_motor_indices], dtype=np.float64))
+        if not reached and plan.release_time > 0.0 and plan.reached_time is not None:
+            # interrupted while releasing, give the arms back to arm_sdk
+            self._motion_weight = 1.0
+        if reached:
+            logger_mp.info(f"{self.log_prefix} {reason}.")
+        else:
+            logger_mp.warning(f"{self.log_prefix} go home: {reason}.")
+        self._homing_results.append((plan.future, reached))
+
+    def _resolve_homing(self):
+        # done callbacks run here, outside ctrl_lock, so they may call ctrl_dual_arm() or go_home()
+        with self.ctrl_lock:
+            results, self._homing_results = self._homing_results, []
+        for future, reached in results:
+            future.set_result(reached)
+
+    def ctrl_dual_arm_go_home(self, timeout = 10.0, **kwargs):
+        '''Move both arms to their home position and wait for it (see go_home()), return whether they reached it within timeout seconds.'''
+        try:
+            return self.go_home(**kwargs).result(timeout)
+        except FutureTimeoutError:
+            logger_mp.warning(f"{self.log_prefix} go home did not finish within {timeout} s.")
+            return False
 
     def speed_gradual_max(self, t = 5.0):
         '''Parameter t is the total time required for arms velocity to gradually increase to its maximum value, in seconds. The default is 5.0.'''
@@ -250,34 +398,6 @@ class G1_29_ArmController:
         '''set arms velocity to the maximum value immediately, instead of gradually increasing.'''
         self.arm_velocity_limit = 30.0
 
-    def _Is_weak_motor(self, motor_index):
-        weak_motors = [
-            G1_29_JointIndex.kLeftAnklePitch.value,
-            G1_29_JointIndex.kRightAnklePitch.value,
-            # Left arm
-            G1_29_JointIndex.kLeftShoulderPitch.value,
-            G1_29_JointIndex.kLeftShoulderRoll.value,
-            G1_29_JointIndex.kLeftShoulderYaw.value,
-            G1_29_JointIndex.kLeftElbow.value,
-            # Right arm
-            G1_29_JointIndex.kRightShoulderPitch.value,
-            G1_29_JointIndex.kRightShoulderRoll.value,
-            G1_29_JointIndex.kRightShoulderYaw.value,
-            G1_29_JointIndex.kRightElbow.value,
-        ]
-        return motor_index.value in weak_motors
-    
-    def _Is_wrist_motor(self, motor_index):
-        wrist_motors = [
-            G1_29_JointIndex.kLeftWristRoll.value,
-            G1_29_JointIndex.kLeftWristPitch.value,
-            G1_29_JointIndex.kLeftWristyaw.value,
-            G1_29_JointIndex.kRightWristRoll.value,
-            G1_29_JointIndex.kRightWristPitch.value,
-            G1_29_JointIndex.kRightWristYaw.value,
-        ]
-        return motor_index.value in wrist_motors
-
 class G1_29_JointArmIndex(IntEnum):
     # Left arm
     kLeftShoulderPitch = 15
@@ -344,224 +464,6 @@ class G1_29_JointIndex(IntEnum):
     kNotUsedJoint4 = 33
     kNotUsedJoint5 = 34
 
-class G1_23_ArmController:
-    def __init__(self, motion_mode = False, simulation_mode = False, dds_interface: str = "enx98fc84ec937b"):
-        self.simulation_mode = simulation_mode
-        self.motion_mode = motion_mode
-
-        logger_mp.info("Initialize G1_23_ArmController...")
-        self.q_target = np.zeros(10)
-        self.tauff_target = np.zeros(10)
-
-        self.kp_high = 300.0
-        self.kd_high = 3.0
-        self.kp_low = 80.0
-        self.kd_low = 3.0
-        self.kp_wrist = 40.0
-        self.kd_wrist = 1.5
-
-        self.all_motor_q = None
-        self.arm_velocity_limit = 20.0
-        self.control_dt = 1.0 / 250.0
-
-        self._speed_gradual_max = False
-        self._gradual_start_time = None
-        self._gradual_time = None
-
-        # initialize lowcmd publisher and lowstate subscriber
-        if self.simulation_mode:
-            ChannelFactoryInitialize(1)
-        else:
-            ChannelFactoryInitialize(0, dds_interface)
-        
-        if self.motion_mode:
-            self.lowcmd_publisher = ChannelPublisher(kTopicLowCommand_Motion, hg_LowCmd)
-        else:
-            self.lowcmd_publisher = ChannelPublisher(kTopicLowCommand_Debug, hg_LowCmd)
-        self.lowcmd_publisher.Init()
-        self.lowstate_subscriber = ChannelSubscriber(kTopicLowState, hg_LowState)
-        self.lowstate_subscriber.Init()
-        self.lowstate_buffer = DataBuffer()
-
-        # initialize subscribe thread
-        self.subscribe_thread = threading.Thread(target=self._subscribe_motor_state)
-        self.subscribe_thread.daemon = True
-        self.subscribe_thread.start()
-
-        while not self.lowstate_buffer.GetData():
-            time.sleep(0.1)
-            logger_mp.warning("[G1_23_ArmController] Waiting to subscribe dds...")
-        logger_mp.info("[G1_23_ArmController] Subscribe dds ok.")
-
-        # initialize hg's lowcmd msg
-        self.crc = CRC()
-        self.msg = unitree_hg_msg_dds__LowCmd_()
-        self.msg.mode_pr = 0
-        self.msg.mode_machine = self.get_mode_machine()
-
-        self.all_motor_q = self.get_current_motor_q()
-        logger_mp.info(f"Current all body motor state q:\n{self.all_motor_q} \n")
-        logger_mp.info(f"Current two arms motor state q:\n{self.get_current_dual_arm_q()}\n")
-        logger_mp.info("Lock all joints except two arms...\n")
-
-        arm_indices = set(member.value for member in G1_23_JointArmIndex)
-        for id in G1_23_JointIndex:
-            self.msg.motor_cmd[id].mode = 1
-            if id.value in arm_indices:
-                if self._Is_wrist_motor(id):
-                    self.msg.motor_cmd[id].kp = self.kp_wrist
-                    self.msg.motor_cmd[id].kd = self.kd_wrist
-                else:
-                    self.msg.motor_cmd[id].kp = self.kp_low
-                    self.msg.motor_cmd[id].kd = self.kd_low
-            else:
-                if self._Is_weak_motor(id):
-                    self.msg.motor_cmd[id].kp = self.kp_low
-                    self.msg.motor_cmd[id].kd = self.kd_low
-                else:
-                    self.msg.motor_cmd[id].kp = self.kp_high
-                    self.msg.motor_cmd[id].kd = self.kd_high
-            self.msg.motor_cmd[id].q  = self.all_motor_q[id]
-        logger_mp.info("Lock OK!\n")
-
-        # initialize publish thread
-        self.publish_thread = threading.Thread(target=self._ctrl_motor_state)
-        self.ctrl_lock = threading.Lock()
-        self.publish_thread.daemon = True
-        self.publish_thread.start()
-
-        logger_mp.info("Initialize G1_23_ArmController OK!\n")
-
-    def _subscribe_motor_state(self):
-        while True:
-            msg = self.lowstate_subscriber.Read()
-            if msg is not None:
-                lowstate = G1_23_LowState()
-                for id in range(G1_23_Num_Motors):
-                    lowstate.motor_state[id].q  = msg.motor_state[id].q
-                    lowstate.motor_state[id].dq = msg.motor_state[id].dq
-                self.lowstate_buffer.SetData(lowstate)
-            time.sleep(0.002)
-
-    def clip_arm_q_target(self, target_q, velocity_limit):
-        current_q = self.get_current_dual_arm_q()
-        delta = target_q - current_q
-        motion_scale = np.max(np.abs(delta)) / (velocity_limit * self.control_dt)
-        cliped_arm_q_target = current_q + delta / max(motion_scale, 1.0)
-        return cliped_arm_q_target
-
-    def _ctrl_motor_state(self):
-        if self.motion_mode:
-            self.msg.motor_cmd[G1_23_JointIndex.kNotUsedJoint0].q = 1.0;
-
-        while True:
-            start_time = time.time()
-
-            with self.ctrl_lock:
-                arm_q_target     = self.q_target
-                arm_tauff_target = self.tauff_target
-
-            if self.simulation_mode:
-                cliped_arm_q_target = arm_q_target
-            else:
-                cliped_arm_q_target = self.clip_arm_q_target(arm_q_target, velocity_limit = self.arm_velocity_limit)
-
-            for idx, id in enumerate(G1_23_JointArmIndex):
-                self.msg.motor_cmd[id].q = cliped_arm_q_target[idx]
-                self.msg.motor_cmd[id].dq = 0
-                self.msg.motor_cmd[id].tau = arm_tauff_target[idx]      
-
-            self.msg.crc = self.crc.Crc(self.msg)
-            self.lowcmd_publisher.Write(self.msg)
-
-            if self._speed_gradual_max is True:
-                t_elapsed = start_time - self._gradual_start_time
-                self.arm_velocity_limit = 20.0 + (10.0 * min(1.0, t_elapsed / 5.0))
-
-            current_time = time.time()
-            all_t_elapsed = current_time - start_time
-            sleep_time = max(0, (self.control_dt - all_t_elapsed))
-            time.sleep(sleep_time)
-            # logger_mp.debug(f"arm_velocity_limit:{self.arm_velocity_limit}")
-            # logger_mp.debug(f"sleep_time:{sleep_time}")
-
-    def ctrl_dual_arm(self, q_target, tauff_target):
-        '''Set control target values q & tau of the left and right arm motors.'''
-        with self.ctrl_lock:
-            self.q_target = q_target
-            self.tauff_target = tauff_target
-
-    def get_mode_machine(self):
-        '''Return current dds mode machine.'''
-        return self.lowstate_subscriber.Read().mode_machine
-    
-    def get_current_motor_q(self):
-        '''Return current state q of all body motors.'''
-        return np.array([self.lowstate_buffer.GetData().motor_state[id].q for id in G1_23_JointIndex])
-    
-    def get_current_dual_arm_q(self):
-        '''Return current state q of the left and right arm motors.'''
-        return np.array([self.lowstate_buffer.GetData().motor_state[id].q for id in G1_23_JointArmIndex])
-    
-    def get_current_dual_arm_dq(self):
-        '''Return current state dq of the left and right arm motors.'''
-        return np.array([self.lowstate_buffer.GetData().motor_state[id].dq for id in G1_23_JointArmIndex])
-    
-    def ctrl_dual_arm_go_home(self):
-        '''Move both the left and right arms of the robot to their home position by setting the target joint angles (q) and torques (tau) to zero.'''
-        logger_mp.info("[G1_23_ArmController] ctrl_dual_arm_go_home start...")
-        max_attempts = 100
-        current_attempts = 0
-        with self.ctrl_lock:
-            self.q_target = np.zeros(10)
-            # self.tauff_target = np.zeros(10)
-        tolerance = 0.05  # Tolerance threshold for joint angles to determine "close to zero", can be adjusted based on your motor's precision requirements
-        while current_attempts < max_attempts:
-            current_q = self.get_current_dual_arm_q()
-            if np.all(np.abs(current_q) < tolerance):
-                if self.motion_mode:
-                    for weight in np.linspace(1, 0, num=101):
-                        self.msg.motor_cmd[G1_23_JointIndex.kNotUsedJoint0].q = weight;
-                        time.sleep(0.02)
-                logger_mp.info("[G1_23_ArmController] both arms have reached the home position.")
-                break
-            current_attempts += 1
-            time.sleep(0.05)
-
-    def speed_gradual_max(self, t = 5.0):
-        '''Parameter t is the total time required for arms velocity to gradually increase to its maximum value, in seconds. The default is 5.0.'''
-        self._gradual_start_time = time.time()
-        self._gradual_time = t
-        self._speed_gradual_max = True
-
-    def speed_instant_max(self):
-        '''set arms velocity to the maximum value immediately, instead of gradually increasing.'''
-        self.arm_velocity_limit = 30.0
-
-    def _Is_weak_motor(self, motor_index):
-        weak_motors = [
-            G1_23_JointIndex.kLeftAnklePitch.value,
-            G1_23_JointIndex.kRightAnklePitch.value,
-            # Left arm
-            G1_23_JointIndex.kLeftShoulderPitch.value,
-            G1_23_JointIndex.kLeftShoulderRoll.value,
-            G1_23_JointIndex.kLeftShoulderYaw.value,
-            G1_23_JointIndex.kLeftElbow.value,
-            # Right arm
-            G1_23_JointIndex.kRightShoulderPitch.value,
-            G1_23_JointIndex.kRightShoulderRoll.value,
-            G1_23_JointIndex.kRightShoulderYaw.value,
-            G1_23_JointIndex.kRightElbow.value,
-        ]
-        return motor_index.value in weak_motors
-    
-    def _Is_wrist_motor(self, motor_index):
-        wrist_motors = [
-            G1_23_JointIndex.kLeftWristRoll.value,
-            G1_23_JointIndex.kRightWristRoll.value,
-        ]
-        return motor_index.value in wrist_motors
-
 class G1_23_JointArmIndex(IntEnum):
     # Left arm
     kLeftShoulderPitch = 15
@@ -624,228 +526,6 @@ class G1_23_JointIndex(IntEnum):
     kNotUsedJoint4 = 33
     kNotUsedJoint5 = 34
 
-class H1_2_ArmController:
-    def __init__(self, motion_mode = False, simulation_mode = False, dds_interface: str = "enx98fc84ec937b"):
-        self.simulation_mode = simulation_mode
-        self.motion_mode = motion_mode
-        
-        logger_mp.info("Initialize H1_2_ArmController...")
-        self.q_target = np.zeros(14)
-        self.tauff_target = np.zeros(14)
-
-        self.kp_high = 300.0
-        self.kd_high = 5.0
-        self.kp_low = 140.0
-        self.kd_low = 3.0
-        self.kp_wrist = 50.0
-        self.kd_wrist = 2.0
-
-        self.all_motor_q = None
-        self.arm_velocity_limit = 20.0
-        self.control_dt = 1.0 / 250.0
-
-        self._speed_gradual_max = False
-        self._gradual_start_time = None
-        self._gradual_time = None
-
-        # initialize lowcmd publisher and lowstate subscriber
-        if self.simulation_mode:
-            ChannelFactoryInitialize(1)
-        else:
-            ChannelFactoryInitialize(0, dds_interface)
-
-        if self.motion_mode:
-            self.lowcmd_publisher = ChannelPublisher(kTopicLowCommand_Motion, hg_LowCmd)
-        else:
-            self.lowcmd_publisher = ChannelPublisher(kTopicLowCommand_Debug, hg_LowCmd)
-        self.lowcmd_publisher.Init()
-        self.lowstate_subscriber = ChannelSubscriber(kTopicLowState, hg_LowState)
-        self.lowstate_subscriber.Init()
-        self.lowstate_buffer = DataBuffer()
-
-        # initialize subscribe thread
-        self.subscribe_thread = threading.Thread(target=self._subscribe_motor_state)
-        self.subscribe_thread.daemon = True
-        self.subscribe_thread.start()
-
-        while not self.lowstate_buffer.GetData():
-            time.sleep(0.1)
-            logger_mp.warning("[H1_2_ArmController] Waiting to subscribe dds...")
-        logger_mp.info("[H1_2_ArmController] Subscribe dds ok.")
-
-        # initialize hg's lowcmd msg
-        self.crc = CRC()
-        self.msg = unitree_hg_msg_dds__LowCmd_()
-        self.msg.mode_pr = 0
-        self.msg.mode_machine = self.get_mode_machine()
-
-        self.all_motor_q = self.get_current_motor_q()
-        logger_mp.info(f"Current all body motor state q:\n{self.all_motor_q} \n")
-        logger_mp.info(f"Current two arms motor state q:\n{self.get_current_dual_arm_q()}\n")
-        logger_mp.info("Lock all joints except two arms...\n")
-
-        arm_indices = set(member.value for member in H1_2_JointArmIndex)
-        for id in H1_2_JointIndex:
-            self.msg.motor_cmd[id].mode = 1
-            if id.value in arm_indices:
-                if self._Is_wrist_motor(id):
-                    self.msg.motor_cmd[id].kp = self.kp_wrist
-                    self.msg.motor_cmd[id].kd = self.kd_wrist
-                else:
-                    self.msg.motor_cmd[id].kp = self.kp_low
-                    self.msg.motor_cmd[id].kd = self.kd_low
-            else:
-                if self._Is_weak_motor(id):
-                    self.msg.motor_cmd[id].kp = self.kp_low
-                    self.msg.motor_cmd[id].kd = self.kd_low
-                else:
-                    self.msg.motor_cmd[id].kp = self.kp_high
-                    self.msg.motor_cmd[id].kd = self.kd_high
-            self.msg.motor_cmd[id].q  = self.all_motor_q[id]
-        logger_mp.info("Lock OK!\n")
-
-        # initialize publish thread
-        self.publish_thread = threading.Thread(target=self._ctrl_motor_state)
-        self.ctrl_lock = threading.Lock()
-        self.publish_thread.daemon = True
-        self.publish_thread.start()
-
-        logger_mp.info("Initialize H1_2_ArmController OK!\n")
-
-    def _subscribe_motor_state(self):
-        while True:
-            msg = self.lowstate_subscriber.Read()
-            if msg is not None:
-                lowstate = H1_2_LowState()
-                for id in range(H1_2_Num_Motors):
-                    lowstate.motor_state[id].q  = msg.motor_state[id].q
-                    lowstate.motor_state[id].dq = msg.motor_state[id].dq
-                self.lowstate_buffer.SetData(lowstate)
-            time.sleep(0.002)
-
-    def clip_arm_q_target(self, target_q, velocity_limit):
-        current_q = self.get_current_dual_arm_q()
-        delta = target_q - current_q
-        motion_scale = np.max(np.abs(delta)) / (velocity_limit * self.control_dt)
-        cliped_arm_q_target = current_q + delta / max(motion_scale, 1.0)
-        return cliped_arm_q_target
-
-    def _ctrl_motor_state(self):
-        if self.motion_mode:
-            self.msg.motor_cmd[H1_2_JointIndex.kNotUsedJoint0].q = 1.0;
-
-        while True:
-            start_time = time.time()
-
-            with self.ctrl_lock:
-                arm_q_target     = self.q_target
-                arm_tauff_target = self.tauff_target
-
-            if self.simulation_mode:
-                cliped_arm_q_target = arm_q_target
-            else:
-                cliped_arm_q_target = self.clip_arm_q_target(arm_q_target, velocity_limit = self.arm_velocity_limit)
-
-            for idx, id in enumerate(H1_2_JointArmIndex):
-                self.msg.motor_cmd[id].q = cliped_arm_q_target[idx]
-                self.msg.motor_cmd[id].dq = 0
-                self.msg.motor_cmd[id].tau = arm_tauff_target[idx]      
-
-            self.msg.crc = self.crc.Crc(self.msg)
-            self.lowcmd_publisher.Write(self.msg)
-
-            if self._speed_gradual_max is True:
-                t_elapsed = start_time - self._gradual_start_time
-                self.arm_velocity_limit = 20.0 + (10.0 * min(1.0, t_elapsed / 5.0))
-
-            current_time = time.time()
-            all_t_elapsed = current_time - start_time
-            sleep_time = max(0, (self.control_dt - all_t_elapsed))
-            time.sleep(sleep_time)
-            # logger_mp.debug(f"arm_velocity_limit:{self.arm_velocity_limit}")
-            # logger_mp.debug(f"sleep_time:{sleep_time}")
-
-    def ctrl_dual_arm(self, q_target, tauff_target):
-        '''Set control target values q & tau of the left and right arm motors.'''
-        with self.ctrl_lock:
-            self.q_target = q_target
-            self.tauff_target = tauff_target
-
-    def get_mode_machine(self):
-        '''Return current dds mode machine.'''
-        return self.lowstate_subscriber.Read().mode_machine
-    
-    def get_current_motor_q(self):
-        '''Return current state q of all body motors.'''
-        return np.array([self.lowstate_buffer.GetData().motor_state[id].q for id in H1_2_JointIndex])
-    
-    def get_current_dual_arm_q(self):
-        '''Return current state q of the left and right arm motors.'''
-        return np.array([self.lowstate_buffer.GetData().motor_state[id].q for id in H1_2_JointArmIndex])
-    
-    def get_current_dual_arm_dq(self):
-        '''Return current state dq of the left and right arm motors.'''
-        return np.array([self.lowstate_buffer.GetData().motor_state[id].dq for id in H1_2_JointArmIndex])
-    
-    def ctrl_dual_arm_go_home(self):
-        '''Move both the left and right arms of the robot to their home position by setting the target joint angles (q) and torques (tau) to zero.'''
-        logger_mp.info("[H1_2_ArmController] ctrl_dual_arm_go_home start...")
-        max_attempts = 100
-        current_attempts = 0
-        with self.ctrl_lock:
-            self.q_target = np.zeros(14)
-            # self.tauff_target = np.zeros(14)
-        tolerance = 0.05  # Tolerance threshold for joint angles to determine "close to zero", can be adjusted based on your motor's precision requirements
-        while current_attempts < max_attempts:
-            current_q = self.get_current_dual_arm_q()
-            if np.all(np.abs(current_q) < tolerance):
-                if self.motion_mode:
-                    for weight in np.linspace(1, 0, num=101):
-                        self.msg.motor_cmd[H1_2_JointIndex.kNotUsedJoint0].q = weight;
-                        time.sleep(0.02)
-                logger_mp.info("[H1_2_ArmController] both arms have reached the home position.")
-                break
-            current_attempts += 1
-            time.sleep(0.05)
-
-    def speed_gradual_max(self, t = 5.0):
-        '''Parameter t is the total time required for arms velocity to gradually increase to its maximum value, in seconds. The default is 5.0.'''
-        self._gradual_start_time = time.time()
-        self._gradual_time = t
-        self._speed_gradual_max = True
-
-    def speed_instant_max(self):
-        '''set arms velocity to the maximum value immediately, instead of gradually increasing.'''
-        self.arm_velocity_limit = 30.0
-
-    def _Is_weak_motor(self, motor_index):
-        weak_motors = [
-            H1_2_JointIndex.kLeftAnkle.value,
-            H1_2_JointIndex.kRightAnkle.value,
-            # Left arm
-            H1_2_JointIndex.kLeftShoulderPitch.value,
-            H1_2_JointIndex.kLeftShoulderRoll.value,
-            H1_2_JointIndex.kLeftShoulderYaw.value,
-            H1_2_JointIndex.kLeftElbowPitch.value,
-            # Right arm
-            H1_2_JointIndex.kRightShoulderPitch.value,
-            H1_2_JointIndex.kRightShoulderRoll.value,
-            H1_2_JointIndex.kRightShoulderYaw.value,
-            H1_2_JointIndex.kRightElbowPitch.value,
-        ]
-        return motor_index.value in weak_motors
-    
-    def _Is_wrist_motor(self, motor_index):
-        wrist_motors = [
-            H1_2_JointIndex.kLeftElbowRoll.value,
-            H1_2_JointIndex.kLeftWristPitch.value,
-            H1_2_JointIndex.kLeftWristyaw.value,
-            H1_2_JointIndex.kRightElbowRoll.value,
-            H1_2_JointIndex.kRightWristPitch.value,
-            H1_2_JointIndex.kRightWristYaw.value,
-        ]
-        return motor_index.value in wrist_motors
-    
 class H1_2_JointArmIndex(IntEnum):
     # Left arm
     kLeftShoulderPitch = 13
@@ -911,193 +591,6 @@ class H1_2_JointIndex(IntEnum):
     kNotUsedJoint6 = 33
     kNotUsedJoint7 = 34
 
-class H1_ArmController:
-    def __init__(self, simulation_mode = False, dds_interface: str = "enx98fc84ec937b"):
-        self.simulation_mode = simulation_mode
-        
-        logger_mp.info("Initialize H1_ArmController...")
-        self.q_target = np.zeros(8)
-        self.tauff_target = np.zeros(8)
-
-        self.kp_high = 300.0
-        self.kd_high = 5.0
-        self.kp_low = 140.0
-        self.kd_low = 3.0
-
-        self.all_motor_q = None
-        self.arm_velocity_limit = 20.0
-        self.control_dt = 1.0 / 250.0
-
-        self._speed_gradual_max = False
-        self._gradual_start_time = None
-        self._gradual_time = None
-
-        # initialize lowcmd publisher and lowstate subscriber
-        if self.simulation_mode:
-            ChannelFactoryInitialize(1)
-        else:
-            ChannelFactoryInitialize(0, dds_interface)
-        self.lowcmd_publisher = ChannelPublisher(kTopicLowCommand_Debug, go_LowCmd)
-        self.lowcmd_publisher.Init()
-        self.lowstate_subscriber = ChannelSubscriber(kTopicLowState, go_LowState)
-        self.lowstate_subscriber.Init()
-        self.lowstate_buffer = DataBuffer()
-
-        # initialize subscribe thread
-        self.subscribe_thread = threading.Thread(target=self._subscribe_motor_state)
-        self.subscribe_thread.daemon = True
-        self.subscribe_thread.start()
-
-        while not self.lowstate_buffer.GetData():
-            time.sleep(0.1)
-            logger_mp.warning("[H1_ArmController] Waiting to subscribe dds...")
-        logger_mp.info("[H1_ArmController] Subscribe dds ok.")
-
-        # initialize h1's lowcmd msg
-        self.crc = CRC()
-        self.msg = unitree_go_msg_dds__LowCmd_()
-        self.msg.head[0] = 0xFE
-        self.msg.head[1] = 0xEF
-        self.msg.level_flag = 0xFF
-        self.msg.gpio = 0
-
-        self.all_motor_q = self.get_current_motor_q()
-        logger_mp.info(f"Current all body motor state q:\n{self.all_motor_q} \n")
-        logger_mp.info(f"Current two arms motor state q:\n{self.get_current_dual_arm_q()}\n")
-        logger_mp.info("Lock all joints except two arms...\n")
-
-        for id in H1_JointIndex:
-            if self._Is_weak_motor(id):
-                self.msg.motor_cmd[id].kp = self.kp_low
-                self.msg.motor_cmd[id].kd = self.kd_low
-                self.msg.motor_cmd[id].mode = 0x01
-            else:
-                self.msg.motor_cmd[id].kp = self.kp_high
-                self.msg.motor_cmd[id].kd = self.kd_high
-                self.msg.motor_cmd[id].mode = 0x0A
-            self.msg.motor_cmd[id].q  = self.all_motor_q[id]
-        logger_mp.info("Lock OK!\n")
-
-        # initialize publish thread
-        self.publish_thread = threading.Thread(target=self._ctrl_motor_state)
-        self.ctrl_lock = threading.Lock()
-        self.publish_thread.daemon = True
-        self.publish_thread.start()
-
-        logger_mp.info("Initialize H1_ArmController OK!\n")
-
-    def _subscribe_motor_state(self):
-        while True:
-            msg = self.lowstate_subscriber.Read()
-            if msg is not None:
-                lowstate = H1_LowState()
-                for id in range(H1_Num_Motors):
-                    lowstate.motor_state[id].q  = msg.motor_state[id].q
-                    lowstate.motor_state[id].dq = msg.motor_state[id].dq
-                self.lowstate_buffer.SetData(lowstate)
-            time.sleep(0.002)
-
-    def clip_arm_q_target(self, target_q, velocity_limit):
-        current_q = self.get_current_dual_arm_q()
-        delta = target_q - current_q
-        motion_scale = np.max(np.abs(delta)) / (velocity_limit * self.control_dt)
-        cliped_arm_q_target = current_q + delta / max(motion_scale, 1.0)
-        return cliped_arm_q_target
-
-    def _ctrl_motor_state(self):
-        while True:
-            start_time = time.time()
-
-            with self.ctrl_lock:
-                arm_q_target     = self.q_target
-                arm_tauff_target = self.tauff_target
-
-            if self.simulation_mode:
-                cliped_arm_q_target = arm_q_target
-            else:
-                cliped_arm_q_target = self.clip_arm_q_target(arm_q_target, velocity_limit = self.arm_velocity_limit)
-
-            for idx, id in enumerate(H1_JointArmIndex):
-                self.msg.motor_cmd[id].q = cliped_arm_q_target[idx]
-                self.msg.motor_cmd[id].dq = 0
-                self.msg.motor_cmd[id].tau = arm_tauff_target[idx]      
-
-            self.msg.crc = self.crc.Crc(self.msg)
-            self.lowcmd_publisher.Write(self.msg)
-
-            if self._speed_gradual_max is True:
-                t_elapsed = start_time - self._gradual_start_time
-                self.arm_velocity_limit = 20.0 + (10.0 * min(1.0, t_elapsed / 5.0))
-
-            current_time = time.time()
-            all_t_elapsed = current_time - start_time
-            sleep_time = max(0, (self.control_dt - all_t_elapsed))
-            time.sleep(sleep_time)
-            # logger_mp.debug(f"arm_velocity_limit:{self.arm_velocity_limit}")
-            # logger_mp.debug(f"sleep_time:{sleep_time}")
-
-    def ctrl_dual_arm(self, q_target, tauff_target):
-        '''Set control target values q & tau of the left and right arm motors.'''
-        with self.ctrl_lock:
-            self.q_target = q_target
-            self.tauff_target = tauff_target
-    
-    def get_current_motor_q(self):
-        '''Return current state q of all body motors.'''
-        return np.array([self.lowstate_buffer.GetData().motor_state[id].q for id in H1_JointIndex])
-    
-    def get_current_dual_arm_q(self):
-        '''Return current state q of the left and right arm motors.'''
-        return np.array([self.lowstate_buffer.GetData().motor_state[id].q for id in H1_JointArmIndex])
-    
-    def get_current_dual_arm_dq(self):
-        '''Return current state dq of the left and right arm motors.'''
-        return np.array([self.lowstate_buffer.GetData().motor_state[id].dq for id in H1_JointArmIndex])
-    
-    def ctrl_dual_arm_go_home(self):
-        '''Move both the left and right arms of the robot to their home position by setting the target joint angles (q) and torques (tau) to zero.'''
-        logger_mp.info("[H1_ArmController] ctrl_dual_arm_go_home start...")
-        max_attempts = 100
-        current_attempts = 0
-        with self.ctrl_lock:
-            self.q_target = np.zeros(8)
-            # self.tauff_target = np.zeros(8)
-        tolerance = 0.05  # Tolerance threshold for joint angles to determine "close to zero", can be adjusted based on your motor's precision requirements
-        while current_attempts < max_attempts:
-            current_q = self.get_current_dual_arm_q()
-            if np.all(np.abs(current_q) < tolerance):
-                logger_mp.info("[H1_ArmController] both arms have reached the home position.")
-                break
-            current_attempts += 1
-            time.sleep(0.05)
-
-    def speed_gradual_max(self, t = 5.0):
-        '''Parameter t is the total time required for arms velocity to gradually increase to its maximum value, in seconds. The default is 5.0.'''
-        self._gradual_start_time = time.time()
-        self._gradual_time = t
-        self._speed_gradual_max = True
-
-    def speed_instant_max(self):
-        '''set arms velocity to the maximum value immediately, instead of gradually increasing.'''
-        self.arm_velocity_limit = 30.0
-
-    def _Is_weak_motor(self, motor_index):
-        weak_motors = [
-            H1_JointIndex.kLeftAnkle.value,
-            H1_JointIndex.kRightAnkle.value,
-            # Left arm
-            H1_JointIndex.kLeftShoulderPitch.value,
-            H1_JointIndex.kLeftShoulderRoll.value,
-            H1_JointIndex.kLeftShoulderYaw.value,
-            H1_JointIndex.kLeftElbow.value,
-            # Right arm
-            H1_JointIndex.kRightShoulderPitch.value,
-            H1_JointIndex.kRightShoulderRoll.value,
-            H1_JointIndex.kRightShoulderYaw.value,
-            H1_JointIndex.kRightElbow.value,
-        ]
-        return motor_index.value in weak_motors
-    
 class H1_JointArmIndex(IntEnum):
     # Unlike G1 and H1_2, the arm order in DDS messages for H1 is right then left. 
     # Therefore, the purpose of switching the order here is to maintain consistency with G1 and H1_2.
@@ -1136,6 +629,90 @@ class H1_JointIndex(IntEnum):
     kLeftShoulderYaw = 18
     kLeftElbow = 19
 
+G1_29_ARM_CONTROLLER_SPEC = ArmControllerSpec(
+    name = "G1_29",
+    joint_index = G1_29_JointIndex,
+    arm_joint_index = G1_29_JointArmIndex,
+    num_motors = G1_29_Num_Motors,
+    msg_type = "hg",
+    kp_high = 300.0, kd_high = 3.0,
+    kp_low = 80.0, kd_low = 3.0,
+    kp_wrist = 40.0, kd_wrist = 1.5,
+    weak_joints = [G1_29_JointIndex.kLeftAnklePitch, G1_29_JointIndex.kRightAnklePitch],
+    wrist_joints = [
+        G1_29_JointIndex.kLeftWristRoll,
+        G1_29_JointIndex.kLeftWristPitch,
+        G1_29_JointIndex.kLeftWristyaw,
+        G1_29_JointIndex.kRightWristRoll,
+        G1_29_JointIndex.kRightWristPitch,
+        G1_29_JointIndex.kRightWristYaw,
+    ],
+    motion_joint = G1_29_JointIndex.kNotUsedJoint0,
+)
+
+G1_23_ARM_CONTROLLER_SPEC = ArmControllerSpec(
+    name = "G1_23",
+    joint_index = G1_23_JointIndex,
+    arm_joint_index = G1_23_JointArmIndex,
+    num_motors = G1_23_Num_Motors,
+    msg_type = "hg",
+    kp_high = 300.0, kd_high = 3.0,
+    kp_low = 80.0, kd_low = 3.0,
+    kp_wrist = 40.0, kd_wrist = 1.5,
+    weak_joints = [G1_23_JointIndex.kLeftAnklePitch, G1_23_JointIndex.kRightAnklePitch],
+    wrist_joints = [G1_23_JointIndex.kLeftWristRoll, G1_23_JointIndex.kRightWristRoll],
+    motion_joint = G1_23_JointIndex.kNotUsedJoint0,
+)
+
+H1_2_ARM_CONTROLLER_SPEC = ArmControllerSpec(
+    name = "H1_2",
+    joint_index = H1_2_JointIndex,
+    arm_joint_index = H1_2_JointArmIndex,
+    num_motors = H1_2_Num_Motors,
+    msg_type = "hg",
+    kp_high = 300.0, kd_high = 5.0,
+    kp_low = 140.0, kd_low = 3.0,
+    kp_wrist = 50.0, kd_wrist = 2.0,
+    weak_joints = [H1_2_JointIndex.kLeftAnkle, H1_2_JointIndex.kRightAnkle],
+    wrist_joints = [
+        H1_2_JointIndex.kLeftElbowRoll,
+        H1_2_JointIndex.kLeftWristPitch,
+        H1_2_JointIndex.kLeftWristyaw,
+        H1_2_JointIndex.kRightElbowRoll,
+        H1_2_JointIndex.kRightWristPitch,
+        H1_2_JointIndex.kRightWristYaw,
+    ],
+    motion_joint = H1_2_JointIndex.kNotUsedJoint0,
+)
+
+H1_ARM_CONTROLLER_SPEC = ArmControllerSpec(
+    name = "H1",
+    joint_index = H1_JointIndex,
+    arm_joint_index = H1_JointArmIndex,
+    num_motors = H1_Num_Motors,
+    msg_type = "go",
+    kp_high = 300.0, kd_high = 5.0,
+    kp_low = 140.0, kd_low = 3.0,
+    weak_joints = [H1_JointIndex.kLeftAnkle, H1_JointIndex.kRightAnkle],
+    mode_low = 0x01, mode_high = 0x0A,
+)
+
+class G1_29_ArmController(ArmController):
+    def __init__(self, motion_mode = False, simulation_mode = False, dds_interface: str = "enx98fc84ec937b", **kwargs):
+        super().__init__(G1_29_ARM_CONTROLLER_SPEC, motion_mode, simulation_mode, dds_interface, **kwargs)
+
+class G1_23_ArmController(ArmController):
+    def __init__(self, motion_mode = False, simulation_mode = False, dds_interface: str = "enx98fc84ec937b", **kwargs):
+        super().__init__(G1_23_ARM_CONTROLLER_SPEC, motion_mode, simulation_mode, dds_interface, **kwargs)
+
+class H1_2_ArmController(ArmController):
+    def __init__(self, motion_mode = False, simulation_mode = False, dds_interface: str = "enx98fc84ec937b", **kwargs):
+        super().__init__(H1_2_ARM_CONTROLLER_SPEC, motion_mode, simulation_mode, dds_interface, **kwargs)
+
+class H1_ArmController(ArmController):
+    def __init__(self, simulation_mode = False, dds_interface: str = "enx98fc84ec937b", **kwargs):
+        super().__init__(H1_ARM_CONTROLLER_SPEC, False, simulation_mode, dds_interface, **kwargs)
+
 if __name__ == "__main__":
     from robot_arm_ik import G1_29_ArmIK, G1_23_ArmIK, H1_2_ArmIK, H1_ArmIK
     import pinocchio as pin 
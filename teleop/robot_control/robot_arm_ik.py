@@ -7,348 +7,476 @@ from pinocchio import casadi as cpin
 from pinocchio.visualize import MeshcatVisualizer   
 import os
 import sys
+import hashlib
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
 import logging_mp
 logger_mp = logging_mp.get_logger(__name__)
 parent2_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 sys.path.append(parent2_dir)
 
-from teleop.utils.weighted_moving_filter import WeightedMovingFilter
-
-class G1_29_ArmIK:
-    def __init__(self, Unit_Test = False, Visualization = False):
-        np.set_printoptions(precision=5, suppress=True, linewidth=200)
-
-        self.Unit_Test = Unit_Test
-        self.Visualization = Visualization
-
-        if not self.Unit_Test:
-            self.robot = pin.RobotWrapper.BuildFromURDF('../assets/g1/g1_body29_hand14.urdf', '../assets/g1/')
-        else:
-            self.robot = pin.RobotWrapper.BuildFromURDF('../../assets/g1/g1_body29_hand14.urdf', '../../assets/g1/') # for test
-
-        self.mixed_jointsToLockIDs = [
-                                        "left_hip_pitch_joint" ,
-                                        "left_hip_roll_joint" ,
-                                        "left_hip_yaw_joint" ,
-                                        "left_knee_joint" ,
-                                        "left_ankle_pitch_joint" ,
-                                        "left_ankle_roll_joint" ,
-                                        "right_hip_pitch_joint" ,
-                                        "right_hip_roll_joint" ,
-                                        "right_hip_yaw_joint" ,
-                                        "right_knee_joint" ,
-                                        "right_ankle_pitch_joint" ,
-                                        "right_ankle_roll_joint" ,
-                                        "waist_yaw_joint" ,
-                                        "waist_roll_joint" ,
-                                        "waist_pitch_joint" ,
-                                        
-                                        "left_hand_thumb_0_joint" ,
-                                        "left_hand_thumb_1_joint" ,
-                                        "left_hand_thumb_2_joint" ,
-                                        "left_hand_middle_0_joint" ,
-                                        "left_hand_middle_1_joint" ,
-                                        "left_hand_index_0_joint" ,
-                                        "left_hand_index_1_joint" ,
-                                        
-                                        "right_hand_thumb_0_joint" ,
-                                        "right_hand_thumb_1_joint" ,
-                                        "right_hand_thumb_2_joint" ,
-                                        "right_hand_index_0_joint" ,
-                                        "right_hand_index_1_joint" ,
-                                        "right_hand_middle_0_joint",
-                                        "right_hand_middle_1_joint"
-                                    ]
-
-        self.reduced_robot = self.robot.buildReducedRobot(
-            list_of_joints_to_lock=self.mixed_jointsToLockIDs,
-            reference_configuration=np.array([0.0] * self.robot.model.nq),
-        )
-
-        self.reduced_robot.model.addFrame(
-            pin.Frame('L_ee',
-                      self.reduced_robot.model.getJointId('left_wrist_yaw_joint'),
-                      pin.SE3(np.eye(3),
-                              np.array([0.05,0,0]).T),
-                      pin.FrameType.OP_FRAME)
-        )
+from teleop.utils.smoothing_filter import create_smoothing_filter
+from teleop.utils.ik_telemetry import IKTelemetry
+from teleop.robot_control.ik_seed_table import load_or_build_seed_table
+
+IK_SOLVER_BACKENDS = ("opti", "nlpsol")
+IK_CACHE_VERSION = 1
+IK_CACHE_DIR = os.path.join(os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache")), "xr_teleoperate", "arm_ik")
+
+def build_ik_nlpsol(translational_error, rotational_error, nq, rotation_weight = 1.0, jit = False):
+    """
+    Build the dual arm IK problem once as a casadi nlpsol (ipopt), with the same cost as the Opti version.
+
+    x is q, p is [vec(tf_l), vec(tf_r), q_last] (4x4 matrices in column-major order).
+    Joint limits are passed as lbx/ubx, so ipopt sees plain variable bounds and the dual warm start is lam_x only.
+    """
+    q = casadi.SX.sym("q", nq, 1)
+    q_last = casadi.SX.sym("q_last", nq, 1)
+    tf_l = casadi.SX.sym("tf_l", 4, 4)
+    tf_r = casadi.SX.sym("tf_r", 4, 4)
+    translational_cost = casadi.sumsqr(translational_error(q, tf_l, tf_r))
+    rotation_cost = casadi.sumsqr(rotational_error(q, tf_l, tf_r))
+    regularization_cost = casadi.sumsqr(q)
+    smooth_cost = casadi.sumsqr(q - q_last)
+
+    nlp = {
+        'x': q,
+        'p': casadi.vertcat(casadi.vec(tf_l), casadi.vec(tf_r), q_last),
+        'f': 50 * translational_cost + rotation_weight * rotation_cost + 0.02 * regularization_cost + 0.1 * smooth_cost,
+    }
+    opts = {
+        'ipopt':{
+            'print_level':0,
+            'max_iter':50,
+            'tol':1e-6,
+            'warm_start_init_point':'yes',      # start from x0 and lam_x0 of the previous frame
+            'warm_start_bound_push':1e-9,
+            'warm_start_mult_bound_push':1e-9,
+        },
+        'print_time':False,
+    }
+    if jit:
+        opts['jit'] = True
+        opts['compiler'] = 'shell'
+        opts['jit_options'] = {'flags': ['-O3'], 'verbose': False}
+    return casadi.nlpsol("arm_ik_solver", "ipopt", nlp, opts)
+
+class DampedLeastSquaresIK:
+    """
+    Levenberg-Marquardt fast path for the dual arm IK problem, working directly on the reduced pinocchio model.
+
+    It minimizes the same cost as the casadi problem (translational, rotational, regularization and smooth terms)
+    with damped Gauss-Newton steps built from pin.computeFrameJacobian, and clamps q to the joint limits after every step.
+    solve() returns None if it does not converge or if the final pose residual exceeds the thresholds,
+    in which case the caller falls back to the ipopt problem.
+    """
+    def __init__(self, model, left_frame_id, right_frame_id, rotation_weight = 1.0, damping = 1e-3, max_iter = 15,
+                 translation_threshold = 5e-3, rotation_threshold = 5e-2, step_tolerance = 1e-4):
+        self.model = model
+        self.data = model.createData()
+        self.frame_ids = (left_frame_id, right_frame_id)
+        self.lower = model.lowerPositionLimit.copy()
+        self.upper = model.upperPositionLimit.copy()
+        self.damping = damping
+        self.max_iter = max_iter
+        self.translation_threshold = translation_threshold
+        self.rotation_threshold = rotation_threshold
+        self.step_tolerance = step_tolerance
+
+        # sqrt of the cost weights, so that ||W e||^2 equals the casadi pose cost
+        self.sqrt_weights = np.sqrt(np.array([50.0] * 3 + [rotation_weight] * 3 + [50.0] * 3 + [rotation_weight] * 3))
+        self.regularization_weight = 0.02
+        self.smooth_weight = 0.1
+        self.eye = np.eye(model.nv)
+
+        self.err = np.zeros(12)
+        self.J = np.zeros((12, model.nv))
+        self.iterations = 0
+        self.translation_residual = np.inf
+        self.rotation_residual = np.inf
+
+    def _error(self, q, targets):
+        pin.framesForwardKinematics(self.model, self.data, q)
+        for i, (frame_id, target) in enumerate(zip(self.frame_ids, targets)):
+            oMf = self.data.oMf[frame_id]
+            self.err[6*i:6*i+3] = oMf.translation - target[:3, 3]
+            self.err[6*i+3:6*i+6] = pin.log3(oMf.rotation @ target[:3, :3].T)
+        return self.err
+
+    def _jacobian(self, q, targets):
+        for i, (frame_id, target) in enumerate(zip(self.frame_ids, targets)):
+            J = pin.computeFrameJacobian(self.model, self.data, q, frame_id, pin.LOCAL_WORLD_ALIGNED)
+            R_err = self.data.oMf[frame_id].rotation @ target[:3, :3].T
+            self.J[6*i:6*i+3, :] = J[:3, :]
+            self.J[6*i+3:6*i+6, :] = pin.Jlog3(R_err) @ R_err.T @ J[3:, :]
+        return self.J
+
+    def _cost(self, q, q_last, err):
+        return (np.sum((self.sqrt_weights * err) ** 2) + self.regularization_weight * q.dot(q)
+                + self.smooth_weight * (q - q_last).dot(q - q_last))
+
+    def solve(self, q_init, left_wrist, right_wrist):
+        targets = (left_wrist, right_wrist)
+        q_last = q_init
+        q = np.clip(q_init, self.lower, self.upper)
+        err = self._error(q, targets).copy()
+        cost = self._cost(q, q_last, err)
+        damping = self.damping
+        converged = False
+        accepted = True
+
+        for self.iterations in range(1, self.max_iter + 1):
+            if accepted:
+                Jw = self.sqrt_weights[:, None] * self._jacobian(q, targets)
+                gradient = Jw.T @ (self.sqrt_weights * err) + self.regularization_weight * q + self.smooth_weight * (q - q_last)
+                JtJ = Jw.T @ Jw
+            hessian = JtJ + (self.regularization_weight + self.smooth_weight + damping) * self.eye
+            q_new = np.clip(q - np.linalg.solve(hessian, gradient), self.lower, self.upper)
+
+            err_new = self._error(q_new, targets).copy()
+            cost_new = self._cost(q_new, q_last, err_new)
+            accepted = cost_new < cost
+            if accepted:
+                step = np.max(np.abs(q_new - q))
+                q, err, cost = q_new, err_new, cost_new
+                damping = max(damping * 0.5, 1e-6)
+                if step < self.step_tolerance:
+                    converged = True
+                    break
+            else:
+                damping *= 10.0
+
+        self.translation_residual = max(np.linalg.norm(err[0:3]), np.linalg.norm(err[6:9]))
+        self.rotation_residual = max(np.linalg.norm(err[3:6]), np.linalg.norm(err[9:12]))
+        if not converged or not np.all(np.isfinite(q)):
+            return None
+        if self.translation_residual > self.translation_threshold or self.rotation_residual > self.rotation_threshold:
+            return None
+        return q
+
+class ArmIKSpec:
+    """
+    Per-robot description of the dual arm IK problem, consumed by ArmIK.
+
+    urdf_file, mesh_dir: relative to the assets directory.
+    joints_to_lock: joints removed from the model (legs, waist, hands) at the zero configuration.
+    left_ee_joint, right_ee_joint, ee_offset: the L_ee/R_ee frames are placed ee_offset meters along x of these joints.
+    rotation_weight: weight of the rotational cost, the translational cost weight is 50.
+    scale_arms: scale the wrist targets from human to robot arm length before solving.
+    """
+    def __init__(self, name, urdf_file, mesh_dir, joints_to_lock, left_ee_joint, right_ee_joint, ee_offset,
+                 rotation_weight = 1.0, scale_arms = False, axis_colors = None, axis_width = 20):
+        self.name = name
+        self.urdf_file = urdf_file
+        self.mesh_dir = mesh_dir
+        self.joints_to_lock = joints_to_lock
+        self.left_ee_joint = left_ee_joint
+        self.right_ee_joint = right_ee_joint
+        self.ee_offset = ee_offset
+        self.rotation_weight = rotation_weight
+        self.scale_arms = scale_arms
+        if axis_colors is None:
+            axis_colors = [[1, 0, 0], [1, 0.6, 0],
+                           [0, 1, 0], [0.6, 1, 0],
+                           [0, 0, 1], [0, 0.6, 1]]
+        self.axis_colors = axis_colors
+        self.axis_width = axis_width
+
+    def cache_key(self, urdf_path):
+        """Hash of the URDF content and of everything that changes the reduced model or the symbolic problem."""
+        h = hashlib.sha256()
+        with open(urdf_path, 'rb') as f:
+            h.update(f.read())
+        h.update(repr((IK_CACHE_VERSION, pin.__version__, casadi.__version__, self.joints_to_lock,
+                       self.left_ee_joint, self.right_ee_joint, self.ee_offset, self.rotation_weight)).encode())
+        return h.hexdigest()[:16]
+
+G1_29_ARM_IK_SPEC = ArmIKSpec(
+    name = "G1_29",
+    urdf_file = "g1/g1_body29_hand14.urdf",
+    mesh_dir = "g1/",
+    joints_to_lock = [
+        "left_hip_pitch_joint" ,
+        "left_hip_roll_joint" ,
+        "left_hip_yaw_joint" ,
+        "left_knee_joint" ,
+        "left_ankle_pitch_joint" ,
+        "left_ankle_roll_joint" ,
+        "right_hip_pitch_joint" ,
+        "right_hip_roll_joint" ,
+        "right_hip_yaw_joint" ,
+        "right_knee_joint" ,
+        "right_ankle_pitch_joint" ,
+        "right_ankle_roll_joint" ,
+        "waist_yaw_joint" ,
+        "waist_roll_joint" ,
+        "waist_pitch_joint" ,
+
+        "left_hand_thumb_0_joint" ,
+        "left_hand_thumb_1_joint" ,
+        "left_hand_thumb_2_joint" ,
+        "left_hand_middle_0_joint" ,
+        "left_hand_middle_1_joint" ,
+        "left_hand_index_0_joint" ,
+        "left_hand_index_1_joint" ,
+
+        "right_hand_thumb_0_joint" ,
+        "right_hand_thumb_1_joint" ,
+        "right_hand_thumb_2_joint" ,
+        "right_hand_index_0_joint" ,
+        "right_hand_index_1_joint" ,
+        "right_hand_middle_0_joint",
+        "right_hand_middle_1_joint"
+    ],
+    left_ee_joint = "left_wrist_yaw_joint",
+    right_ee_joint = "right_wrist_yaw_joint",
+    ee_offset = 0.05,
+    rotation_weight = 1.0,
+)
+
+G1_23_ARM_IK_SPEC = ArmIKSpec(
+    name = "G1_23",
+    urdf_file = "g1/g1_body23.urdf",
+    mesh_dir = "g1/",
+    joints_to_lock = [
+        "left_hip_pitch_joint" ,
+        "left_hip_roll_joint" ,
+        "left_hip_yaw_joint" ,
+        "left_knee_joint" ,
+        "left_ankle_pitch_joint" ,
+        "left_ankle_roll_joint" ,
+        "right_hip_pitch_joint" ,
+        "right_hip_roll_joint" ,
+        "right_hip_yaw_joint" ,
+        "right_knee_joint" ,
+        "right_ankle_pitch_joint" ,
+        "right_ankle_roll_joint" ,
+        "waist_yaw_joint" ,
+    ],
+    left_ee_joint = "left_wrist_roll_joint",
+    right_ee_joint = "right_wrist_roll_joint",
+    ee_offset = 0.20,
+    rotation_weight = 0.5,
+)
+
+H1_2_ARM_IK_SPEC = ArmIKSpec(
+    name = "H1_2",
+    urdf_file = "h1_2/h1_2.urdf",
+    mesh_dir = "h1_2/",
+    joints_to_lock = [
+        "left_hip_yaw_joint",
+        "left_hip_pitch_joint",
+        "left_hip_roll_joint",
+        "left_knee_joint",
+        "left_ankle_pitch_joint",
+        "left_ankle_roll_joint",
+        "right_hip_yaw_joint",
+        "right_hip_pitch_joint",
+        "right_hip_roll_joint",
+        "right_knee_joint",
+        "right_ankle_pitch_joint",
+        "right_ankle_roll_joint",
+        "torso_joint",
+        "L_index_proximal_joint",
+        "L_index_intermediate_joint",
+        "L_middle_proximal_joint",
+        "L_middle_intermediate_joint",
+        "L_pinky_proximal_joint",
+        "L_pinky_intermediate_joint",
+        "L_ring_proximal_joint",
+        "L_ring_intermediate_joint",
+        "L_thumb_proximal_yaw_joint",
+        "L_thumb_proximal_pitch_joint",
+        "L_thumb_intermediate_joint",
+        "L_thumb_distal_joint",
+        "R_index_proximal_joint",
+        "R_index_intermediate_joint",
+        "R_middle_proximal_joint",
+        "R_middle_intermediate_joint",
+        "R_pinky_proximal_joint",
+        "R_pinky_intermediate_joint",
+        "R_ring_proximal_joint",
+        "R_ring_intermediate_joint",
+        "R_thumb_proximal_yaw_joint",
+        "R_thumb_proximal_pitch_joint",
+        "R_thumb_intermediate_joint",
+        "R_thumb_distal_joint"
+    ],
+    left_ee_joint = "left_wrist_yaw_joint",
+    right_ee_joint = "right_wrist_yaw_joint",
+    ee_offset = 0.05,
+    rotation_weight = 1.0,
+    scale_arms = True,
+    axis_width = 10,
+)
+
+H1_ARM_IK_SPEC = ArmIKSpec(
+    name = "H1",
+    urdf_file = "h1/h1_with_hand.urdf",
+    mesh_dir = "h1/",
+    joints_to_lock = [
+        "right_hip_roll_joint",
+        "right_hip_pitch_joint",
+        "right_knee_joint",
+        "left_hip_roll_joint",
+        "left_hip_pitch_joint",
+        "left_knee_joint",
+        "torso_joint",
+        "left_hip_yaw_joint",
+        "right_hip_yaw_joint",
+
+        "left_ankle_joint",
+        "right_ankle_joint",
+
+        "L_index_proximal_joint",
+        "L_index_intermediate_joint",
+        "L_middle_proximal_joint",
+        "L_middle_intermediate_joint",
+        "L_ring_proximal_joint",
+        "L_ring_intermediate_joint",
+        "L_pinky_proximal_joint",
+        "L_pinky_intermediate_joint",
+        "L_thumb_proximal_yaw_joint",
+        "L_thumb_proximal_pitch_joint",
+        "L_thumb_intermediate_joint",
+        "L_thumb_distal_joint",
         
-        self.reduced_robot.model.addFrame(
-            pin.Frame('R_ee',
-                      self.reduced_robot.model.getJointId('right_wrist_yaw_joint'),
+        "R_index_proximal_joint",
+        "R_index_intermediate_joint",
+        "R_middle_proximal_joint",
+        "R_middle_intermediate_joint",
+        "R_ring_proximal_joint",
+        "R_ring_intermediate_joint",
+        "R_pinky_proximal_joint",
+        "R_pinky_intermediate_joint",
+        "R_thumb_proximal_yaw_joint",
+        "R_thumb_proximal_pitch_joint",
+        "R_thumb_intermediate_joint",
+        "R_thumb_distal_joint",
+
+        "left_hand_joint",
+        "right_hand_joint"
+    ],
+    left_ee_joint = "left_elbow_joint",
+    right_ee_joint = "right_elbow_joint",
+    ee_offset = 0.2605 + 0.05,
+    rotation_weight = 0.5,
+    scale_arms = True,
+    axis_colors = [[1.0, 0.3, 0.3], [1.0, 0.7, 0.7],
+                   [0.3, 1.0, 0.5], [0.7, 1.0, 0.8],
+                   [0.3, 0.8, 1.0], [0.7, 0.9, 1.0]],
+    axis_width = 10,
+)
+
+def build_reduced_robot(spec, urdf_path, mesh_dir):
+    """Parse the URDF, lock everything but the arms and add the L_ee/R_ee frames."""
+    robot = pin.RobotWrapper.BuildFromURDF(urdf_path, mesh_dir)
+    reduced_robot = robot.buildReducedRobot(
+        list_of_joints_to_lock=spec.joints_to_lock,
+        reference_configuration=np.array([0.0] * robot.model.nq),
+    )
+    for frame_name, joint_name in (('L_ee', spec.left_ee_joint), ('R_ee', spec.right_ee_joint)):
+        reduced_robot.model.addFrame(
+            pin.Frame(frame_name,
+                      reduced_robot.model.getJointId(joint_name),
                       pin.SE3(np.eye(3),
-                              np.array([0.05,0,0]).T),
+                              np.array([spec.ee_offset,0,0]).T),
                       pin.FrameType.OP_FRAME)
         )
-
-        # for i in range(self.reduced_robot.model.nframes):
-        #     frame = self.reduced_robot.model.frames[i]
-        #     frame_id = self.reduced_robot.model.getFrameId(frame.name)
-        #     logger_mp.debug(f"Frame ID: {frame_id}, Name: {frame.name}")
-        # for idx, name in enumerate(self.reduced_robot.model.names):
-        #     logger_mp.debug(f"{idx}: {name}")
-
-        # Creating Casadi models and data for symbolic computing
-        self.cmodel = cpin.Model(self.reduced_robot.model)
-        self.cdata = self.cmodel.createData()
-
-        # Creating symbolic variables
-        self.cq = casadi.SX.sym("q", self.reduced_robot.model.nq, 1) 
-        self.cTf_l = casadi.SX.sym("tf_l", 4, 4)
-        self.cTf_r = casadi.SX.sym("tf_r", 4, 4)
-        cpin.framesForwardKinematics(self.cmodel, self.cdata, self.cq)
-
-        # Get the hand joint ID and define the error function
-        self.L_hand_id = self.reduced_robot.model.getFrameId("L_ee")
-        self.R_hand_id = self.reduced_robot.model.getFrameId("R_ee")
-
-        self.translational_error = casadi.Function(
-            "translational_error",
-            [self.cq, self.cTf_l, self.cTf_r],
-            [
-                casadi.vertcat(
-                    self.cdata.oMf[self.L_hand_id].translation - self.cTf_l[:3,3],
-                    self.cdata.oMf[self.R_hand_id].translation - self.cTf_r[:3,3]
-                )
-            ],
-        )
-        self.rotational_error = casadi.Function(
-            "rotational_error",
-            [self.cq, self.cTf_l, self.cTf_r],
-            [
-                casadi.vertcat(
-                    cpin.log3(self.cdata.oMf[self.L_hand_id].rotation @ self.cTf_l[:3,:3].T),
-                    cpin.log3(self.cdata.oMf[self.R_hand_id].rotation @ self.cTf_r[:3,:3].T)
-                )
-            ],
-        )
-
-        # Defining the optimization problem
-        self.opti = casadi.Opti()
-        self.var_q = self.opti.variable(self.reduced_robot.model.nq)
-        self.var_q_last = self.opti.parameter(self.reduced_robot.model.nq)   # for smooth
-        self.param_tf_l = self.opti.parameter(4, 4)
-        self.param_tf_r = self.opti.parameter(4, 4)
-        self.translational_cost = casadi.sumsqr(self.translational_error(self.var_q, self.param_tf_l, self.param_tf_r))
-        self.rotation_cost = casadi.sumsqr(self.rotational_error(self.var_q, self.param_tf_l, self.param_tf_r))
-        self.regularization_cost = casadi.sumsqr(self.var_q)
-        self.smooth_cost = casadi.sumsqr(self.var_q - self.var_q_last)
-
-        # Setting optimization constraints and goals
-        self.opti.subject_to(self.opti.bounded(
-            self.reduced_robot.model.lowerPositionLimit,
-            self.var_q,
-            self.reduced_robot.model.upperPositionLimit)
-        )
-        self.opti.minimize(50 * self.translational_cost + self.rotation_cost + 0.02 * self.regularization_cost + 0.1 * self.smooth_cost)
-
-        opts = {
-            'ipopt':{
-                'print_level':0,
-                'max_iter':50,
-                'tol':1e-6
-            },
-            'print_time':False,# print or not
-            'calc_lam_p':False # https://github.com/casadi/casadi/wiki/FAQ:-Why-am-I-getting-%22NaN-detected%22in-my-optimization%3F
-        }
-        self.opti.solver("ipopt", opts)
-
-        self.init_data = np.zeros(self.reduced_robot.model.nq)
-        self.smooth_filter = WeightedMovingFilter(np.array([0.4, 0.3, 0.2, 0.1]), 14)
-        self.vis = None
-
-        if self.Visualization:
-            # Initialize the Meshcat visualizer for visualization
-            self.vis = MeshcatVisualizer(self.reduced_robot.model, self.reduced_robot.collision_model, self.reduced_robot.visual_model)
-            self.vis.initViewer(open=True) 
-            self.vis.loadViewerModel("pinocchio") 
-            self.vis.displayFrames(True, frame_ids=[107, 108], axis_length = 0.15, axis_width = 5)
-            self.vis.display(pin.neutral(self.reduced_robot.model))
-
-            # Enable the display of end effector target frames with short axis lengths and greater width.
-            frame_viz_names = ['L_ee_target', 'R_ee_target']
-            FRAME_AXIS_POSITIONS = (
-                np.array([[0, 0, 0], [1, 0, 0],
-                          [0, 0, 0], [0, 1, 0],
-                          [0, 0, 0], [0, 0, 1]]).astype(np.float32).T
+    reduced_robot.data = reduced_robot.model.createData()
+    return reduced_robot
+
+def build_ik_error_functions(model):
+    """Build the translational and rotational error casadi Functions f(q, tf_l, tf_r) of the L_ee/R_ee frames."""
+    # Creating Casadi models and data for symbolic computing
+    cmodel = cpin.Model(model)
+    cdata = cmodel.createData()
+
+    # Creating symbolic variables
+    cq = casadi.SX.sym("q", model.nq, 1)
+    cTf_l = casadi.SX.sym("tf_l", 4, 4)
+    cTf_r = casadi.SX.sym("tf_r", 4, 4)
+    cpin.framesForwardKinematics(cmodel, cdata, cq)
+
+    # Get the hand joint ID and define the error function
+    L_hand_id = model.getFrameId("L_ee")
+    R_hand_id = model.getFrameId("R_ee")
+
+    translational_error = casadi.Function(
+        "translational_error",
+        [cq, cTf_l, cTf_r],
+        [
+            casadi.vertcat(
+                cdata.oMf[L_hand_id].translation - cTf_l[:3,3],
+                cdata.oMf[R_hand_id].translation - cTf_r[:3,3]
             )
-            FRAME_AXIS_COLORS = (
-                np.array([[1, 0, 0], [1, 0.6, 0],
-                          [0, 1, 0], [0.6, 1, 0],
-                          [0, 0, 1], [0, 0.6, 1]]).astype(np.float32).T
+        ],
+    )
+    rotational_error = casadi.Function(
+        "rotational_error",
+        [cq, cTf_l, cTf_r],
+        [
+            casadi.vertcat(
+                cpin.log3(cdata.oMf[L_hand_id].rotation @ cTf_l[:3,:3].T),
+                cpin.log3(cdata.oMf[R_hand_id].rotation @ cTf_r[:3,:3].T)
             )
-            axis_length = 0.1
-            axis_width = 20
-            for frame_viz_name in frame_viz_names:
-                self.vis.viewer[frame_viz_name].set_object(
-                    mg.LineSegments(
-                        mg.PointsGeometry(
-                            position=axis_length * FRAME_AXIS_POSITIONS,
-                            color=FRAME_AXIS_COLORS,
-                        ),
-                        mg.LineBasicMaterial(
-                            linewidth=axis_width,
-                            vertexColors=True,
-                        ),
-                    )
-                )
-    # If the robot arm is not the same size as your arm :)
-    def scale_arms(self, human_left_pose, human_right_pose, human_arm_length=0.60, robot_arm_length=0.75):
-        scale_factor = robot_arm_length / human_arm_length
-        robot_left_pose = human_left_pose.copy()
-        robot_right_pose = human_right_pose.copy()
-        robot_left_pose[:3, 3] *= scale_factor
-        robot_right_pose[:3, 3] *= scale_factor
-        return robot_left_pose, robot_right_pose
-
-    def solve_ik(self, left_wrist, right_wrist, current_lr_arm_motor_q = None, current_lr_arm_motor_dq = None):
-        if current_lr_arm_motor_q is not None:
-            self.init_data = current_lr_arm_motor_q
-        self.opti.set_initial(self.var_q, self.init_data)
-
-        # left_wrist, right_wrist = self.scale_arms(left_wrist, right_wrist)
-        if self.Visualization:
-            self.vis.viewer['L_ee_target'].set_transform(left_wrist)   # for visualization
-            self.vis.viewer['R_ee_target'].set_transform(right_wrist)  # for visualization
-
-        self.opti.set_value(self.param_tf_l, left_wrist)
-        self.opti.set_value(self.param_tf_r, right_wrist)
-        self.opti.set_value(self.var_q_last, self.init_data) # for smooth
-
-        try:
-            sol = self.opti.solve()
-            # sol = self.opti.solve_limited()
-
-            sol_q = self.opti.value(self.var_q)
-            self.smooth_filter.add_data(sol_q)
-            sol_q = self.smooth_filter.filtered_data
-
-            if current_lr_arm_motor_dq is not None:
-                v = current_lr_arm_motor_dq * 0.0
-            else:
-                v = (sol_q - self.init_data) * 0.0
-
-            self.init_data = sol_q
+        ],
+    )
+    return translational_error, rotational_error
 
-            sol_tauff = pin.rnea(self.reduced_robot.model, self.reduced_robot.data, sol_q, v, np.zeros(self.reduced_robot.model.nv))
+class ArmIK:
+    def __init__(self, spec, Unit_Test = False, Visualization = False, solver_backend = "opti", jit = False, dls_fast_path = False,
+                 use_cache = True, cache_dir = IK_CACHE_DIR, telemetry = False, seed_table = False,
+                 smoothing_filter = "weighted", smoothing_params = None):
+        """
+        spec: ArmIKSpec of the robot.
 
-            if self.Visualization:
-                self.vis.display(sol_q)  # for visualization
+        solver_backend: "opti" sets up and solves the problem through casadi.Opti on every call (original behaviour),
+                        "nlpsol" builds the NLP once as a casadi nlpsol and warm starts primal and dual variables between frames.
 
-            return sol_q, sol_tauff
-        
-        except Exception as e:
-            logger_mp.error(f"ERROR in convergence, plotting debug info.{e}")
-
-            sol_q = self.opti.debug.value(self.var_q)
-            self.smooth_filter.add_data(sol_q)
-            sol_q = self.smooth_filter.filtered_data
+        jit: Only used by the "nlpsol" backend. Just-in-time compile the cost, gradient and hessian with the system C compiler.
 
-            if current_lr_arm_motor_dq is not None:
-                v = current_lr_arm_motor_dq * 0.0
-            else:
-                v = (sol_q - self.init_data) * 0.0
+        dls_fast_path: Try the damped least squares solver first and only run ipopt when its residual exceeds the thresholds.
 
-            self.init_data = sol_q
+        use_cache: Load the reduced model and the casadi error functions (and the nlpsol) from cache_dir instead of
+                   parsing the URDF and rebuilding the symbolic problem. Entries are keyed by the URDF hash and the spec.
 
-            sol_tauff = pin.rnea(self.reduced_robot.model, self.reduced_robot.data, sol_q, v, np.zeros(self.reduced_robot.model.nv))
+        telemetry: Record wall time, iterations, residuals and solver path of every solve_ik call in self.telemetry (IKTelemetry).
+                   Off by default, the residuals cost two more evaluations of the casadi error functions per solve.
 
-            logger_mp.error(f"sol_q:{sol_q} \nmotorstate: \n{current_lr_arm_motor_q} \nleft_pose: \n{left_wrist} \nright_pose: \n{right_wrist}")
-            if self.Visualization:
-                self.vis.display(sol_q)  # for visualization
+        seed_table: After a failed solve or a discontinuity of the wrist targets (jump or tracking dropout), start from the
+                    nearest sampled configuration of the IKSeedTable if it is closer to the targets than init_data.
+                    The table is loaded from cache_dir (built on first use, or ahead of time with ik_seed_table.py).
 
-            # return sol_q, sol_tauff
-            return current_lr_arm_motor_q, np.zeros(self.reduced_robot.model.nv)
-        
-class G1_23_ArmIK:
-    def __init__(self, Unit_Test = False, Visualization = False):
+        smoothing_filter, smoothing_params: Filter applied to the solutions of solve_ik, see utils/smoothing_filter.py.
+                                            The default is the original 4-tap WeightedMovingFilter.
+        """
         np.set_printoptions(precision=5, suppress=True, linewidth=200)
 
+        self.spec = spec
         self.Unit_Test = Unit_Test
         self.Visualization = Visualization
+        if solver_backend not in IK_SOLVER_BACKENDS:
+            raise ValueError(f"[{spec.name}_ArmIK] solver_backend must be one of {IK_SOLVER_BACKENDS}, got {solver_backend}")
+        self.solver_backend = solver_backend
+        # to build identical solvers in solve_ik_batch worker processes
+        self.build_kwargs = dict(solver_backend = solver_backend, jit = jit, dls_fast_path = dls_fast_path,
+                                 use_cache = use_cache, cache_dir = cache_dir, telemetry = telemetry, seed_table = seed_table,
+                                 smoothing_filter = smoothing_filter, smoothing_params = smoothing_params)
+
+        assets_dir = '../assets/' if not self.Unit_Test else '../../assets/' # for test
+        self.urdf_path = os.path.join(assets_dir, spec.urdf_file)
+        self.mesh_dir = os.path.join(assets_dir, spec.mesh_dir)
+        self.cache_path = None
+        if use_cache:
+            self.cache_path = os.path.join(cache_dir, f"{spec.name}-{spec.cache_key(self.urdf_path)}")
+
+        self._load_or_build()
 
-        if not self.Unit_Test:
-            self.robot = pin.RobotWrapper.BuildFromURDF('../assets/g1/g1_body23.urdf', '../assets/g1/')
-        else:
-            self.robot = pin.RobotWrapper.BuildFromURDF('../../assets/g1/g1_body23.urdf', '../../assets/g1/') # for test
-
-        self.mixed_jointsToLockIDs = [
-                                        "left_hip_pitch_joint" ,
-                                        "left_hip_roll_joint" ,
-                                        "left_hip_yaw_joint" ,
-                                        "left_knee_joint" ,
-                                        "left_ankle_pitch_joint" ,
-                                        "left_ankle_roll_joint" ,
-                                        "right_hip_pitch_joint" ,
-                                        "right_hip_roll_joint" ,
-                                        "right_hip_yaw_joint" ,
-                                        "right_knee_joint" ,
-                                        "right_ankle_pitch_joint" ,
-                                        "right_ankle_roll_joint" ,
-                                        "waist_yaw_joint" ,
-                                    ]
-
-        self.reduced_robot = self.robot.buildReducedRobot(
-            list_of_joints_to_lock=self.mixed_jointsToLockIDs,
-            reference_configuration=np.array([0.0] * self.robot.model.nq),
-        )
-
-        self.reduced_robot.model.addFrame(
-            pin.Frame('L_ee',
-                      self.reduced_robot.model.getJointId('left_wrist_roll_joint'),
-                      pin.SE3(np.eye(3),
-                              np.array([0.20,0,0]).T),
-                      pin.FrameType.OP_FRAME)
-        )
-        
-        self.reduced_robot.model.addFrame(
-            pin.Frame('R_ee',
-                      self.reduced_robot.model.getJointId('right_wrist_roll_joint'),
-                      pin.SE3(np.eye(3),
-                              np.array([0.20,0,0]).T),
-                      pin.FrameType.OP_FRAME)
-        )
-
-        # for i in range(self.reduced_robot.model.nframes):
-        #     frame = self.reduced_robot.model.frames[i]
-        #     frame_id = self.reduced_robot.model.getFrameId(frame.name)
-        #     logger_mp.debug(f"Frame ID: {frame_id}, Name: {frame.name}")
-        
-        # Creating Casadi models and data for symbolic computing
-        self.cmodel = cpin.Model(self.reduced_robot.model)
-        self.cdata = self.cmodel.createData()
-
-        # Creating symbolic variables
-        self.cq = casadi.SX.sym("q", self.reduced_robot.model.nq, 1) 
-        self.cTf_l = casadi.SX.sym("tf_l", 4, 4)
-        self.cTf_r = casadi.SX.sym("tf_r", 4, 4)
-        cpin.framesForwardKinematics(self.cmodel, self.cdata, self.cq)
-
-        # Get the hand joint ID and define the error function
         self.L_hand_id = self.reduced_robot.model.getFrameId("L_ee")
         self.R_hand_id = self.reduced_robot.model.getFrameId("R_ee")
 
-        self.translational_error = casadi.Function(
-            "translational_error",
-            [self.cq, self.cTf_l, self.cTf_r],
-            [
-                casadi.vertcat(
-                    self.cdata.oMf[self.L_hand_id].translation - self.cTf_l[:3,3],
-                    self.cdata.oMf[self.R_hand_id].translation - self.cTf_r[:3,3]
-                )
-            ],
-        )
-        self.rotational_error = casadi.Function(
-            "rotational_error",
-            [self.cq, self.cTf_l, self.cTf_r],
-            [
-                casadi.vertcat(
-                    cpin.log3(self.cdata.oMf[self.L_hand_id].rotation @ self.cTf_l[:3,:3].T),
-                    cpin.log3(self.cdata.oMf[self.R_hand_id].rotation @ self.cTf_r[:3,:3].T)
-                )
-            ],
-        )
-
         # Defining the optimization problem
         self.opti = casadi.Opti()
         self.var_q = self.opti.variable(self.reduced_robot.model.nq)
@@ -366,7 +494,7 @@ class G1_23_ArmIK:
             self.var_q,
             self.reduced_robot.model.upperPositionLimit)
         )
-        self.opti.minimize(50 * self.translational_cost + 0.5 * self.rotation_cost + 0.02 * self.regularization_cost + 0.1 * self.smooth_cost)
+        self.opti.minimize(50 * self.translational_cost + spec.rotation_weight * self.rotation_cost + 0.02 * self.regularization_cost + 0.1 * self.smooth_cost)
 
         opts = {
             'ipopt':{
@@ -379,8 +507,31 @@ class G1_23_ArmIK:
         }
         self.opti.solver("ipopt", opts)
 
+        if dls_fast_path:
+            self.dls_solver = DampedLeastSquaresIK(self.reduced_robot.model, self.L_hand_id, self.R_hand_id, rotation_weight = spec.rotation_weight)
+        else:
+            self.dls_solver = None
+
+        if self.solver_backend == "nlpsol":
+            self.nlp_solver = self._load_or_build_nlpsol(jit)
+            self.nlp_lbx = self.reduced_robot.model.lowerPositionLimit.copy()
+            self.nlp_ubx = self.reduced_robot.model.upperPositionLimit.copy()
+            self.nlp_lam_x = np.zeros(self.reduced_robot.model.nq)   # dual warm start
+            self.nlp_last_x = np.zeros(self.reduced_robot.model.nq)  # for debug info when not converged
+
         self.init_data = np.zeros(self.reduced_robot.model.nq)
-        self.smooth_filter = WeightedMovingFilter(np.array([0.4, 0.3, 0.2, 0.1]), 10)
+        self.smooth_filter = create_smoothing_filter(smoothing_filter, self.reduced_robot.model.nq, **(smoothing_params or {}))
+        self.telemetry = IKTelemetry() if telemetry else None
+        self.last_solve_path = None
+
+        self.seed_table = None
+        if seed_table:
+            self.seed_table = load_or_build_seed_table(spec, self.reduced_robot.model, self.urdf_path, cache_dir)
+        self.reseed_distance = 0.10  # meters, wrist target jump treated as a discontinuity
+        self.reseed_timeout = 0.5    # seconds without solve_ik calls treated as a tracking dropout
+        self.need_reseed = True
+        self.last_targets = None
+        self.last_solve_time = 0.0
         self.vis = None
 
         if self.Visualization:
@@ -388,7 +539,7 @@ class G1_23_ArmIK:
             self.vis = MeshcatVisualizer(self.reduced_robot.model, self.reduced_robot.collision_model, self.reduced_robot.visual_model)
             self.vis.initViewer(open=True) 
             self.vis.loadViewerModel("pinocchio") 
-            self.vis.displayFrames(True, frame_ids=[67, 68], axis_length = 0.15, axis_width = 5)
+            self.vis.displayFrames(True, frame_ids=[self.L_hand_id, self.R_hand_id], axis_length = 0.15, axis_width = 5)
             self.vis.display(pin.neutral(self.reduced_robot.model))
 
             # Enable the display of end effector target frames with short axis lengths and greater width.
@@ -398,13 +549,9 @@ class G1_23_ArmIK:
                           [0, 0, 0], [0, 1, 0],
                           [0, 0, 0], [0, 0, 1]]).astype(np.float32).T
             )
-            FRAME_AXIS_COLORS = (
-                np.array([[1, 0, 0], [1, 0.6, 0],
-                          [0, 1, 0], [0.6, 1, 0],
-                          [0, 0, 1], [0, 0.6, 1]]).astype(np.float32).T
-            )
+            FRAME_AXIS_COLORS = np.array(spec.axis_colors).astype(np.float32).T
             axis_length = 0.1
-            axis_width = 20
+            axis_width = spec.axis_width
             for frame_viz_name in frame_viz_names:
                 self.vis.viewer[frame_viz_name].set_object(
                     mg.LineSegments(
@@ -418,6 +565,77 @@ class G1_23_ArmIK:
                         ),
                     )
                 )
+
+    def _load_or_build(self):
+        """
+        Set self.reduced_robot, self.translational_error and self.rotational_error, from the cache if possible.
+
+        Visualization needs the collision and visual models, which are not cached, so the URDF is always parsed in that case.
+        """
+        if self.cache_path is not None and os.path.isdir(self.cache_path):
+            try:
+                if self.Visualization:
+                    self.reduced_robot = build_reduced_robot(self.spec, self.urdf_path, self.mesh_dir)
+                else:
+                    model = pin.Model()
+                    model.loadFromBinary(os.path.join(self.cache_path, "reduced_model.bin"))
+                    self.reduced_robot = pin.RobotWrapper(model)
+                self.translational_error = casadi.Function.load(os.path.join(self.cache_path, "translational_error.casadi"))
+                self.rotational_error = casadi.Function.load(os.path.join(self.cache_path, "rotational_error.casadi"))
+                logger_mp.info(f"[{self.spec.name}_ArmIK] Loaded IK model from cache {self.cache_path}")
+                return
+            except Exception as e:
+                logger_mp.warning(f"[{self.spec.name}_ArmIK] Failed to load IK cache {self.cache_path}, rebuilding: {e}")
+
+        start_time = time.time()
+        self.reduced_robot = build_reduced_robot(self.spec, self.urdf_path, self.mesh_dir)
+        self.translational_error, self.rotational_error = build_ik_error_functions(self.reduced_robot.model)
+        logger_mp.info(f"[{self.spec.name}_ArmIK] Built IK model in {time.time() - start_time:.2f}s")
+
+        if self.cache_path is not None:
+            try:
+                self._write_cache()
+            except Exception as e:
+                logger_mp.warning(f"[{self.spec.name}_ArmIK] Failed to write IK cache {self.cache_path}: {e}")
+
+    def _write_cache(self):
+        """Write the entry to a temporary directory first and rename it, so concurrent launches never see a partial entry."""
+        cache_dir = os.path.dirname(self.cache_path)
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = tempfile.mkdtemp(prefix=".tmp-", dir=cache_dir)
+        try:
+            self.reduced_robot.model.saveToBinary(os.path.join(tmp_path, "reduced_model.bin"))
+            self.translational_error.save(os.path.join(tmp_path, "translational_error.casadi"))
+            self.rotational_error.save(os.path.join(tmp_path, "rotational_error.casadi"))
+            os.rename(tmp_path, self.cache_path)
+        except OSError:
+            if not os.path.isdir(self.cache_path):
+                raise
+        finally:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+
+    def _load_or_build_nlpsol(self, jit):
+        """The jit variant links generated C code in a temporary directory, so only the plain nlpsol is cached."""
+        nlpsol_path = None
+        if self.cache_path is not None and not jit:
+            nlpsol_path = os.path.join(self.cache_path, "nlpsol.casadi")
+            if os.path.isfile(nlpsol_path):
+                try:
+                    return casadi.Function.load(nlpsol_path)
+                except Exception as e:
+                    logger_mp.warning(f"[{self.spec.name}_ArmIK] Failed to load cached nlpsol, rebuilding: {e}")
+
+        nlp_solver = build_ik_nlpsol(self.translational_error, self.rotational_error, self.reduced_robot.model.nq,
+                                     rotation_weight = self.spec.rotation_weight, jit = jit)
+        if nlpsol_path is not None and os.path.isdir(self.cache_path):
+            try:
+                tmp_path = f"{nlpsol_path}.{os.getpid()}.tmp"
+                nlp_solver.save(tmp_path)
+                os.replace(tmp_path, nlpsol_path)
+            except Exception as e:
+                logger_mp.warning(f"[{self.spec.name}_ArmIK] Failed to cache nlpsol: {e}")
+        return nlp_solver
+
     # If the robot arm is not the same size as your arm :)
     def scale_arms(self, human_left_pose, human_right_pose, human_arm_length=0.60, robot_arm_length=0.75):
         scale_factor = robot_arm_length / human_arm_length
@@ -427,276 +645,106 @@ class G1_23_ArmIK:
         robot_right_pose[:3, 3] *= scale_factor
         return robot_left_pose, robot_right_pose
 
-    def solve_ik(self, left_wrist, right_wrist, current_lr_arm_motor_q = None, current_lr_arm_motor_dq = None):
-        if current_lr_arm_motor_q is not None:
-            self.init_data = current_lr_arm_motor_q
-        self.opti.set_initial(self.var_q, self.init_data)
-
-        # left_wrist, right_wrist = self.scale_arms(left_wrist, right_wrist)
-        if self.Visualization:
-            self.vis.viewer['L_ee_target'].set_transform(left_wrist)   # for visualization
-            self.vis.viewer['R_ee_target'].set_transform(right_wrist)  # for visualization
+    def _solve_nlpsol(self, left_wrist, right_wrist):
+        """Solve with the prebuilt nlpsol, warm started from init_data and the bound multipliers of the previous frame."""
+        p = np.concatenate((left_wrist.flatten(order='F'), right_wrist.flatten(order='F'), self.init_data))
+        sol = self.nlp_solver(x0 = self.init_data, p = p, lbx = self.nlp_lbx, ubx = self.nlp_ubx, lam_x0 = self.nlp_lam_x)
+        self.nlp_last_x = sol['x'].full().ravel()
+        stats = self.nlp_solver.stats()
+        if not stats['success']:
+            self.nlp_lam_x = np.zeros(self.reduced_robot.model.nq)
+            raise RuntimeError(f"nlpsol return status: {stats['return_status']}")
+        self.nlp_lam_x = sol['lam_x'].full().ravel()
+        return self.nlp_last_x
+
+    def _solve_frame(self, left_wrist, right_wrist):
+        """Solve one frame starting from self.init_data, which is also the smooth reference. Raises if ipopt does not converge."""
+        if self.dls_solver is not None:
+            sol_q = self.dls_solver.solve(self.init_data, left_wrist, right_wrist)
+            if sol_q is not None:
+                self.last_solve_path = "dls"
+                return sol_q # damped least squares fast path converged
+
+        self.last_solve_path = "ipopt"
+        if self.solver_backend == "nlpsol":
+            return self._solve_nlpsol(left_wrist, right_wrist)
 
+        self.opti.set_initial(self.var_q, self.init_data)
         self.opti.set_value(self.param_tf_l, left_wrist)
         self.opti.set_value(self.param_tf_r, right_wrist)
         self.opti.set_value(self.var_q_last, self.init_data) # for smooth
-
-        try:
-            sol = self.opti.solve()
-            # sol = self.opti.solve_limited()
-
-            sol_q = self.opti.value(self.var_q)
-            self.smooth_filter.add_data(sol_q)
-            sol_q = self.smooth_filter.filtered_data
-
-            if current_lr_arm_motor_dq is not None:
-                v = current_lr_arm_motor_dq * 0.0
-            else:
-                v = (sol_q - self.init_data) * 0.0
-
-            self.init_data = sol_q
-
-            sol_tauff = pin.rnea(self.reduced_robot.model, self.reduced_robot.data, sol_q, v, np.zeros(self.reduced_robot.model.nv))
-
-            if self.Visualization:
-                self.vis.display(sol_q)  # for visualization
-
-            return sol_q, sol_tauff
-        
-        except Exception as e:
-            logger_mp.error(f"ERROR in convergence, plotting debug info.{e}")
-
-            sol_q = self.opti.debug.value(self.var_q)
-            self.smooth_filter.add_data(sol_q)
-            sol_q = self.smooth_filter.filtered_data
-
-            if current_lr_arm_motor_dq is not None:
-                v = current_lr_arm_motor_dq * 0.0
-            else:
-                v = (sol_q - self.init_data) * 0.0
-
-            self.init_data = sol_q
-
-            sol_tauff = pin.rnea(self.reduced_robot.model, self.reduced_robot.data, sol_q, v, np.zeros(self.reduced_robot.model.nv))
-
-            logger_mp.error(f"sol_q:{sol_q} \nmotorstate: \n{current_lr_arm_motor_q} \nleft_pose: \n{left_wrist} \nright_pose: \n{right_wrist}")
-            if self.Visualization:
-                self.vis.display(sol_q)  # for visualization
-
-            # return sol_q, sol_tauff
-            return current_lr_arm_motor_q, np.zeros(self.reduced_robot.model.nv)
-
-
-class H1_2_ArmIK:
-    def __init__(self, Unit_Test = False, Visualization = False):
-        np.set_printoptions(precision=5, suppress=True, linewidth=200)
-
-        self.Unit_Test = Unit_Test
-        self.Visualization = Visualization
-
-        if not self.Unit_Test:
-            self.robot = pin.RobotWrapper.BuildFromURDF('../assets/h1_2/h1_2.urdf', '../assets/h1_2/')
+        sol = self.opti.solve()
+        # sol = self.opti.solve_limited()
+        return self.opti.value(self.var_q)
+
+    def _last_iterate(self):
+        """Last ipopt iterate after a failed solve, for debug info."""
+        if self.solver_backend == "nlpsol":
+            return self.nlp_last_x
+        return self.opti.debug.value(self.var_q)
+
+    def _pose_cost(self, q, left_wrist, right_wrist):
+        return (50 * casadi.sumsqr(self.translational_error(q, left_wrist, right_wrist))
+                + self.spec.rotation_weight * casadi.sumsqr(self.rotational_error(q, left_wrist, right_wrist)))
+
+    def _reseed(self, left_wrist, right_wrist):
+        """Replace init_data by the seed table guess on a failure or a target discontinuity, if the guess is better."""
+        now = time.monotonic()
+        targets = np.concatenate((left_wrist[:3, 3], right_wrist[:3, 3]))
+        if self.last_targets is not None and now - self.last_solve_time < self.reseed_timeout:
+            jump = max(np.linalg.norm(targets[:3] - self.last_targets[:3]), np.linalg.norm(targets[3:] - self.last_targets[3:]))
+            if jump > self.reseed_distance:
+                self.need_reseed = True
         else:
-            self.robot = pin.RobotWrapper.BuildFromURDF('../../assets/h1_2/h1_2.urdf', '../../assets/h1_2/') # for test
-
-        self.mixed_jointsToLockIDs = [
-                                      "left_hip_yaw_joint",
-                                      "left_hip_pitch_joint",
-                                      "left_hip_roll_joint",
-                                      "left_knee_joint",
-                                      "left_ankle_pitch_joint",
-                                      "left_ankle_roll_joint",
-                                      "right_hip_yaw_joint",
-                                      "right_hip_pitch_joint",
-                                      "right_hip_roll_joint",
-                                      "right_knee_joint",
-                                      "right_ankle_pitch_joint",
-                                      "right_ankle_roll_joint",
-                                      "torso_joint",
-                                      "L_index_proximal_joint",
-                                      "L_index_intermediate_joint",
-                                      "L_middle_proximal_joint",
-                                      "L_middle_intermediate_joint",
-                                      "L_pinky_proximal_joint",
-                                      "L_pinky_intermediate_joint",
-                                      "L_ring_proximal_joint",
-                                      "L_ring_intermediate_joint",
-                                      "L_thumb_proximal_yaw_joint",
-                                      "L_thumb_proximal_pitch_joint",
-                                      "L_thumb_intermediate_joint",
-                                      "L_thumb_distal_joint",
-                                      "R_index_proximal_joint",
-                                      "R_index_intermediate_joint",
-                                      "R_middle_proximal_joint",
-                                      "R_middle_intermediate_joint",
-                                      "R_pinky_proximal_joint",
-                                      "R_pinky_intermediate_joint",
-                                      "R_ring_proximal_joint",
-                                      "R_ring_intermediate_joint",
-                                      "R_thumb_proximal_yaw_joint",
-                                      "R_thumb_proximal_pitch_joint",
-                                      "R_thumb_intermediate_joint",
-                                      "R_thumb_distal_joint"
-                                    ]
-
-        self.reduced_robot = self.robot.buildReducedRobot(
-            list_of_joints_to_lock=self.mixed_jointsToLockIDs,
-            reference_configuration=np.array([0.0] * self.robot.model.nq),
-        )
-
-        self.reduced_robot.model.addFrame(
-            pin.Frame('L_ee',
-                      self.reduced_robot.model.getJointId('left_wrist_yaw_joint'),
-                      pin.SE3(np.eye(3),
-                              np.array([0.05,0,0]).T),
-                      pin.FrameType.OP_FRAME)
-        )
-        
-        self.reduced_robot.model.addFrame(
-            pin.Frame('R_ee',
-                      self.reduced_robot.model.getJointId('right_wrist_yaw_joint'),
-                      pin.SE3(np.eye(3),
-                              np.array([0.05,0,0]).T),
-                      pin.FrameType.OP_FRAME)
-        )
-
-        # for i in range(self.reduced_robot.model.nframes):
-        #     frame = self.reduced_robot.model.frames[i]
-        #     frame_id = self.reduced_robot.model.getFrameId(frame.name)
-        #     logger_mp.debug(f"Frame ID: {frame_id}, Name: {frame.name}")
-        
-        # Creating Casadi models and data for symbolic computing
-        self.cmodel = cpin.Model(self.reduced_robot.model)
-        self.cdata = self.cmodel.createData()
-
-        # Creating symbolic variables
-        self.cq = casadi.SX.sym("q", self.reduced_robot.model.nq, 1) 
-        self.cTf_l = casadi.SX.sym("tf_l", 4, 4)
-        self.cTf_r = casadi.SX.sym("tf_r", 4, 4)
-        cpin.framesForwardKinematics(self.cmodel, self.cdata, self.cq)
-
-        # Get the hand joint ID and define the error function
-        self.L_hand_id = self.reduced_robot.model.getFrameId("L_ee")
-        self.R_hand_id = self.reduced_robot.model.getFrameId("R_ee")
-
-        self.translational_error = casadi.Function(
-            "translational_error",
-            [self.cq, self.cTf_l, self.cTf_r],
-            [
-                casadi.vertcat(
-                    self.cdata.oMf[self.L_hand_id].translation - self.cTf_l[:3,3],
-                    self.cdata.oMf[self.R_hand_id].translation - self.cTf_r[:3,3]
-                )
-            ],
-        )
-        self.rotational_error = casadi.Function(
-            "rotational_error",
-            [self.cq, self.cTf_l, self.cTf_r],
-            [
-                casadi.vertcat(
-                    cpin.log3(self.cdata.oMf[self.L_hand_id].rotation @ self.cTf_l[:3,:3].T),
-                    cpin.log3(self.cdata.oMf[self.R_hand_id].rotation @ self.cTf_r[:3,:3].T)
-                )
-            ],
-        )
-
-        # Defining the optimization problem
-        self.opti = casadi.Opti()
-        self.var_q = self.opti.variable(self.reduced_robot.model.nq)
-        self.var_q_last = self.opti.parameter(self.reduced_robot.model.nq)   # for smooth
-        self.param_tf_l = self.opti.parameter(4, 4)
-        self.param_tf_r = self.opti.parameter(4, 4)
-        self.translational_cost = casadi.sumsqr(self.translational_error(self.var_q, self.param_tf_l, self.param_tf_r))
-        self.rotation_cost = casadi.sumsqr(self.rotational_error(self.var_q, self.param_tf_l, self.param_tf_r))
-        self.regularization_cost = casadi.sumsqr(self.var_q)
-        self.smooth_cost = casadi.sumsqr(self.var_q - self.var_q_last)
-
-        # Setting optimization constraints and goals
-        self.opti.subject_to(self.opti.bounded(
-            self.reduced_robot.model.lowerPositionLimit,
-            self.var_q,
-            self.reduced_robot.model.upperPositionLimit)
-        )
-        self.opti.minimize(50 * self.translational_cost + self.rotation_cost + 0.02 * self.regularization_cost + 0.1 * self.smooth_cost)
-
-        opts = {
-            'ipopt':{
-                'print_level':0,
-                'max_iter':50,
-                'tol':1e-6
-            },
-            'print_time':False,# print or not
-            'calc_lam_p':False # https://github.com/casadi/casadi/wiki/FAQ:-Why-am-I-getting-%22NaN-detected%22in-my-optimization%3F
-        }
-        self.opti.solver("ipopt", opts)
-
-        self.init_data = np.zeros(self.reduced_robot.model.nq)
-        self.smooth_filter = WeightedMovingFilter(np.array([0.4, 0.3, 0.2, 0.1]), 14)
-        self.vis = None
-
-        if self.Visualization:
-            # Initialize the Meshcat visualizer for visualization
-            self.vis = MeshcatVisualizer(self.reduced_robot.model, self.reduced_robot.collision_model, self.reduced_robot.visual_model)
-            self.vis.initViewer(open=True) 
-            self.vis.loadViewerModel("pinocchio") 
-            self.vis.displayFrames(True, frame_ids=[113, 114], axis_length = 0.15, axis_width = 5)
-            self.vis.display(pin.neutral(self.reduced_robot.model))
-
-            # Enable the display of end effector target frames with short axis lengths and greater width.
-            frame_viz_names = ['L_ee_target', 'R_ee_target']
-            FRAME_AXIS_POSITIONS = (
-                np.array([[0, 0, 0], [1, 0, 0],
-                          [0, 0, 0], [0, 1, 0],
-                          [0, 0, 0], [0, 0, 1]]).astype(np.float32).T
-            )
-            FRAME_AXIS_COLORS = (
-                np.array([[1, 0, 0], [1, 0.6, 0],
-                          [0, 1, 0], [0.6, 1, 0],
-                          [0, 0, 1], [0, 0.6, 1]]).astype(np.float32).T
-            )
-            axis_length = 0.1
-            axis_width = 10
-            for frame_viz_name in frame_viz_names:
-                self.vis.viewer[frame_viz_name].set_object(
-                    mg.LineSegments(
-                        mg.PointsGeometry(
-                            position=axis_length * FRAME_AXIS_POSITIONS,
-                            color=FRAME_AXIS_COLORS,
-                        ),
-                        mg.LineBasicMaterial(
-                            linewidth=axis_width,
-                            vertexColors=True,
-                        ),
-                    )
-                )
-    # If the robot arm is not the same size as your arm :)
-    def scale_arms(self, human_left_pose, human_right_pose, human_arm_length=0.60, robot_arm_length=0.75):
-        scale_factor = robot_arm_length / human_arm_length
-        robot_left_pose = human_left_pose.copy()
-        robot_right_pose = human_right_pose.copy()
-        robot_left_pose[:3, 3] *= scale_factor
-        robot_right_pose[:3, 3] *= scale_factor
-        return robot_left_pose, robot_right_pose
+            self.need_reseed = True
+        self.last_targets = targets
+        self.last_solve_time = now
+
+        if self.need_reseed:
+            self.need_reseed = False
+            seed_q = self.seed_table.query(left_wrist, right_wrist, self.init_data)
+            if float(self._pose_cost(seed_q, left_wrist, right_wrist)) < float(self._pose_cost(self.init_data, left_wrist, right_wrist)):
+                self.init_data = seed_q
+
+    def _last_iterations(self):
+        if self.last_solve_path == "dls":
+            return self.dls_solver.iterations
+        try:
+            if self.solver_backend == "nlpsol":
+                return self.nlp_solver.stats()['iter_count']
+            return self.opti.stats()['iter_count']
+        except Exception:
+            return -1
+
+    def _record_telemetry(self, start_time, sol_q, left_wrist, right_wrist, converged):
+        """Record the solve started at start_time, residuals are evaluated on the unfiltered solution sol_q."""
+        solve_time = time.perf_counter() - start_time
+        translational_error = self.translational_error(sol_q, left_wrist, right_wrist).full().ravel()
+        rotational_error = self.rotational_error(sol_q, left_wrist, right_wrist).full().ravel()
+        self.telemetry.record(solve_time,
+                              self._last_iterations(),
+                              max(np.linalg.norm(translational_error[:3]), np.linalg.norm(translational_error[3:])),
+                              max(np.linalg.norm(rotational_error[:3]), np.linalg.norm(rotational_error[3:])),
+                              self.last_solve_path if converged else "failed",
+                              dls_fallback = self.dls_solver is not None and self.last_solve_path == "ipopt")
 
     def solve_ik(self, left_wrist, right_wrist, current_lr_arm_motor_q = None, current_lr_arm_motor_dq = None):
         if current_lr_arm_motor_q is not None:
             self.init_data = current_lr_arm_motor_q
-        self.opti.set_initial(self.var_q, self.init_data)
 
-        left_wrist, right_wrist = self.scale_arms(left_wrist, right_wrist)
+        if self.spec.scale_arms:
+            left_wrist, right_wrist = self.scale_arms(left_wrist, right_wrist)
         if self.Visualization:
             self.vis.viewer['L_ee_target'].set_transform(left_wrist)   # for visualization
             self.vis.viewer['R_ee_target'].set_transform(right_wrist)  # for visualization
 
-        self.opti.set_value(self.param_tf_l, left_wrist)
-        self.opti.set_value(self.param_tf_r, right_wrist)
-        self.opti.set_value(self.var_q_last, self.init_data) # for smooth
-
+        start_time = time.perf_counter()
+        if self.seed_table is not None:
+            self._reseed(left_wrist, right_wrist)
         try:
-            sol = self.opti.solve()
-            # sol = self.opti.solve_limited()
-
-            sol_q = self.opti.value(self.var_q)
+            sol_q = self._solve_frame(left_wrist, right_wrist)
+            if self.telemetry is not None:
+                self._record_telemetry(start_time, sol_q, left_wrist, right_wrist, converged = True)
             self.smooth_filter.add_data(sol_q)
             sol_q = self.smooth_filter.filtered_data
 
@@ -717,7 +765,10 @@ class H1_2_ArmIK:
         except Exception as e:
             logger_mp.error(f"ERROR in convergence, plotting debug info.{e}")
 
-            sol_q = self.opti.debug.value(self.var_q)
+            sol_q = self._last_iterate()
+            self.need_reseed = True
+            if self.telemetry is not None:
+                self._record_telemetry(start_time, sol_q, left_wrist, right_wrist, converged = False)
             self.smooth_filter.add_data(sol_q)
             sol_q = self.smooth_filter.filtered_data
 
@@ -737,260 +788,106 @@ class H1_2_ArmIK:
             # return sol_q, sol_tauff
             return current_lr_arm_motor_q, np.zeros(self.reduced_robot.model.nv)
 
-class H1_ArmIK:
-    def __init__(self, Unit_Test = False, Visualization = False):
-        np.set_printoptions(precision=5, suppress=True, linewidth=200)
-
-        self.Unit_Test = Unit_Test
-        self.Visualization = Visualization
-
-        if not self.Unit_Test:
-            self.robot = pin.RobotWrapper.BuildFromURDF('../assets/h1/h1_with_hand.urdf', '../assets/h1/')
+    def solve_ik_batch(self, left_wrists, right_wrists, q0 = None, num_workers = None, overlap = 10):
+        """
+        Solve a whole trajectory offline, e.g. to relabel recorded episodes. Each frame is warm started from the previous solution.
+
+        left_wrists, right_wrists: [N,4,4] wrist poses, as passed to solve_ik.
+        q0: [nq] initial guess (and smooth reference) of the first frame, defaults to the current init_data.
+        num_workers: None or 1 solves serially in this process. Otherwise the trajectory is split into num_workers shards,
+                     solved by a process pool whose workers build their own solver (from the IK cache).
+        overlap: each shard except the first starts solving this many frames early and drops them, so that its first kept
+                 frame is warm started like in a serial run.
+
+        return: sol_q [N,nq], sol_tauff [N,nv] and success [N] (False where ipopt did not converge and the last iterate is used).
+                The smoothing filter of solve_ik is not applied, and the state used by solve_ik is left untouched.
+        """
+        left_wrists = np.array(left_wrists, dtype=np.float64)
+        right_wrists = np.array(right_wrists, dtype=np.float64)
+        if left_wrists.ndim != 3 or left_wrists.shape[1:] != (4, 4) or left_wrists.shape != right_wrists.shape:
+            raise ValueError(f"[{self.spec.name}_ArmIK] wrists must both be [N,4,4], got {left_wrists.shape} and {right_wrists.shape}")
+        q0 = np.array(self.init_data if q0 is None else q0, dtype=np.float64)
+        n = len(left_wrists)
+
+        if self.spec.scale_arms:
+            for i in range(len(left_wrists)):
+                left_wrists[i], right_wrists[i] = self.scale_arms(left_wrists[i], right_wrists[i])
+
+        start_time = time.time()
+        if num_workers is None or num_workers <= 1 or n < 2 * num_workers:
+            sol_q, sol_tauff, success = self._solve_trajectory(left_wrists, right_wrists, q0)
         else:
-            self.robot = pin.RobotWrapper.BuildFromURDF('../../assets/h1/h1_with_hand.urdf', '../../assets/h1/') # for test
-
-        self.mixed_jointsToLockIDs = [
-                                        "right_hip_roll_joint",
-                                        "right_hip_pitch_joint",
-                                        "right_knee_joint",
-                                        "left_hip_roll_joint",
-                                        "left_hip_pitch_joint",
-                                        "left_knee_joint",
-                                        "torso_joint",
-                                        "left_hip_yaw_joint",
-                                        "right_hip_yaw_joint",
-
-                                        "left_ankle_joint",
-                                        "right_ankle_joint",
-
-                                        "L_index_proximal_joint",
-                                        "L_index_intermediate_joint",
-                                        "L_middle_proximal_joint",
-                                        "L_middle_intermediate_joint",
-                                        "L_ring_proximal_joint",
-                                        "L_ring_intermediate_joint",
-                                        "L_pinky_proximal_joint",
-                                        "L_pinky_intermediate_joint",
-                                        "L_thumb_proximal_yaw_joint",
-                                        "L_thumb_proximal_pitch_joint",
-                                        "L_thumb_intermediate_joint",
-                                        "L_thumb_distal_joint",
-                                        
-                                        "R_index_proximal_joint",
-                                        "R_index_intermediate_joint",
-                                        "R_middle_proximal_joint",
-                                        "R_middle_intermediate_joint",
-                                        "R_ring_proximal_joint",
-                                        "R_ring_intermediate_joint",
-                                        "R_pinky_proximal_joint",
-                                        "R_pinky_intermediate_joint",
-                                        "R_thumb_proximal_yaw_joint",
-                                        "R_thumb_proximal_pitch_joint",
-                                        "R_thumb_intermediate_joint",
-                                        "R_thumb_distal_joint",
-
-                                        "left_hand_joint",
-                                        "right_hand_joint"  
-                                    ]
-
-        self.reduced_robot = self.robot.buildReducedRobot(
-            list_of_joints_to_lock=self.mixed_jointsToLockIDs,
-            reference_configuration=np.array([0.0] * self.robot.model.nq),
-        )
-
-        self.reduced_robot.model.addFrame(
-            pin.Frame('L_ee',
-                      self.reduced_robot.model.getJointId('left_elbow_joint'),
-                      pin.SE3(np.eye(3),
-                              np.array([0.2605 + 0.05,0,0]).T),
-                      pin.FrameType.OP_FRAME)
-        )
-        
-        self.reduced_robot.model.addFrame(
-            pin.Frame('R_ee',
-                      self.reduced_robot.model.getJointId('right_elbow_joint'),
-                      pin.SE3(np.eye(3),
-                              np.array([0.2605 + 0.05,0,0]).T),
-                      pin.FrameType.OP_FRAME)
-        )
-
-        # for i in range(self.reduced_robot.model.nframes):
-        #     frame = self.reduced_robot.model.frames[i]
-        #     frame_id = self.reduced_robot.model.getFrameId(frame.name)
-        #     logger_mp.debug(f"Frame ID: {frame_id}, Name: {frame.name}")
-        
-        # Creating Casadi models and data for symbolic computing
-        self.cmodel = cpin.Model(self.reduced_robot.model)
-        self.cdata = self.cmodel.createData()
-
-        # Creating symbolic variables
-        self.cq = casadi.SX.sym("q", self.reduced_robot.model.nq, 1) 
-        self.cTf_l = casadi.SX.sym("tf_l", 4, 4)
-        self.cTf_r = casadi.SX.sym("tf_r", 4, 4)
-        cpin.framesForwardKinematics(self.cmodel, self.cdata, self.cq)
-
-        # Get the hand joint ID and define the error function
-        self.L_hand_id = self.reduced_robot.model.getFrameId("L_ee")
-        self.R_hand_id = self.reduced_robot.model.getFrameId("R_ee")
-
-        self.translational_error = casadi.Function(
-            "translational_error",
-            [self.cq, self.cTf_l, self.cTf_r],
-            [
-                casadi.vertcat(
-                    self.cdata.oMf[self.L_hand_id].translation - self.cTf_l[:3,3],
-                    self.cdata.oMf[self.R_hand_id].translation - self.cTf_r[:3,3]
-                )
-            ],
-        )
-        self.rotational_error = casadi.Function(
-            "rotational_error",
-            [self.cq, self.cTf_l, self.cTf_r],
-            [
-                casadi.vertcat(
-                    cpin.log3(self.cdata.oMf[self.L_hand_id].rotation @ self.cTf_l[:3,:3].T),
-                    cpin.log3(self.cdata.oMf[self.R_hand_id].rotation @ self.cTf_r[:3,:3].T)
-                )
-            ],
-        )
-
-        # Defining the optimization problem
-        self.opti = casadi.Opti()
-        self.var_q = self.opti.variable(self.reduced_robot.model.nq)
-        self.var_q_last = self.opti.parameter(self.reduced_robot.model.nq)   # for smooth
-        self.param_tf_l = self.opti.parameter(4, 4)
-        self.param_tf_r = self.opti.parameter(4, 4)
-        self.translational_cost = casadi.sumsqr(self.translational_error(self.var_q, self.param_tf_l, self.param_tf_r))
-        self.rotation_cost = casadi.sumsqr(self.rotational_error(self.var_q, self.param_tf_l, self.param_tf_r))
-        self.regularization_cost = casadi.sumsqr(self.var_q)
-        self.smooth_cost = casadi.sumsqr(self.var_q - self.var_q_last)
-
-        # Setting optimization constraints and goals
-        self.opti.subject_to(self.opti.bounded(
-            self.reduced_robot.model.lowerPositionLimit,
-            self.var_q,
-            self.reduced_robot.model.upperPositionLimit)
-        )
-        self.opti.minimize(50 * self.translational_cost + 0.5 * self.rotation_cost + 0.02 * self.regularization_cost + 0.1 * self.smooth_cost)
-
-        opts = {
-            'ipopt':{
-                'print_level':0,
-                'max_iter':50,
-                'tol':1e-6
-            },
-            'print_time':False,# print or not
-            'calc_lam_p':False # https://github.com/casadi/casadi/wiki/FAQ:-Why-am-I-getting-%22NaN-detected%22in-my-optimization%3F
-        }
-        self.opti.solver("ipopt", opts)
-
-        self.init_data = np.zeros(self.reduced_robot.model.nq)
-        self.smooth_filter = WeightedMovingFilter(np.array([0.4, 0.3, 0.2, 0.1]), 8)
-        self.vis = None
-
-        if self.Visualization:
-            # Initialize the Meshcat visualizer for visualization
-            self.vis = MeshcatVisualizer(self.reduced_robot.model, self.reduced_robot.collision_model, self.reduced_robot.visual_model)
-            self.vis.initViewer(open=True) 
-            self.vis.loadViewerModel("pinocchio") 
-            self.vis.displayFrames(True, frame_ids=[105, 106], axis_length = 0.15, axis_width = 5)
-            self.vis.display(pin.neutral(self.reduced_robot.model))
-
-            # Enable the display of end effector target frames with short axis lengths and greater width.
-            frame_viz_names = ['L_ee_target', 'R_ee_target']
-            FRAME_AXIS_POSITIONS = (
-                np.array([[0, 0, 0], [1, 0, 0],
-                          [0, 0, 0], [0, 1, 0],
-                          [0, 0, 0], [0, 0, 1]]).astype(np.float32).T
-            )
-            FRAME_AXIS_COLORS = (
-                np.array([[1.0, 0.3, 0.3], [1.0, 0.7, 0.7],
-                          [0.3, 1.0, 0.5], [0.7, 1.0, 0.8],
-                          [0.3, 0.8, 1.0], [0.7, 0.9, 1.0]]).astype(np.float32).T
-            )
-            axis_length = 0.1
-            axis_width = 10
-            for frame_viz_name in frame_viz_names:
-                self.vis.viewer[frame_viz_name].set_object(
-                    mg.LineSegments(
-                        mg.PointsGeometry(
-                            position=axis_length * FRAME_AXIS_POSITIONS,
-                            color=FRAME_AXIS_COLORS,
-                        ),
-                        mg.LineBasicMaterial(
-                            linewidth=axis_width,
-                            vertexColors=True,
-                        ),
-                    )
-                )
-    # If the robot arm is not the same size as your arm :)
-    def scale_arms(self, human_left_pose, human_right_pose, human_arm_length=0.60, robot_arm_length=0.75):
-        scale_factor = robot_arm_length / human_arm_length
-        robot_left_pose = human_left_pose.copy()
-        robot_right_pose = human_right_pose.copy()
-        robot_left_pose[:3, 3] *= scale_factor
-        robot_right_pose[:3, 3] *= scale_factor
-        return robot_left_pose, robot_right_pose
-
-    def solve_ik(self, left_wrist, right_wrist, current_lr_arm_motor_q = None, current_lr_arm_motor_dq = None):
-        if current_lr_arm_motor_q is not None:
-            self.init_data = current_lr_arm_motor_q
-        self.opti.set_initial(self.var_q, self.init_data)
-
-        left_wrist, right_wrist = self.scale_arms(left_wrist, right_wrist)
-        if self.Visualization:
-            self.vis.viewer['L_ee_target'].set_transform(left_wrist)   # for visualization
-            self.vis.viewer['R_ee_target'].set_transform(right_wrist)  # for visualization
-
-        self.opti.set_value(self.param_tf_l, left_wrist)
-        self.opti.set_value(self.param_tf_r, right_wrist)
-        self.opti.set_value(self.var_q_last, self.init_data) # for smooth
-
+            bounds = np.linspace(0, n, num_workers + 1).astype(int)
+            with ProcessPoolExecutor(max_workers = num_workers, initializer = _batch_worker_init,
+                                     initargs = (self.spec, self.Unit_Test, self.build_kwargs)) as pool:
+                futures = []
+                for start, end in zip(bounds[:-1], bounds[1:]):
+                    warm_start = max(0, start - overlap)
+                    futures.append(pool.submit(_batch_worker_solve, left_wrists[warm_start:end], right_wrists[warm_start:end],
+                                               q0, start - warm_start))
+                results = [future.result() for future in futures]
+            sol_q, sol_tauff, success = (np.concatenate(arrays) for arrays in zip(*results))
+
+        logger_mp.info(f"[{self.spec.name}_ArmIK] Solved {n} frames in {time.time() - start_time:.2f}s, "
+                       f"{n - np.count_nonzero(success)} did not converge")
+        return sol_q, sol_tauff, success
+
+    def _solve_trajectory(self, left_wrists, right_wrists, q0):
+        """Serial part of solve_ik_batch, poses are already scaled."""
+        model = self.reduced_robot.model
+        n = len(left_wrists)
+        sol_q = np.zeros((n, model.nq))
+        sol_tauff = np.zeros((n, model.nv))
+        success = np.ones(n, dtype=bool)
+        zeros = np.zeros(model.nv)
+
+        saved_init_data = self.init_data
+        if self.solver_backend == "nlpsol":
+            saved_lam_x = self.nlp_lam_x.copy()
+            self.nlp_lam_x = np.zeros(model.nq)
+        self.init_data = q0
         try:
-            sol = self.opti.solve()
-            # sol = self.opti.solve_limited()
-
-            sol_q = self.opti.value(self.var_q)
-            self.smooth_filter.add_data(sol_q)
-            sol_q = self.smooth_filter.filtered_data
-
-            if current_lr_arm_motor_dq is not None:
-                v = current_lr_arm_motor_dq * 0.0
-            else:
-                v = (sol_q - self.init_data) * 0.0
-
-            self.init_data = sol_q
+            for i in range(n):
+                try:
+                    q = self._solve_frame(left_wrists[i], right_wrists[i])
+                except Exception:
+                    q = self._last_iterate()
+                    success[i] = False
+                sol_q[i] = q
+                sol_tauff[i] = pin.rnea(model, self.reduced_robot.data, q, zeros, zeros)
+                self.init_data = sol_q[i]
+        finally:
+            self.init_data = saved_init_data
+            if self.solver_backend == "nlpsol":
+                self.nlp_lam_x = saved_lam_x
+        return sol_q, sol_tauff, success
+
+_batch_worker_ik = None
+
+def _batch_worker_init(spec, Unit_Test, build_kwargs):
+    global _batch_worker_ik
+    _batch_worker_ik = ArmIK(spec, Unit_Test, False, **build_kwargs)
+
+def _batch_worker_solve(left_wrists, right_wrists, q0, skip):
+    sol_q, sol_tauff, success = _batch_worker_ik._solve_trajectory(left_wrists, right_wrists, q0)
+    return sol_q[skip:], sol_tauff[skip:], success[skip:]
+
+class G1_29_ArmIK(ArmIK):
+    def __init__(self, Unit_Test = False, Visualization = False, **kwargs):
+        super().__init__(G1_29_ARM_IK_SPEC, Unit_Test, Visualization, **kwargs)
+
+class G1_23_ArmIK(ArmIK):
+    def __init__(self, Unit_Test = False, Visualization = False, **kwargs):
+        super().__init__(G1_23_ARM_IK_SPEC, Unit_Test, Visualization, **kwargs)
+
+class H1_2_ArmIK(ArmIK):
+    def __init__(self, Unit_Test = False, Visualization = False, **kwargs):
+        super().__init__(H1_2_ARM_IK_SPEC, Unit_Test, Visualization, **kwargs)
+
+class H1_ArmIK(ArmIK):
+    def __init__(self, Unit_Test = False, Visualization = False, **kwargs):
+        super().__init__(H1_ARM_IK_SPEC, Unit_Test, Visualization, **kwargs)
 
-            sol_tauff = pin.rnea(self.reduced_robot.model, self.reduced_robot.data, sol_q, v, np.zeros(self.reduced_robot.model.nv))
-
-            if self.Visualization:
-                self.vis.display(sol_q)  # for visualization
-
-            return sol_q, sol_tauff
-        
-        except Exception as e:
-            logger_mp.error(f"ERROR in convergence, plotting debug info.{e}")
-
-            sol_q = self.opti.debug.value(self.var_q)
-            self.smooth_filter.add_data(sol_q)
-            sol_q = self.smooth_filter.filtered_data
-
-            if current_lr_arm_motor_dq is not None:
-                v = current_lr_arm_motor_dq * 0.0
-            else:
-                v = (sol_q - self.init_data) * 0.0
-
-            self.init_data = sol_q
-
-            sol_tauff = pin.rnea(self.reduced_robot.model, self.reduced_robot.data, sol_q, v, np.zeros(self.reduced_robot.model.nv))
-
-            logger_mp.error(f"sol_q:{sol_q} \nmotorstate: \n{current_lr_arm_motor_q} \nleft_pose: \n{left_wrist} \nright_pose: \n{right_wrist}")
-            if self.Visualization:
-                self.vis.display(sol_q)  # for visualization
-
-            # return sol_q, sol_tauff
-            return current_lr_arm_motor_q, np.zeros(self.reduced_robot.model.nv)
-        
 if __name__ == "__main__":
     arm_ik = G1_29_ArmIK(Unit_Test = True, Visualization = True)
     # arm_ik = H1_2_ArmIK(Unit_Test = True, Visualization = True)
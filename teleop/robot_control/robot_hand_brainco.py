@@ -1,13 +1,16 @@
-from unitree_sdk2py.core.channel import ChannelPublisher, ChannelSubscriber, ChannelFactoryInitialize # dds
+from unitree_sdk2py.core.channel import ChannelPublisher, ChannelFactoryInitialize # dds
 from unitree_sdk2py.idl.unitree_go.msg.dds_ import MotorCmds_, MotorStates_                           # idl
 from unitree_sdk2py.idl.default import unitree_go_msg_dds__MotorCmd_
 
-from teleop.robot_control.hand_retargeting import HandRetargeting, HandType
+from teleop.robot_control.hand_retargeting import get_hand_retargeting, HandType
+from teleop.robot_control.hand_retarget_worker import HandRetargetWorker
+from teleop.robot_control.hand_command import JointRangeNormalizer, MotorCmdPacker
+from teleop.utils.dds_subscription import StateSubscription
+from teleop.utils.shm_channel import ShmChannel, ShmChannelReader, wait_for_frames
 import numpy as np
 from enum import IntEnum
-import threading
 import time
-from multiprocessing import Process, Array
+from multiprocessing import Process
 
 import logging_mp
 logger_mp = logging_mp.get_logger(__name__)
@@ -17,21 +20,25 @@ kTopicbraincoLeftCommand = "rt/brainco/left/cmd"
 kTopicbraincoLeftState = "rt/brainco/left/state"
 kTopicbraincoRightCommand = "rt/brainco/right/cmd"
 kTopicbraincoRightState = "rt/brainco/right/state"
+# joint ranges (rad) of the retargeted q_target, see control_process
+Brainco_Normalizer = JointRangeNormalizer(lower = [0.0] * brainco_Num_Motors, upper = [1.52, 1.05, 1.47, 1.47, 1.47, 1.47], open_value = 0.0)
 
 class Brainco_Controller:
-    def __init__(self, left_hand_array, right_hand_array, dual_hand_data_lock = None, dual_hand_state_array = None,
-                       dual_hand_action_array = None, fps = 100.0, Unit_Test = False, simulation_mode = False,
-                       dds_interface: str = "enx98fc84ec937b"):
+    def __init__(self, left_hand_channel, right_hand_channel, dual_hand_data_channel = None, fps = 100.0, Unit_Test = False, simulation_mode = False,
+                       dds_interface: str = "enx98fc84ec937b", input_driven = False,
+                       parallel_retargeting = False):
         logger_mp.info("Initialize Brainco_Controller...")
         self.fps = fps
-        self.hand_sub_ready = False
+        self.input_driven = input_driven  # retarget on arrival of a new skeleton, see Dex3_1_Controller
         self.Unit_Test = Unit_Test
         self.simulation_mode = simulation_mode
 
         if not self.Unit_Test:
-            self.hand_retargeting = HandRetargeting(HandType.BRAINCO_HAND)
+            self.hand_retargeting = get_hand_retargeting(HandType.BRAINCO_HAND)
         else:
-            self.hand_retargeting = HandRetargeting(HandType.BRAINCO_HAND_Unit_Test)
+            self.hand_retargeting = get_hand_retargeting(HandType.BRAINCO_HAND_Unit_Test)
+        # the right hand is retargeted in a worker process, concurrently with the left hand
+        self.right_retarget_worker = HandRetargetWorker(self.hand_retargeting) if parallel_retargeting else None
 
         if self.simulation_mode:
             ChannelFactoryInitialize(1)
@@ -44,63 +51,55 @@ class Brainco_Controller:
         self.RightHandCmb_publisher = ChannelPublisher(kTopicbraincoRightCommand, MotorCmds_)
         self.RightHandCmb_publisher.Init()
 
-        self.LeftHandState_subscriber = ChannelSubscriber(kTopicbraincoLeftState, MotorStates_)
-        self.LeftHandState_subscriber.Init()
-        self.RightHandState_subscriber = ChannelSubscriber(kTopicbraincoRightState, MotorStates_)
-        self.RightHandState_subscriber.Init()
+        # Shared memory channels for hand states
+        self.left_hand_state_channel  = ShmChannel(brainco_Num_Motors)
+        self.right_hand_state_channel = ShmChannel(brainco_Num_Motors)
 
-        # Shared Arrays for hand states
-        self.left_hand_state_array  = Array('d', brainco_Num_Motors, lock=True)  
-        self.right_hand_state_array = Array('d', brainco_Num_Motors, lock=True)
-
-        # initialize subscribe thread
-        self.subscribe_state_thread = threading.Thread(target=self._subscribe_hand_state)
-        self.subscribe_state_thread.daemon = True
-        self.subscribe_state_thread.start()
-
-        while not self.hand_sub_ready:
-            time.sleep(0.1)
+        self.LeftHandState_subscription = StateSubscription(kTopicbraincoLeftState, MotorStates_, self._on_left_hand_state)
+        self.RightHandState_subscription = StateSubscription(kTopicbraincoRightState, MotorStates_, self._on_right_hand_state)
+        while not (self.LeftHandState_subscription.wait_for_sample(timeout = 0.1) and
+                   self.RightHandState_subscription.wait_for_sample(timeout = 0.1)):
             logger_mp.warning("[brainco_Controller] Waiting to subscribe dds...")
         logger_mp.info("[brainco_Controller] Subscribe dds ok.")
 
-        hand_control_process = Process(target=self.control_process, args=(left_hand_array, right_hand_array,  self.left_hand_state_array, self.right_hand_state_array,
-                                                                          dual_hand_data_lock, dual_hand_state_array, dual_hand_action_array))
+        hand_control_process = Process(target=self.control_process, args=(left_hand_channel, right_hand_channel, self.left_hand_state_channel, self.right_hand_state_channel,
+                                                                          dual_hand_data_channel))
         hand_control_process.daemon = True
         hand_control_process.start()
 
         logger_mp.info("Initialize brainco_Controller OK!\n")
 
-    def _subscribe_hand_state(self):
-        while True:
-            left_hand_msg  = self.LeftHandState_subscriber.Read()
-            right_hand_msg = self.RightHandState_subscriber.Read()
-            self.hand_sub_ready = True
-            if left_hand_msg is not None and right_hand_msg is not None:
-                # Update left hand state
-                for idx, id in enumerate(Brainco_Left_Hand_JointIndex):
-                    self.left_hand_state_array[idx] = left_hand_msg.states[id].q
-                # Update right hand state
-                for idx, id in enumerate(Brainco_Right_Hand_JointIndex):
-                    self.right_hand_state_array[idx] = right_hand_msg.states[id].q
-            time.sleep(0.002)
+    def _on_left_hand_state(self, msg):
+        self.left_hand_state_channel.write([msg.states[id].q for id in Brainco_Left_Hand_JointIndex])
+
+    def _on_right_hand_state(self, msg):
+        self.right_hand_state_channel.write([msg.states[id].q for id in Brainco_Right_Hand_JointIndex])
 
     def ctrl_dual_hand(self, left_q_target, right_q_target):
         """
         Set current left, right hand motor state target q
         """
-        for idx, id in enumerate(Brainco_Left_Hand_JointIndex):             
-            self.left_hand_msg.cmds[id].q = left_q_target[idx]
-        for idx, id in enumerate(Brainco_Right_Hand_JointIndex):             
-            self.right_hand_msg.cmds[id].q = right_q_target[idx] 
+        self.left_cmd_packer.pack(left_q_target)
+        self.right_cmd_packer.pack(right_q_target)
 
         self.LeftHandCmb_publisher.Write(self.left_hand_msg)
         self.RightHandCmb_publisher.Write(self.right_hand_msg)
         # logger_mp.debug("hand ctrl publish ok.")
     
-    def control_process(self, left_hand_array, right_hand_array, left_hand_state_array, right_hand_state_array,
-                              dual_hand_data_lock = None, dual_hand_state_array = None, dual_hand_action_array = None):
+    def control_process(self, left_hand_channel, right_hand_channel, left_hand_state_channel, right_hand_state_channel,
+                              dual_hand_data_channel = None):
         self.running = True
 
+        # skeletons are only retargeted when they changed since the last retargeting
+        left_hand_input  = ShmChannelReader(left_hand_channel)
+        right_hand_input = ShmChannelReader(right_hand_channel)
+        input_changed = False
+        retarget_ticks = 0
+        ticks = 0
+        # state and action are written from this buffer, no allocation per tick
+        hand_data = np.zeros((2, 2 * brainco_Num_Motors))
+        state_data, action_data = hand_data
+
         left_q_target  = np.full(brainco_Num_Motors, 0)
         right_q_target = np.full(brainco_Num_Motors, 0)
 
@@ -116,60 +115,66 @@ class Brainco_Controller:
         for idx, id in enumerate(Brainco_Right_Hand_JointIndex):
             self.right_hand_msg.cmds[id].q = 0.0
             self.right_hand_msg.cmds[id].dq = 1.0
+        self.left_cmd_packer = MotorCmdPacker(self.left_hand_msg.cmds, Brainco_Left_Hand_JointIndex)
+        self.right_cmd_packer = MotorCmdPacker(self.right_hand_msg.cmds, Brainco_Right_Hand_JointIndex)
 
+        deadline = time.monotonic() + 1 / self.fps
         try:
             while self.running:
                 start_time = time.time()
+                if self.input_driven:
+                    wait_for_frames((left_hand_input, right_hand_input), deadline)
                 # get dual hand state
-                with left_hand_array.get_lock():
-                    left_hand_data  = np.array(left_hand_array[:]).reshape(25, 3).copy()
-                with right_hand_array.get_lock():
-                    right_hand_data = np.array(right_hand_array[:]).reshape(25, 3).copy()
-
-                # Read left and right q_state from shared arrays
-                state_data = np.concatenate((np.array(left_hand_state_array[:]), np.array(right_hand_state_array[:])))
-
-                if not np.all(right_hand_data == 0.0) and not np.all(left_hand_data[4] == np.array([-1.13, 0.3, 0.15])): # if hand data has been initialized.
+                input_changed |= left_hand_input.poll()
+                input_changed |= right_hand_input.poll()
+                left_hand_data  = left_hand_input.frame
+                right_hand_data = right_hand_input.frame
+
+                # Read left and right q_state from shared memory
+                left_hand_state_channel.read(out = state_data[:brainco_Num_Motors])
+                right_hand_state_channel.read(out = state_data[brainco_Num_Motors:])
+
+                ticks += 1
+                if input_changed and not np.all(right_hand_data == 0.0) and not np.all(left_hand_data[4] == np.array([-1.13, 0.3, 0.15])): # if hand data has been initialized.
+                    input_changed = False
+                    retarget_ticks += 1
+                    if self.right_retarget_worker is not None:
+                        self.right_retarget_worker.submit(right_hand_data)
                     ref_left_value = left_hand_data[self.hand_retargeting.left_indices[1,:]] - left_hand_data[self.hand_retargeting.left_indices[0,:]]
-                    ref_right_value = right_hand_data[self.hand_retargeting.right_indices[1,:]] - right_hand_data[self.hand_retargeting.right_indices[0,:]]
-
                     left_q_target  = self.hand_retargeting.left_retargeting.retarget(ref_left_value)[self.hand_retargeting.left_dex_retargeting_to_hardware]
-                    right_q_target = self.hand_retargeting.right_retargeting.retarget(ref_right_value)[self.hand_retargeting.right_dex_retargeting_to_hardware]
+                    if self.right_retarget_worker is not None:
+                        right_q_target = self.right_retarget_worker.result()
+                    else:
+                        ref_right_value = right_hand_data[self.hand_retargeting.right_indices[1,:]] - right_hand_data[self.hand_retargeting.right_indices[0,:]]
+                        right_q_target = self.hand_retargeting.right_retargeting.retarget(ref_right_value)[self.hand_retargeting.right_dex_retargeting_to_hardware]
 
                     # In the official document, the angles are in the range [0, 1] ==> 0.0: fully open  1.0: fully closed
                     # The q_target now is in radians, ranges:
                     #     - idx 0:   0~1.52
                     #     - idx 1:   0~1.05
                     #     - idx 2~5: 0~1.47
-                    # We normalize them using (max - value) / range
-                    def normalize(val, min_val, max_val):
-                        return 1.0 - np.clip((max_val - val) / (max_val - min_val), 0.0, 1.0)
-
-                    for idx in range(brainco_Num_Motors):
-                        if idx == 0:
-                            left_q_target[idx]  = normalize(left_q_target[idx], 0.0, 1.52)
-                            right_q_target[idx] = normalize(right_q_target[idx], 0.0, 1.52)
-                        elif idx == 1:
-                            left_q_target[idx]  = normalize(left_q_target[idx], 0.0, 1.05)
-                            right_q_target[idx] = normalize(right_q_target[idx], 0.0, 1.05)
-                        elif idx >= 2:
-                            left_q_target[idx]  = normalize(left_q_target[idx], 0.0, 1.47)
-                            right_q_target[idx] = normalize(right_q_target[idx], 0.0, 1.47)
+                    # We normalize them using 1 - (max - value) / range = (value - min) / range
+                    Brainco_Normalizer(left_q_target, out = left_q_target)
+                    Brainco_Normalizer(right_q_target, out = right_q_target)
 
                 # get dual hand action
-                action_data = np.concatenate((left_q_target, right_q_target))    
-                if dual_hand_state_array and dual_hand_action_array:
-                    with dual_hand_data_lock:
-                        dual_hand_state_array[:] = state_data
-                        dual_hand_action_array[:] = action_data
+                action_data[:brainco_Num_Motors] = left_q_target
+                action_data[brainco_Num_Motors:] = right_q_target
+                if dual_hand_data_channel is not None:
+                    dual_hand_data_channel.write(hand_data)
                 # logger_mp.info(f"left_q_target:{left_q_target}")
                 self.ctrl_dual_hand(left_q_target, right_q_target)
-                current_time = time.time()
-                time_elapsed = current_time - start_time
-                sleep_time = max(0, (1 / self.fps) - time_elapsed)
-                time.sleep(sleep_time)
+                if self.input_driven:
+                    deadline = time.monotonic() + 1 / self.fps
+                else:
+                    current_time = time.time()
+                    time_elapsed = current_time - start_time
+                    sleep_time = max(0, (1 / self.fps) - time_elapsed)
+                    time.sleep(sleep_time)
         finally:
-            logger_mp.info("brainco_Controller has been closed.")
+            if self.right_retarget_worker is not None:
+                self.right_retarget_worker.stop()
+            logger_mp.info(f"brainco_Controller has been closed, retargeted on {retarget_ticks} of {ticks} ticks.")
 
 # according to the official documentation, https://www.brainco-hz.com/docs/revolimb-hand/product/parameters.html
 # the motor sequence is as shown in the table below
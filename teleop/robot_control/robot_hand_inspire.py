@@ -1,13 +1,16 @@
-from unitree_sdk2py.core.channel import ChannelPublisher, ChannelSubscriber, ChannelFactoryInitialize # dds
+from unitree_sdk2py.core.channel import ChannelPublisher, ChannelFactoryInitialize # dds
 from unitree_sdk2py.idl.unitree_go.msg.dds_ import MotorCmds_, MotorStates_                           # idl
 from unitree_sdk2py.idl.default import unitree_go_msg_dds__MotorCmd_
 
-from teleop.robot_control.hand_retargeting import HandRetargeting, HandType
+from teleop.robot_control.hand_retargeting import get_hand_retargeting, HandType
+from teleop.robot_control.hand_retarget_worker import HandRetargetWorker
+from teleop.robot_control.hand_command import JointRangeNormalizer, MotorCmdPacker
+from teleop.utils.dds_subscription import StateSubscription
+from teleop.utils.shm_channel import ShmChannel, ShmChannelReader, wait_for_frames
 import numpy as np
 from enum import IntEnum
-import threading
 import time
-from multiprocessing import Process, Array
+from multiprocessing import Process
 
 import logging_mp
 logger_mp = logging_mp.get_logger(__name__)
@@ -15,19 +18,24 @@ logger_mp = logging_mp.get_logger(__name__)
 Inspire_Num_Motors = 6
 kTopicInspireCommand = "rt/inspire/cmd"
 kTopicInspireState = "rt/inspire/state"
+# joint ranges (rad) of the retargeted q_target, see control_process
+Inspire_Normalizer = JointRangeNormalizer(lower = [0.0, 0.0, 0.0, 0.0, 0.0, -0.1], upper = [1.7, 1.7, 1.7, 1.7, 0.5, 1.3], open_value = 1.0)
 
 class Inspire_Controller:
-    def __init__(self, left_hand_array, right_hand_array, dual_hand_data_lock = None, dual_hand_state_array = None,
-                       dual_hand_action_array = None, fps = 100.0, Unit_Test = False, simulation_mode = False,
-                       dds_interface: str = "enx98fc84ec937b"):
+    def __init__(self, left_hand_channel, right_hand_channel, dual_hand_data_channel = None, fps = 100.0, Unit_Test = False, simulation_mode = False,
+                       dds_interface: str = "enx98fc84ec937b", input_driven = False,
+                       parallel_retargeting = False):
         logger_mp.info("Initialize Inspire_Controller...")
         self.fps = fps
+        self.input_driven = input_driven  # retarget on arrival of a new skeleton, see Dex3_1_Controller
         self.Unit_Test = Unit_Test
         self.simulation_mode = simulation_mode
         if not self.Unit_Test:
-            self.hand_retargeting = HandRetargeting(HandType.INSPIRE_HAND)
+            self.hand_retargeting = get_hand_retargeting(HandType.INSPIRE_HAND)
         else:
-            self.hand_retargeting = HandRetargeting(HandType.INSPIRE_HAND_Unit_Test)
+            self.hand_retargeting = get_hand_retargeting(HandType.INSPIRE_HAND_Unit_Test)
+        # the right hand is retargeted in a worker process, concurrently with the left hand
+        self.right_retarget_worker = HandRetargetWorker(self.hand_retargeting) if parallel_retargeting else None
 
         if self.simulation_mode:
             ChannelFactoryInitialize(1)
@@ -38,58 +46,50 @@ class Inspire_Controller:
         self.HandCmb_publisher = ChannelPublisher(kTopicInspireCommand, MotorCmds_)
         self.HandCmb_publisher.Init()
 
-        self.HandState_subscriber = ChannelSubscriber(kTopicInspireState, MotorStates_)
-        self.HandState_subscriber.Init()
+        # Shared memory channel for hand states: left, right
+        self.hand_state_channel = ShmChannel((2, Inspire_Num_Motors))
 
-        # Shared Arrays for hand states
-        self.left_hand_state_array  = Array('d', Inspire_Num_Motors, lock=True)  
-        self.right_hand_state_array = Array('d', Inspire_Num_Motors, lock=True)
+        self.HandState_subscription = StateSubscription(kTopicInspireState, MotorStates_, self._on_hand_state)
 
-        # initialize subscribe thread
-        self.subscribe_state_thread = threading.Thread(target=self._subscribe_hand_state)
-        self.subscribe_state_thread.daemon = True
-        self.subscribe_state_thread.start()
-
-        while True:
-            if any(self.right_hand_state_array): # any(self.left_hand_state_array) and 
-                break
-            time.sleep(0.01)
+        while not self.HandState_subscription.wait_for_sample(timeout = 0.01):
             logger_mp.warning("[Inspire_Controller] Waiting to subscribe dds...")
         logger_mp.info("[Inspire_Controller] Subscribe dds ok.")
 
-        hand_control_process = Process(target=self.control_process, args=(left_hand_array, right_hand_array,  self.left_hand_state_array, self.right_hand_state_array,
-                                                                          dual_hand_data_lock, dual_hand_state_array, dual_hand_action_array))
+        hand_control_process = Process(target=self.control_process, args=(left_hand_channel, right_hand_channel, self.hand_state_channel,
+                                                                          dual_hand_data_channel))
         hand_control_process.daemon = True
         hand_control_process.start()
 
         logger_mp.info("Initialize Inspire_Controller OK!\n")
 
-    def _subscribe_hand_state(self):
-        while True:
-            hand_msg  = self.HandState_subscriber.Read()
-            if hand_msg is not None:
-                for idx, id in enumerate(Inspire_Left_Hand_JointIndex):
-                    self.left_hand_state_array[idx] = hand_msg.states[id].q
-                for idx, id in enumerate(Inspire_Right_Hand_JointIndex):
-                    self.right_hand_state_array[idx] = hand_msg.states[id].q
-            time.sleep(0.002)
+    def _on_hand_state(self, msg):
+        self.hand_state_channel.write([[msg.states[id].q for id in Inspire_Left_Hand_JointIndex],
+                                       [msg.states[id].q for id in Inspire_Right_Hand_JointIndex]])
 
     def ctrl_dual_hand(self, left_q_target, right_q_target):
         """
         Set current left, right hand motor state target q
         """
-        for idx, id in enumerate(Inspire_Left_Hand_JointIndex):             
-            self.hand_msg.cmds[id].q = left_q_target[idx]         
-        for idx, id in enumerate(Inspire_Right_Hand_JointIndex):             
-            self.hand_msg.cmds[id].q = right_q_target[idx] 
+        self.left_cmd_packer.pack(left_q_target)
+        self.right_cmd_packer.pack(right_q_target)
 
         self.HandCmb_publisher.Write(self.hand_msg)
         # logger_mp.debug("hand ctrl publish ok.")
     
-    def control_process(self, left_hand_array, right_hand_array, left_hand_state_array, right_hand_state_array,
-                              dual_hand_data_lock = None, dual_hand_state_array = None, dual_hand_action_array = None):
+    def control_process(self, left_hand_channel, right_hand_channel, hand_state_channel,
+                              dual_hand_data_channel = None):
         self.running = True
 
+        # skeletons are only retargeted when they changed since the last retargeting
+        left_hand_input  = ShmChannelReader(left_hand_channel)
+        right_hand_input = ShmChannelReader(right_hand_channel)
+        input_changed = False
+        retarget_ticks = 0
+        ticks = 0
+        # state and action are written from this buffer, no allocation per tick
+        hand_data = np.zeros((2, 2 * Inspire_Num_Motors))
+        state_data, action_data = hand_data
+
         left_q_target  = np.full(Inspire_Num_Motors, 1.0)
         right_q_target = np.full(Inspire_Num_Motors, 1.0)
 
@@ -97,29 +97,39 @@ class Inspire_Controller:
         self.hand_msg  = MotorCmds_()
         self.hand_msg.cmds = [unitree_go_msg_dds__MotorCmd_() for _ in range(len(Inspire_Right_Hand_JointIndex) + len(Inspire_Left_Hand_JointIndex))]
 
-        for idx, id in enumerate(Inspire_Left_Hand_JointIndex):
-            self.hand_msg.cmds[id].q = 1.0
-        for idx, id in enumerate(Inspire_Right_Hand_JointIndex):
-            self.hand_msg.cmds[id].q = 1.0
+        self.left_cmd_packer = MotorCmdPacker(self.hand_msg.cmds, Inspire_Left_Hand_JointIndex)
+        self.right_cmd_packer = MotorCmdPacker(self.hand_msg.cmds, Inspire_Right_Hand_JointIndex)
+        self.left_cmd_packer.pack(left_q_target)
+        self.right_cmd_packer.pack(right_q_target)
 
+        deadline = time.monotonic() + 1 / self.fps
         try:
             while self.running:
                 start_time = time.time()
+                if self.input_driven:
+                    wait_for_frames((left_hand_input, right_hand_input), deadline)
                 # get dual hand state
-                with left_hand_array.get_lock():
-                    left_hand_data  = np.array(left_hand_array[:]).reshape(25, 3).copy()
-                with right_hand_array.get_lock():
-                    right_hand_data = np.array(right_hand_array[:]).reshape(25, 3).copy()
-
-                # Read left and right q_state from shared arrays
-                state_data = np.concatenate((np.array(left_hand_state_array[:]), np.array(right_hand_state_array[:])))
-
-                if not np.all(right_hand_data == 0.0) and not np.all(left_hand_data[4] == np.array([-1.13, 0.3, 0.15])): # if hand data has been initialized.
+                input_changed |= left_hand_input.poll()
+                input_changed |= right_hand_input.poll()
+                left_hand_data  = left_hand_input.frame
+                right_hand_data = right_hand_input.frame
+
+                # Read left and right q_state from shared memory
+                hand_state_channel.read(out = state_data.reshape(2, Inspire_Num_Motors))
+
+                ticks += 1
+                if input_changed and not np.all(right_hand_data == 0.0) and not np.all(left_hand_data[4] == np.array([-1.13, 0.3, 0.15])): # if hand data has been initialized.
+                    input_changed = False
+                    retarget_ticks += 1
+                    if self.right_retarget_worker is not None:
+                        self.right_retarget_worker.submit(right_hand_data)
                     ref_left_value = left_hand_data[self.hand_retargeting.left_indices[1,:]] - left_hand_data[self.hand_retargeting.left_indices[0,:]]
-                    ref_right_value = right_hand_data[self.hand_retargeting.right_indices[1,:]] - right_hand_data[self.hand_retargeting.right_indices[0,:]]
-
                     left_q_target  = self.hand_retargeting.left_retargeting.retarget(ref_left_value)[self.hand_retargeting.left_dex_retargeting_to_hardware]
-                    right_q_target = self.hand_retargeting.right_retargeting.retarget(ref_right_value)[self.hand_retargeting.right_dex_retargeting_to_hardware]
+                    if self.right_retarget_worker is not None:
+                        right_q_target = self.right_retarget_worker.result()
+                    else:
+                        ref_right_value = right_hand_data[self.hand_retargeting.right_indices[1,:]] - right_hand_data[self.hand_retargeting.right_indices[0,:]]
+                        right_q_target = self.hand_retargeting.right_retargeting.retarget(ref_right_value)[self.hand_retargeting.right_dex_retargeting_to_hardware]
 
                     # In website https://support.unitree.com/home/en/G1_developer/inspire_dfx_dexterous_hand, you can find
                     #     In the official document, the angles are in the range [0, 1] ==> 0.0: fully closed  1.0: fully open
@@ -128,34 +138,27 @@ class Inspire_Controller:
                     #     - idx 4:   0~0.5
                     #     - idx 5:  -0.1~1.3
                     # We normalize them using (max - value) / range
-                    def normalize(val, min_val, max_val):
-                        return np.clip((max_val - val) / (max_val - min_val), 0.0, 1.0)
-
-                    for idx in range(Inspire_Num_Motors):
-                        if idx <= 3:
-                            left_q_target[idx]  = normalize(left_q_target[idx], 0.0, 1.7)
-                            right_q_target[idx] = normalize(right_q_target[idx], 0.0, 1.7)
-                        elif idx == 4:
-                            left_q_target[idx]  = normalize(left_q_target[idx], 0.0, 0.5)
-                            right_q_target[idx] = normalize(right_q_target[idx], 0.0, 0.5)
-                        elif idx == 5:
-                            left_q_target[idx]  = normalize(left_q_target[idx], -0.1, 1.3)
-                            right_q_target[idx] = normalize(right_q_target[idx], -0.1, 1.3)
+                    Inspire_Normalizer(left_q_target, out = left_q_target)
+                    Inspire_Normalizer(right_q_target, out = right_q_target)
 
                 # get dual hand action
-                action_data = np.concatenate((left_q_target, right_q_target))    
-                if dual_hand_state_array and dual_hand_action_array:
-                    with dual_hand_data_lock:
-                        dual_hand_state_array[:] = state_data
-                        dual_hand_action_array[:] = action_data
+                action_data[:Inspire_Num_Motors] = left_q_target
+                action_data[Inspire_Num_Motors:] = right_q_target
+                if dual_hand_data_channel is not None:
+                    dual_hand_data_channel.write(hand_data)
 
                 self.ctrl_dual_hand(left_q_target, right_q_target)
-                current_time = time.time()
-                time_elapsed = current_time - start_time
-                sleep_time = max(0, (1 / self.fps) - time_elapsed)
-                time.sleep(sleep_time)
+                if self.input_driven:
+                    deadline = time.monotonic() + 1 / self.fps
+                else:
+                    current_time = time.time()
+                    time_elapsed = current_time - start_time
+                    sleep_time = max(0, (1 / self.fps) - time_elapsed)
+                    time.sleep(sleep_time)
         finally:
-            logger_mp.info("Inspire_Controller has been closed.")
+            if self.right_retarget_worker is not None:
+                self.right_retarget_worker.stop()
+            logger_mp.info(f"Inspire_Controller has been closed, retargeted on {retarget_ticks} of {ticks} ticks.")
 
 # Update hand state, according to the official documentation, https://support.unitree.com/home/en/G1_developer/inspire_dfx_dexterous_hand
 # the state sequence is as shown in the table below
@@ -1,9 +1,9 @@
 # for dex3-1
-from unitree_sdk2py.core.channel import ChannelPublisher, ChannelSubscriber, ChannelFactoryInitialize # dds
+from unitree_sdk2py.core.channel import ChannelPublisher, ChannelFactoryInitialize # dds
 from unitree_sdk2py.idl.unitree_hg.msg.dds_ import HandCmd_, HandState_                               # idl
 from unitree_sdk2py.idl.default import unitree_hg_msg_dds__HandCmd_
 # for gripper
-from unitree_sdk2py.core.channel import ChannelPublisher, ChannelSubscriber, ChannelFactoryInitialize # dds
+from unitree_sdk2py.core.channel import ChannelPublisher, ChannelFactoryInitialize # dds
 from unitree_sdk2py.idl.unitree_go.msg.dds_ import MotorCmds_, MotorStates_                           # idl
 from unitree_sdk2py.idl.default import unitree_go_msg_dds__MotorCmd_
 
@@ -17,8 +17,11 @@ from multiprocessing import Process, shared_memory, Array, Value, Lock
 
 parent2_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 sys.path.append(parent2_dir)
-from teleop.robot_control.hand_retargeting import HandRetargeting, HandType
-from teleop.utils.weighted_moving_filter import WeightedMovingFilter
+from teleop.robot_control.hand_retargeting import get_hand_retargeting, HandType
+from teleop.robot_control.hand_retarget_worker import HandRetargetWorker
+from teleop.utils.smoothing_filter import create_smoothing_filter
+from teleop.utils.dds_subscription import StateSubscription
+from teleop.utils.shm_channel import ShmChannel, ShmChannelReader, wait_for_frames
 
 import logging_mp
 logger_mp = logging_mp.get_logger(__name__)
@@ -32,21 +35,18 @@ kTopicDex3RightState = "rt/dex3/right/state"
 
 
 class Dex3_1_Controller:
-    def __init__(self, left_hand_array_in, right_hand_array_in, dual_hand_data_lock = None, dual_hand_state_array_out = None,
-                       dual_hand_action_array_out = None,fps = 50.0, Unit_Test = False,simulation_mode = False, right_hand_override = None, left_hand_override = None,
-                       dds_interface: str = "enx98fc84ec937b"):
+    def __init__(self, left_hand_channel_in, right_hand_channel_in, dual_hand_data_channel_out = None,
+                       fps = 50.0, Unit_Test = False,simulation_mode = False, right_hand_override = None, left_hand_override = None,
+                       dds_interface: str = "enx98fc84ec937b", input_driven = False,
+                       parallel_retargeting = False):
         """
-        [note] A *_array type parameter requires using a multiprocessing Array, because it needs to be passed to the internal child process
-
-        left_hand_array_in: [input] Left hand skeleton data (required from XR device) to hand_ctrl.control_process
+        [note] A *_channel type parameter requires using a utils.shm_channel.ShmChannel, because it needs to be passed to the internal child process
 
-        right_hand_array_in: [input] Right hand skeleton data (required from XR device) to hand_ctrl.control_process
+        left_hand_channel_in: [input] Left hand skeleton data (25, 3) (required from XR device) to hand_ctrl.control_process
 
-        dual_hand_data_lock: Data synchronization lock for dual_hand_state_array and dual_hand_action_array
+        right_hand_channel_in: [input] Right hand skeleton data (25, 3) (required from XR device) to hand_ctrl.control_process
 
-        dual_hand_state_array_out: [output] Return left(7), right(7) hand motor state
-
-        dual_hand_action_array_out: [output] Return left(7), right(7) hand motor action
+        dual_hand_data_channel_out: [output] Return (2, 14): left(7), right(7) hand motor state, then left(7), right(7) hand motor action
 
         fps: Control frequency
 
@@ -55,17 +55,25 @@ class Dex3_1_Controller:
         simulation_mode: Whether to use simulation mode (default is False, which means using real robot)
 
         dds_interface: Network interface name used by ChannelFactoryInitialize when not in simulation mode
+
+        input_driven: Retarget as soon as a new hand skeleton arrives instead of on the next fps tick, the last command is
+                      still republished at fps. In both modes an unchanged skeleton is not retargeted again.
+
+        parallel_retargeting: Retarget the right hand in a worker process (HandRetargetWorker) concurrently with the left hand
         """
         logger_mp.info("Initialize Dex3_1_Controller...")
 
         self.fps = fps
+        self.input_driven = input_driven
         self.Unit_Test = Unit_Test
         self.simulation_mode = simulation_mode
         if not self.Unit_Test:
-            self.hand_retargeting = HandRetargeting(HandType.UNITREE_DEX3)
+            self.hand_retargeting = get_hand_retargeting(HandType.UNITREE_DEX3)
         else:
-            self.hand_retargeting = HandRetargeting(HandType.UNITREE_DEX3_Unit_Test)
-            #self.hand_retargeting = HandRetargeting(HandType.UNITREE_DEX3)
+            self.hand_retargeting = get_hand_retargeting(HandType.UNITREE_DEX3_Unit_Test)
+            #self.hand_retargeting = get_hand_retargeting(HandType.UNITREE_DEX3)
+        # the right hand is retargeted in a worker process, concurrently with the left hand
+        self.right_retarget_worker = HandRetargetWorker(self.hand_retargeting) if parallel_retargeting else None
 
         if self.simulation_mode:
             ChannelFactoryInitialize(1)
@@ -78,46 +86,30 @@ class Dex3_1_Controller:
         self.RightHandCmb_publisher = ChannelPublisher(kTopicDex3RightCommand, HandCmd_)
         self.RightHandCmb_publisher.Init()
 
-        self.LeftHandState_subscriber = ChannelSubscriber(kTopicDex3LeftState, HandState_)
-        self.LeftHandState_subscriber.Init()
-        self.RightHandState_subscriber = ChannelSubscriber(kTopicDex3RightState, HandState_)
-        self.RightHandState_subscriber.Init()
-
-        # Shared Arrays for hand states
-        self.left_hand_state_array  = Array('d', Dex3_Num_Motors, lock=True)  
-        self.right_hand_state_array = Array('d', Dex3_Num_Motors, lock=True)
+        # Shared memory channels for hand states
+        self.left_hand_state_channel  = ShmChannel(Dex3_Num_Motors)
+        self.right_hand_state_channel = ShmChannel(Dex3_Num_Motors)
 
-        # initialize subscribe thread
-        self.subscribe_state_thread = threading.Thread(target=self._subscribe_hand_state)
-        self.subscribe_state_thread.daemon = True
-        self.subscribe_state_thread.start()
+        self.LeftHandState_subscription = StateSubscription(kTopicDex3LeftState, HandState_, self._on_left_hand_state)
+        self.RightHandState_subscription = StateSubscription(kTopicDex3RightState, HandState_, self._on_right_hand_state)
 
-        while True:
-            if any(self.left_hand_state_array) and any(self.right_hand_state_array):
-                break
-            time.sleep(0.01)
+        while not (self.LeftHandState_subscription.wait_for_sample(timeout = 0.01) and
+                   self.RightHandState_subscription.wait_for_sample(timeout = 0.01)):
             logger_mp.warning("[Dex3_1_Controller] Waiting to subscribe dds...")
         logger_mp.info("[Dex3_1_Controller] Subscribe dds ok.")
 
-        hand_control_process = Process(target=self.control_process, args=(left_hand_array_in, right_hand_array_in,  self.left_hand_state_array, self.right_hand_state_array,
-                                                                          dual_hand_data_lock, dual_hand_state_array_out, dual_hand_action_array_out, right_hand_override, left_hand_override))
+        hand_control_process = Process(target=self.control_process, args=(left_hand_channel_in, right_hand_channel_in,  self.left_hand_state_channel, self.right_hand_state_channel,
+                                                                          dual_hand_data_channel_out, right_hand_override, left_hand_override))
         hand_control_process.daemon = True
         hand_control_process.start()
 
         logger_mp.info("Initialize Dex3_1_Controller OK!\n")
 
-    def _subscribe_hand_state(self):
-        while True:
-            left_hand_msg  = self.LeftHandState_subscriber.Read()
-            right_hand_msg = self.RightHandState_subscriber.Read()
-            if left_hand_msg is not None and right_hand_msg is not None:
-                # Update left hand state
-                for idx, id in enumerate(Dex3_1_Left_JointIndex):
-                    self.left_hand_state_array[idx] = left_hand_msg.motor_state[id].q
-                # Update right hand state
-                for idx, id in enumerate(Dex3_1_Right_JointIndex):
-                    self.right_hand_state_array[idx] = right_hand_msg.motor_state[id].q
-            time.sleep(0.002)
+    def _on_left_hand_state(self, msg):
+        self.left_hand_state_channel.write([msg.motor_state[id].q for id in Dex3_1_Left_JointIndex])
+
+    def _on_right_hand_state(self, msg):
+        self.right_hand_state_channel.write([msg.motor_state[id].q for id in Dex3_1_Right_JointIndex])
     
     class _RIS_Mode:
         def __init__(self, id=0, status=0x01, timeout=0):
@@ -146,13 +138,23 @@ class Dex3_1_Controller:
 
         logger_mp.debug("hand ctrl publish ok.")
     
-    def control_process(self, left_hand_array_in, right_hand_array_in, left_hand_state_array, right_hand_state_array,
-                              dual_hand_data_lock = None, dual_hand_state_array_out = None, dual_hand_action_array_out = None, right_hand_override = None, left_hand_override = None):
+    def control_process(self, left_hand_channel_in, right_hand_channel_in, left_hand_state_channel, right_hand_state_channel,
+                              dual_hand_data_channel_out = None, right_hand_override = None, left_hand_override = None):
         self.running = True
 
         left_q_target  = np.full(Dex3_Num_Motors, 0)
         right_q_target = np.full(Dex3_Num_Motors, 0)
 
+        # skeletons are only retargeted when they changed since the last retargeting
+        left_hand_input  = ShmChannelReader(left_hand_channel_in)
+        right_hand_input = ShmChannelReader(right_hand_channel_in)
+        input_changed = False
+        retarget_ticks = 0
+        ticks = 0
+        # state and action are written from this buffer, no allocation per tick
+        hand_data = np.zeros((2, 2 * Dex3_Num_Motors))
+        state_data, action_data = hand_data
+
         q = 0.0
         dq = 0.0
         tau = 0.0
@@ -183,31 +185,36 @@ class Dex3_1_Controller:
             self.right_msg.motor_cmd[id].kp   = kp
             self.right_msg.motor_cmd[id].kd   = kd  
 
+        deadline = time.monotonic() + 1 / self.fps
         try:
             while self.running:
                 start_time = time.time()
+                if self.input_driven:
+                    wait_for_frames((left_hand_input, right_hand_input), deadline)
                 # get dual hand state
-                with left_hand_array_in.get_lock():
-                    left_hand_data  = np.array(left_hand_array_in[:]).reshape(25, 3).copy()
-                with right_hand_array_in.get_lock():
-                    right_hand_data = np.array(right_hand_array_in[:]).reshape(25, 3).copy()
-
-                # Read left and right q_state from shared arrays
-                state_data = np.concatenate((np.array(left_hand_state_array[:]), np.array(right_hand_state_array[:])))
-
-                if not np.all(right_hand_data == 0.0) and not np.all(left_hand_data[4] == np.array([-1.13, 0.3, 0.15])): # if hand data has been initialized.
+                input_changed |= left_hand_input.poll()
+                input_changed |= right_hand_input.poll()
+                left_hand_data  = left_hand_input.frame
+                right_hand_data = right_hand_input.frame
+
+                # Read left and right q_state from shared memory
+                left_hand_state_channel.read(out = state_data[:Dex3_Num_Motors])
+                right_hand_state_channel.read(out = state_data[Dex3_Num_Motors:])
+
+                ticks += 1
+                if input_changed and not np.all(right_hand_data == 0.0) and not np.all(left_hand_data[4] == np.array([-1.13, 0.3, 0.15])): # if hand data has been initialized.
+                    input_changed = False
+                    retarget_ticks += 1
+                    if self.right_retarget_worker is not None:
+                        self.right_retarget_worker.submit(right_hand_data)
                     ref_left_value = left_hand_data[self.hand_retargeting.left_indices[1,:]] - left_hand_data[self.hand_retargeting.left_indices[0,:]]
-                    ref_right_value = right_hand_data[self.hand_retargeting.right_indices[1,:]] - right_hand_data[self.hand_retargeting.right_indices[0,:]]
-
                     left_q_target  = self.hand_retargeting.left_retargeting.retarget(ref_left_value)[self.hand_retargeting.right_dex_retargeting_to_hardware]
-                    right_q_target = self.hand_retargeting.right_retargeting.retarget(ref_right_value)[self.hand_retargeting.right_dex_retargeting_to_hardware]
+                    if self.right_retarget_worker is not None:
+                        right_q_target = self.right_retarget_worker.result()
+                    else:
+                        ref_right_value = right_hand_data[self.hand_retargeting.right_indices[1,:]] - right_hand_data[self.hand_retargeting.right_indices[0,:]]
+                        right_q_target = self.hand_retargeting.right_retargeting.retarget(ref_right_value)[self.hand_retargeting.right_dex_retargeting_to_hardware]
 
-                # get dual hand action
-                action_data = np.concatenate((left_q_target, right_q_target))    
-                # if dual_hand_state_array_out and dual_hand_action_array_out:
-                #     with dual_hand_data_lock:
-                #         dual_hand_state_array_out[:] = state_data
-                #         dual_hand_action_array_out[:] = action_data
 
                 # override = False
                 # if right_hand_override is not None:
@@ -230,22 +237,13 @@ class Dex3_1_Controller:
                 right_over = (right_hand_override is not None and right_hand_override[0]>0.5)
                 left_over = (left_hand_override is not None and left_hand_override[0]>0.5)
                 
-                if dual_hand_state_array_out and dual_hand_action_array_out:
-                    with dual_hand_data_lock:
-                        dual_hand_state_array_out[:] = state_data
-                        
-                        if not left_over and not right_over:
-                            dual_hand_action_array_out[:] = action_data
-                        else:
-                            cur = dual_hand_action_array_out[:]
-                            
-                            if not left_over:
-                                cur[:7] = left_q_target
-                            
-                            if not right_over:
-                                cur[-7:] = right_q_target
-                            
-                            dual_hand_action_array_out[:] = cur
+                # get dual hand action, an overridden hand keeps its last action
+                if not left_over:
+                    action_data[:Dex3_Num_Motors] = left_q_target
+                if not right_over:
+                    action_data[Dex3_Num_Motors:] = right_q_target
+                if dual_hand_data_channel_out is not None:
+                    dual_hand_data_channel_out.write(hand_data)
                 
                 if right_over and left_over:
                     pass
@@ -256,12 +254,17 @@ class Dex3_1_Controller:
                 else:
                     self.ctrl_dual_hand(left_q_target, right_q_target)
 
-                current_time = time.time()
-                time_elapsed = current_time - start_time
-                sleep_time = max(0, (1 / self.fps) - time_elapsed)
-                time.sleep(sleep_time)
+                if self.input_driven:
+                    deadline = time.monotonic() + 1 / self.fps
+                else:
+                    current_time = time.time()
+                    time_elapsed = current_time - start_time
+                    sleep_time = max(0, (1 / self.fps) - time_elapsed)
+                    time.sleep(sleep_time)
         finally:
-            logger_mp.info("Dex3_1_Controller has been closed.")
+            if self.right_retarget_worker is not None:
+                self.right_retarget_worker.stop()
+            logger_mp.info(f"Dex3_1_Controller has been closed, retargeted on {retarget_ticks} of {ticks} ticks.")
 
 class Dex3_1_Left_JointIndex(IntEnum):
     kLeftHandThumb0 = 0
@@ -289,7 +292,8 @@ kTopicGripperRightState = "rt/dex1/right/state"
 
 class Dex1_1_Gripper_Controller:
     def __init__(self, left_gripper_value_in, right_gripper_value_in, dual_gripper_data_lock = None, dual_gripper_state_out = None, dual_gripper_action_out = None, 
-                       filter = True, fps = 200.0, Unit_Test = False, simulation_mode = False, dds_interface: str = "enx98fc84ec937b"):
+                       filter = True, fps = 200.0, Unit_Test = False, simulation_mode = False, dds_interface: str = "enx98fc84ec937b",
+                       smoothing_filter = "weighted", smoothing_params = None):
         """
         [note] A *_array type parameter requires using a multiprocessing Array, because it needs to be passed to the internal child process
 
@@ -310,17 +314,20 @@ class Dex1_1_Gripper_Controller:
         simulation_mode: Whether to use simulation mode (default is False, which means using real robot)
 
         dds_interface: Network interface name used by ChannelFactoryInitialize when not in simulation mode
+
+        smoothing_filter, smoothing_params: Filter applied to the gripper action when filter is enabled, see utils/smoothing_filter.py
         """
 
         logger_mp.info("Initialize Dex1_1_Gripper_Controller...")
 
         self.fps = fps
         self.Unit_Test = Unit_Test
-        self.gripper_sub_ready = False
         self.simulation_mode = simulation_mode
         
         if filter and not self.simulation_mode:
-            self.smooth_filter = WeightedMovingFilter(np.array([0.5, 0.3, 0.2]), 2)
+            if smoothing_filter == "weighted" and smoothing_params is None:
+                smoothing_params = {"weights": np.array([0.5, 0.3, 0.2])}
+            self.smooth_filter = create_smoothing_filter(smoothing_filter, 2, **(smoothing_params or {}))
         else:
             self.smooth_filter = None
 
@@ -335,23 +342,12 @@ class Dex1_1_Gripper_Controller:
         self.RightGripperCmb_publisher = ChannelPublisher(kTopicGripperRightCommand, MotorCmds_)
         self.RightGripperCmb_publisher.Init()
 
-        self.LeftGripperState_subscriber = ChannelSubscriber(kTopicGripperLeftState, MotorStates_)
-        self.LeftGripperState_subscriber.Init()
-        self.RightGripperState_subscriber = ChannelSubscriber(kTopicGripperRightState, MotorStates_)
-        self.RightGripperState_subscriber.Init()
-
         # Shared Arrays for gripper states
         self.left_gripper_state_value = Value('d', 0.0, lock=True)
         self.right_gripper_state_value = Value('d', 0.0, lock=True)
 
-        # initialize subscribe thread
-        self.subscribe_state_thread = threading.Thread(target=self._subscribe_gripper_state)
-        self.subscribe_state_thread.daemon = True
-        self.subscribe_state_thread.start()
-
-        while not self.gripper_sub_ready:
-            time.sleep(0.01)
-            logger_mp.warning("[Dex1_1_Gripper_Controller] Waiting to subscribe dds...")
+        self.LeftGripperState_subscription = StateSubscription(kTopicGripperLeftState, MotorStates_, self._on_left_gripper_state)
+        self.RightGripperState_subscription = StateSubscription(kTopicGripperRightState, MotorStates_, self._on_right_gripper_state)
         logger_mp.info("[Dex1_1_Gripper_Controller] Subscribe dds ok.")
 
         self.gripper_control_thread = threading.Thread(target=self.control_thread, args=(left_gripper_value_in, right_gripper_value_in, self.left_gripper_state_value, self.right_gripper_state_value,
@@ -361,15 +357,11 @@ class Dex1_1_Gripper_Controller:
 
         logger_mp.info("Initialize Dex1_1_Gripper_Controller OK!\n")
 
-    def _subscribe_gripper_state(self):
-        while True:
-            left_gripper_msg  = self.LeftGripperState_subscriber.Read()
-            right_gripper_msg  = self.RightGripperState_subscriber.Read()
-            self.gripper_sub_ready = True
-            if left_gripper_msg is not None and right_gripper_msg is not None:
-                self.left_gripper_state_value.value = left_gripper_msg.states[0].q
-                self.right_gripper_state_value.value = right_gripper_msg.states[0].q
-            time.sleep(0.002)
+    def _on_left_gripper_state(self, msg):
+        self.left_gripper_state_value.value = msg.states[0].q
+
+    def _on_right_gripper_state(self, msg):
+        self.right_gripper_state_value.value = msg.states[0].q
     
     def ctrl_dual_gripper(self, dual_gripper_action):
         """set current left, right gripper motor cmd target q"""
@@ -501,12 +493,10 @@ if __name__ == "__main__":
 
 # end-effector
     if args.ee == "dex3":
-        left_hand_pos_array = Array('d', 75, lock = True)      # [input]
-        right_hand_pos_array = Array('d', 75, lock = True)     # [input]
-        dual_hand_data_lock = Lock()
-        dual_hand_state_array = Array('d', 14, lock = False)   # [output] current left, right hand state(14) data.
-        dual_hand_action_array = Array('d', 14, lock = False)  # [output] current left, right hand action(14) data.
-        hand_ctrl = Dex3_1_Controller(left_hand_pos_array, right_hand_pos_array, dual_hand_data_lock, dual_hand_state_array, dual_hand_action_array,
+        left_hand_pos_channel = ShmChannel((25, 3))            # [input]
+        right_hand_pos_channel = ShmChannel((25, 3))           # [input]
+        dual_hand_data_channel = ShmChannel((2, 14))           # [output] current left, right hand state(14) and action(14) data.
+        hand_ctrl = Dex3_1_Controller(left_hand_pos_channel, right_hand_pos_channel, dual_hand_data_channel,
                                       dds_interface=args.dds_interface)
     elif args.ee == "dex1":
         left_gripper_value = Value('d', 0.0, lock=True)        # [input]
@@ -522,10 +512,8 @@ if __name__ == "__main__":
         while True:
             tele_data = tv_wrapper.get_motion_state_data()
             if args.ee == "dex3" and args.xr_mode == "hand":
-                with left_hand_pos_array.get_lock():
-                    left_hand_pos_array[:] = tele_data.left_hand_pos.flatten()
-                with right_hand_pos_array.get_lock():
-                    right_hand_pos_array[:] = tele_data.right_hand_pos.flatten()
+                left_hand_pos_channel.write(tele_data.left_hand_pos)
+                right_hand_pos_channel.write(tele_data.right_hand_pos)
             elif args.ee == "dex1" and args.xr_mode == "controller":
                 with left_gripper_value.get_lock():
                     left_gripper_value.value = tele_data.left_trigger_value
@@ -539,6 +527,6 @@ if __name__ == "__main__":
             else:
                 pass
 
-            # with dual_hand_data_lock:
-            #     logger_mp.info(f"state : {list(dual_hand_state_array)} \naction: {list(dual_hand_action_array)} \n")
+            # hand_data, _, _ = dual_hand_data_channel.read()
+            # logger_mp.info(f"state : {list(hand_data[0])} \naction: {list(hand_data[1])} \n")
             time.sleep(0.01)
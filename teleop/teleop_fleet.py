@@ -0,0 +1,210 @@
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+import threading
+from concurrent.futures import ProcessPoolExecutor
+import logging_mp
+logging_mp.basic_config(level=logging_mp.INFO)
+logger_mp = logging_mp.get_logger(__name__)
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+from teleop.utils.ipc import IPC_Client
+from sshkeyboard import listen_keyboard, stop_listening
+
+"""
+Fleet mode: one operator station running and supervising the teleoperation of several robots.
+
+The DDS ChannelFactory of unitree_sdk2py is a process wide singleton bound to one domain / network interface, so every
+robot keeps its own teleop_hand_and_arm.py process (with --ipc, an --ipc-name of its own, --network-interface and
+--img-server), started and supervised from here:
+
+- the IK models of the arms in the fleet are built once, before the robots start, into the on-disk IK cache, so every
+  robot process loads the reduced model and the compiled casadi functions instead of parsing the URDF and rebuilding them.
+- the 250 Hz arm command loops are spread over the cores given with --arm-cpus, one core per robot.
+- commands of the keyboard go to the selected robot, or to all of them, through their IPC servers, and the heartbeats
+  of all robots are summarized periodically.
+
+Fleet file (JSON):
+    {
+        "robots": [
+            {"name": "g1_a", "network_interface": "eth1", "img_server": "192.168.123.164", "args": ["--arm=G1_29", "--ee=dex3"]},
+            {"name": "g1_b", "network_interface": "eth2", "img_server": "192.168.124.164", "args": ["--arm=G1_29", "--ee=dex1"]}
+        ]
+    }
+"""
+
+
+def _robot_args_parser():
+    # the teleop_hand_and_arm.py options that decide which IK model the robot process loads
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument('--arm', type=str, default='G1_29')
+    parser.add_argument('--ik-solver', type=str, default='opti')
+    parser.add_argument('--ik-no-cache', action='store_true')
+    parser.add_argument('--ik-seed-table', action='store_true')
+    return parser
+
+def warm_ik_cache(arm, solver_backend, seed_table):
+    """Build the IK model of arm once, which writes it (and the nlpsol / seed table if used) into the IK cache."""
+    from teleop.robot_control.robot_arm_ik import G1_29_ArmIK, G1_23_ArmIK, H1_2_ArmIK, H1_ArmIK
+    arm_ik_classes = {"G1_29": G1_29_ArmIK, "G1_23": G1_23_ArmIK, "H1_2": H1_2_ArmIK, "H1": H1_ArmIK}
+    start_time = time.time()
+    arm_ik_classes[arm](solver_backend=solver_backend, use_cache=True, seed_table=seed_table)
+    return time.time() - start_time
+
+
+class FleetRobot:
+    """One robot of the fleet: its teleop process and the IPC client to command and watch it."""
+    def __init__(self, name, network_interface, img_server = None, args = (), arm_cpu = None, log_dir = None):
+        self.name = name
+        self.cmd = [sys.executable, os.path.join(current_dir, "teleop_hand_and_arm.py"), "--ipc", f"--ipc-name={name}",
+                    f"--network-interface={network_interface}"]
+        if img_server is not None:
+            self.cmd.append(f"--img-server={img_server}")
+        if arm_cpu is not None and not any(arg.startswith("--arm-cpu") for arg in args):
+            self.cmd.append(f"--arm-cpu={arm_cpu}")
+        self.cmd += list(args)
+        self.log_path = os.path.join(log_dir, f"{name}.log") if log_dir else None
+        self.process = None
+        self.client = None
+
+    def start(self):
+        log_file = open(self.log_path, "a") if self.log_path else None
+        # scripts of this repo expect to run from teleop/ (relative asset paths)
+        self.process = subprocess.Popen(self.cmd, cwd=current_dir, stdout=log_file, stderr=subprocess.STDOUT if log_file else None)
+        if log_file is not None:
+            log_file.close()
+        self.client = IPC_Client(name=self.name)
+        logger_mp.info(f"[FleetRobot] {self.name} started (pid {self.process.pid}): {' '.join(self.cmd)}")
+
+    def is_running(self):
+        return self.process is not None and self.process.poll() is None
+
+    def send(self, cmd, info = None):
+        reply = self.client.send_data(cmd, info)
+        if reply.get("status") != "ok":
+            logger_mp.warning(f"[FleetRobot] {self.name} {cmd}: {reply.get('msg')}")
+        return reply
+
+    def status(self):
+        """Return a one line summary of the robot's latest heartbeat."""
+        if not self.is_running():
+            return f"{self.name}: exited ({self.process.returncode})"
+        if not self.client.is_online():
+            return f"{self.name}: offline"
+        state = self.client.latest_state()
+        summary = f"{self.name}: START={state.get('START')} RECORD={state.get('RECORD_RUNNING')}"
+        lowstate = state.get("DDS", {}).get("rt/lowstate")
+        if lowstate is not None and "staleness_ms" in lowstate:
+            summary += f" lowstate={lowstate.get('rate_hz', 0.0):.0f}Hz/{lowstate['staleness_ms']:.0f}ms"
+        arm_loop = state.get("ARM_LOOP")
+        if arm_loop is not None:
+            summary += f" arm_loop_overruns={arm_loop['overruns']}/{arm_loop['cycles']}"
+        return summary
+
+    def stop(self, timeout = 15.0):
+        """Ask the robot process to exit (its arms go home), terminate it after timeout seconds."""
+        if self.is_running():
+            if self.client.is_online():
+                self.send("CMD_STOP")
+            try:
+                self.process.wait(timeout)
+            except subprocess.TimeoutExpired:
+                logger_mp.warning(f"[FleetRobot] {self.name} did not exit within {timeout}s, terminating")
+                self.process.terminate()
+                self.process.wait()
+        if self.client is not None:
+            self.client.stop()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Run and supervise the teleoperation of several robots.")
+    parser.add_argument('--fleet', type = str, required = True, help = 'Fleet file (JSON), see the module docstring')
+    parser.add_argument('--arm-cpus', type = str, default = None, help = 'Cores for the arm command loops, one per robot in turn, e.g. "2,3,4,5"')
+    parser.add_argument('--log-dir', type = str, default = None, help = 'Write the output of every robot process to <log-dir>/<name>.log')
+    parser.add_argument('--status-interval', type = float, default = 5.0, help = 'Seconds between two fleet status summaries, 0 to disable')
+    parser.add_argument('--task-name', type = str, default = 'pick cube', help = 'task name for recording')
+    parser.add_argument('--task-desc', type = str, default = 'e.g. pick the red cube on the table.', help = 'task goal for recording')
+    args = parser.parse_args()
+
+    with open(args.fleet, "r") as f:
+        fleet_config = json.load(f)
+    arm_cpus = [int(cpu) for cpu in args.arm_cpus.split(",")] if args.arm_cpus else []
+    if args.log_dir:
+        os.makedirs(args.log_dir, exist_ok=True)
+    robots = []
+    for idx, robot in enumerate(fleet_config["robots"]):
+        robots.append(FleetRobot(robot["name"], robot["network_interface"], robot.get("img_server"), robot.get("args", []),
+                                 arm_cpu=arm_cpus[idx % len(arm_cpus)] if arm_cpus else None, log_dir=args.log_dir))
+
+    # build each distinct IK model once, in parallel worker processes, so the robot processes start from the cache
+    ik_models = set()
+    for robot in robots:
+        robot_args, _ = _robot_args_parser().parse_known_args(robot.cmd[2:])
+        if not robot_args.ik_no_cache:
+            ik_models.add((robot_args.arm, robot_args.ik_solver, robot_args.ik_seed_table))
+    if ik_models:
+        with ProcessPoolExecutor(max_workers=len(ik_models)) as pool:
+            futures = {model: pool.submit(warm_ik_cache, *model) for model in ik_models}
+            for model, future in futures.items():
+                logger_mp.info(f"[Fleet] IK model {model[0]} ({model[1]}) ready in {future.result():.1f}s")
+
+    selected = None  # robot commanded by the keyboard, None for all
+    stop_event = threading.Event()
+
+    def targets():
+        return robots if selected is None else [selected]
+
+    def on_press(key):
+        global selected
+        if key.isdigit():
+            idx = int(key)
+            selected = robots[idx - 1] if 0 < idx <= len(robots) else None
+            logger_mp.info(f"[Fleet] commanding {'all robots' if selected is None else selected.name}")
+        elif key == 'r':
+            for robot in targets():
+                robot.send("CMD_START")
+        elif key == 's':
+            info = {"task_name": args.task_name, "task_desc": args.task_desc, "item_id": 0}
+            for robot in targets():
+                robot.send("CMD_RECORD_TOGGLE", info)
+        elif key == 'b':
+            for robot in robots:
+                logger_mp.info(f"[Fleet] {robot.status()}")
+        elif key == 'q':
+            stop_event.set()
+        else:
+            logger_mp.warning(f"[on_press] {key} was pressed, but no action is defined for this key.")
+
+    try:
+        for robot in robots:
+            robot.start()
+        listen_keyboard_thread = threading.Thread(target=listen_keyboard, kwargs={"on_press": on_press, "until": None, "sequential": False,}, daemon=True)
+        listen_keyboard_thread.start()
+        logger_mp.info("[Fleet] keys: [1-9] select robot, [0] all robots, [r] start, [s] record toggle, [b] status, [q] exit all")
+
+        last_status_time = time.monotonic()
+        while not stop_event.is_set():
+            if not any(robot.is_running() for robot in robots):
+                logger_mp.info("[Fleet] all robot processes exited")
+                break
+            if args.status_interval > 0 and time.monotonic() - last_status_time >= args.status_interval:
+                last_status_time = time.monotonic()
+                for robot in robots:
+                    logger_mp.info(f"[Fleet] {robot.status()}")
+            stop_event.wait(0.1)
+    except KeyboardInterrupt:
+        logger_mp.info("KeyboardInterrupt, exiting fleet...")
+    finally:
+        # the robots home their arms in parallel
+        stop_threads = [threading.Thread(target=robot.stop) for robot in robots]
+        for thread in stop_threads:
+            thread.start()
+        for thread in stop_threads:
+            thread.join()
+        stop_listening()
+        logger_mp.info("Finally, exiting fleet.")
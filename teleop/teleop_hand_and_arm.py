@@ -8,6 +8,7 @@ import argparse
 import cv2
 from multiprocessing import shared_memory, Value, Array, Lock
 import threading
+from concurrent.futures import TimeoutError as FutureTimeoutError
 import logging_mp
 logging_mp.basic_config(level=logging_mp.INFO)
 logger_mp = logging_mp.get_logger(__name__)
@@ -21,12 +22,18 @@ sys.path.append(parent_dir)
 from televuer import TeleVuerWrapper
 from teleop.robot_control.robot_arm import G1_29_ArmController, G1_23_ArmController, H1_2_ArmController, H1_ArmController
 from teleop.robot_control.robot_arm_ik import G1_29_ArmIK, G1_23_ArmIK, H1_2_ArmIK, H1_ArmIK
+from teleop.robot_control.arm_ik_worker import ArmIKWorker
 from teleop.robot_control.robot_hand_unitree import Dex3_1_Controller, Dex1_1_Gripper_Controller
 from teleop.robot_control.robot_hand_inspire import Inspire_Controller
 from teleop.robot_control.robot_hand_brainco import Brainco_Controller
 from teleop.image_server.image_client import ImageClient
 from teleop.utils.episode_writer import EpisodeWriter
 from teleop.utils.ipc import IPC_Server
+from teleop.utils.smoothing_filter import SMOOTHING_FILTERS, parse_smoothing_params
+from teleop.utils.dds_subscription import subscription_metrics
+from teleop.utils.target_interpolator import INTERPOLATION_METHODS
+from teleop.utils.pose_predictor import PREDICTION_METHODS, WristPosePredictor
+from teleop.utils.shm_channel import ShmChannel
 from sshkeyboard import listen_keyboard, stop_listening
 
 
@@ -48,6 +55,12 @@ RECORD_READY   = True   # True if [Ready], False if [Recording] / [AutoSave]
 TASK_NAME = None
 TASK_DESC = None
 ITEM_ID = None
+# arm ik telemetry published with the heartbeat, see --ik-telemetry
+IK_TELEMETRY = None
+# arm command loop, its jitter / overrun statistics are published with the heartbeat
+ARM_CONTROL_LOOP = None
+# wrist pose predictor, its predicted-vs-actual errors are published with the heartbeat, see --wrist-predict
+WRIST_PREDICTOR = None
 def on_press(key):
     global STOP, START, RECORD_TOGGLE
     if key == 'r':
@@ -70,13 +83,21 @@ def on_info(info):
 
 def get_state() -> dict:
     """Return current heartbeat state"""
-    global START, STOP, RECORD_RUNNING, RECORD_READY
-    return {
+    global START, STOP, RECORD_RUNNING, RECORD_READY, IK_TELEMETRY, ARM_CONTROL_LOOP, WRIST_PREDICTOR
+    state = {
         "START": START,
         "STOP": STOP,
         "RECORD_RUNNING": RECORD_RUNNING,
         "RECORD_READY": RECORD_READY,
     }
+    if IK_TELEMETRY is not None:
+        state["IK"] = IK_TELEMETRY.summary()
+    state["DDS"] = subscription_metrics()
+    if ARM_CONTROL_LOOP is not None:
+        state["ARM_LOOP"] = ARM_CONTROL_LOOP.stats()
+    if WRIST_PREDICTOR is not None:
+        state["PREDICTOR"] = WRIST_PREDICTOR.summary()
+    return state
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser()
@@ -86,12 +107,36 @@ if __name__ == '__main__':
     parser.add_argument('--xr-mode', type=str, choices=['hand', 'controller'], default='hand', help='Select XR device tracking source')
     parser.add_argument('--arm', type=str, choices=['G1_29', 'G1_23', 'H1_2', 'H1'], default='G1_29', help='Select arm controller')
     parser.add_argument('--ee', type=str, choices=['dex1', 'dex3', 'inspire1', 'brainco'], help='Select end effector controller')
+    parser.add_argument('--ik-solver', type=str, choices=['opti', 'nlpsol'], default='opti', help='Select arm IK solver backend')
+    parser.add_argument('--ik-jit', action = 'store_true', help = 'JIT compile the nlpsol IK problem (requires a C compiler)')
+    parser.add_argument('--ik-dls', action = 'store_true', help = 'Enable damped least squares IK fast path with ipopt fallback')
+    parser.add_argument('--ik-no-cache', action = 'store_true', help = 'Rebuild the arm IK model instead of loading it from the on-disk cache')
+    parser.add_argument('--ik-seed-table', action = 'store_true', help = 'Reseed arm IK from a precomputed seed table after failures and tracking discontinuities')
+    parser.add_argument('--ik-filter', type=str, choices=SMOOTHING_FILTERS, default='weighted', help='Select smoothing filter of the arm IK solution')
+    parser.add_argument('--ik-filter-params', type=str, default=None, help='Arm IK smoothing filter parameters, e.g. "min_cutoff=1.0,beta=0.3"')
+    parser.add_argument('--hand-input-driven', action = 'store_true', help = 'Retarget the dex3 / inspire1 / brainco hands on arrival of new XR hand data instead of on their fixed control tick')
+    parser.add_argument('--hand-parallel-retarget', action = 'store_true', help = 'Retarget the left and right hands concurrently, the right one in a worker process')
+    parser.add_argument('--gripper-filter', type=str, choices=SMOOTHING_FILTERS, default='weighted', help='Select smoothing filter of the dex1 gripper action')
+    parser.add_argument('--gripper-filter-params', type=str, default=None, help='Gripper smoothing filter parameters, e.g. "frequency=8"')
+    parser.add_argument('--ik-async', action = 'store_true', help = 'Solve arm IK in a worker process, the main loop uses the latest available solution')
+    parser.add_argument('--ik-rate', type = float, default = 0.0, help = 'With --ik-async, solve arm IK on the newest wrist poses at this rate (Hz) instead of once per main loop cycle (--frequency)')
+    parser.add_argument('--ik-telemetry', action = 'store_true', help = 'Publish arm IK solve time and convergence statistics with the IPC heartbeat')
+    parser.add_argument('--arm-cpu', type = int, default = None, help = 'Pin the 250 Hz arm command loop to this cpu core')
+    parser.add_argument('--arm-rt-priority', type = int, default = None, help = 'Run the arm command loop with this SCHED_FIFO priority (1-99, needs CAP_SYS_NICE)')
+    parser.add_argument('--arm-interp', type = str, choices = INTERPOLATION_METHODS, default = None, help = 'Interpolate the arm IK targets up to the 250 Hz command rate')
+    parser.add_argument('--arm-interp-params', type = str, default = None, help = 'Interpolator parameters, e.g. "max_velocity=3.0,max_acceleration=40.0"')
+    parser.add_argument('--wrist-predict', type = str, choices = PREDICTION_METHODS, default = None, help = 'Extrapolate the XR wrist poses by the end-to-end latency before the arm IK')
+    parser.add_argument('--wrist-predict-latency', type = float, default = 0.03, help = 'Latency not measured at run time (XR tracking, motor response) added to the measured IK / command latency, in seconds')
+    parser.add_argument('--wrist-predict-params', type = str, default = None, help = 'Wrist predictor parameters, e.g. "max_horizon=0.15,velocity_smoothing=0.4"')
     # mode flags
     parser.add_argument('--motion', action = 'store_true', help = 'Enable motion control mode')
     parser.add_argument('--headless', action='store_true', help='Enable headless mode (no display)')
     parser.add_argument('--sim', action = 'store_true', help = 'Enable isaac simulation mode')
     parser.add_argument('--affinity', action = 'store_true', help = 'Enable high priority and set CPU affinity')
     parser.add_argument('--ipc', action = 'store_true', help = 'Enable IPC server to handle input; otherwise enable sshkeyboard')
+    parser.add_argument('--ipc-name', type = str, default = None, help = 'Instance name of the IPC endpoints, to run several teleop processes (see teleop_fleet.py)')
+    parser.add_argument('--network-interface', type = str, default = 'enx98fc84ec937b', help = 'Network interface of the robot\'s DDS domain')
+    parser.add_argument('--img-server', type = str, default = '192.168.123.164', help = 'Address of the robot\'s image server')
     parser.add_argument('--record', action = 'store_true', help = 'Enable data recording')
     parser.add_argument('--task-dir', type = str, default = './utils/data/', help = 'path to save data')
     parser.add_argument('--task-name', type = str, default = 'pick cube', help = 'task name for recording')
@@ -103,7 +148,7 @@ if __name__ == '__main__':
     try:
         # ipc communication. client usage: see utils/ipc.py
         if args.ipc:
-            ipc_server = IPC_Server(on_press=on_press, on_info=on_info, get_state=get_state)
+            ipc_server = IPC_Server(on_press=on_press, on_info=on_info, get_state=get_state, name=args.ipc_name)
             ipc_server.start()
         # sshkeyboard communication
         else:
@@ -162,9 +207,9 @@ if __name__ == '__main__':
             wrist_img_shm = shared_memory.SharedMemory(create = True, size = np.prod(wrist_img_shape) * np.uint8().itemsize)
             wrist_img_array = np.ndarray(wrist_img_shape, dtype = np.uint8, buffer = wrist_img_shm.buf)
             img_client = ImageClient(tv_img_shape = tv_img_shape, tv_img_shm_name = tv_img_shm.name, 
-                                    wrist_img_shape = wrist_img_shape, wrist_img_shm_name = wrist_img_shm.name)
+                                    wrist_img_shape = wrist_img_shape, wrist_img_shm_name = wrist_img_shm.name, server_address=args.img_server)
         else:
-            img_client = ImageClient(tv_img_shape = tv_img_shape, tv_img_shm_name = tv_img_shm.name)
+            img_client = ImageClient(tv_img_shape = tv_img_shape, tv_img_shm_name = tv_img_shm.name, server_address=args.img_server)
 
         image_receive_thread = threading.Thread(target = img_client.receive_process, daemon = True)
         image_receive_thread.daemon = True
@@ -176,48 +221,62 @@ if __name__ == '__main__':
         
 
         # arm
+        ik_kwargs = dict(solver_backend=args.ik_solver, jit=args.ik_jit, dls_fast_path=args.ik_dls, use_cache=not args.ik_no_cache,
+                         telemetry=args.ik_telemetry, seed_table=args.ik_seed_table, smoothing_filter=args.ik_filter,
+                         smoothing_params=parse_smoothing_params(args.ik_filter_params))
+        ctrl_kwargs = dict(dds_interface=args.network_interface, control_cpu=args.arm_cpu, control_priority=args.arm_rt_priority, interpolation=args.arm_interp,
+                           interpolation_params=parse_smoothing_params(args.arm_interp_params))
         if args.arm == "G1_29":
-            arm_ik = G1_29_ArmIK()
-            arm_ctrl = G1_29_ArmController(motion_mode=args.motion, simulation_mode=args.sim)
+            arm_ik = G1_29_ArmIK(**ik_kwargs)
+            arm_ctrl = G1_29_ArmController(motion_mode=args.motion, simulation_mode=args.sim, **ctrl_kwargs)
         elif args.arm == "G1_23":
-            arm_ik = G1_23_ArmIK()
-            arm_ctrl = G1_23_ArmController(motion_mode=args.motion, simulation_mode=args.sim)
+            arm_ik = G1_23_ArmIK(**ik_kwargs)
+            arm_ctrl = G1_23_ArmController(motion_mode=args.motion, simulation_mode=args.sim, **ctrl_kwargs)
         elif args.arm == "H1_2":
-            arm_ik = H1_2_ArmIK()
-            arm_ctrl = H1_2_ArmController(motion_mode=args.motion, simulation_mode=args.sim)
+            arm_ik = H1_2_ArmIK(**ik_kwargs)
+            arm_ctrl = H1_2_ArmController(motion_mode=args.motion, simulation_mode=args.sim, **ctrl_kwargs)
         elif args.arm == "H1":
-            arm_ik = H1_ArmIK()
-            arm_ctrl = H1_ArmController(simulation_mode=args.sim)
+            arm_ik = H1_ArmIK(**ik_kwargs)
+            arm_ctrl = H1_ArmController(simulation_mode=args.sim, **ctrl_kwargs)
+        ARM_CONTROL_LOOP = arm_ctrl.control_loop
+        if args.ik_telemetry:
+            IK_TELEMETRY = arm_ik.telemetry
+        if args.ik_async:
+            arm_ik_worker = ArmIKWorker(arm_ik)
+        if args.wrist_predict:
+            WRIST_PREDICTOR = WristPosePredictor(args.wrist_predict, latency=args.wrist_predict_latency,
+                                                 **parse_smoothing_params(args.wrist_predict_params))
 
         # end-effector
         if args.ee == "dex3":
-            left_hand_pos_array = Array('d', 75, lock = True)      # [input]
-            right_hand_pos_array = Array('d', 75, lock = True)     # [input]
-            dual_hand_data_lock = Lock()
-            dual_hand_state_array = Array('d', 14, lock = False)   # [output] current left, right hand state(14) data.
-            dual_hand_action_array = Array('d', 14, lock = False)  # [output] current left, right hand action(14) data.
-            hand_ctrl = Dex3_1_Controller(left_hand_pos_array, right_hand_pos_array, dual_hand_data_lock, dual_hand_state_array, dual_hand_action_array, simulation_mode=args.sim)
+            left_hand_pos_channel = ShmChannel((25, 3))            # [input]
+            right_hand_pos_channel = ShmChannel((25, 3))           # [input]
+            dual_hand_data_channel = ShmChannel((2, 14))           # [output] current left, right hand state(14) and action(14) data.
+            hand_ctrl = Dex3_1_Controller(left_hand_pos_channel, right_hand_pos_channel, dual_hand_data_channel, simulation_mode=args.sim,
+                                         dds_interface=args.network_interface, input_driven=args.hand_input_driven,
+                                         parallel_retargeting=args.hand_parallel_retarget)
         elif args.ee == "dex1":
             left_gripper_value = Value('d', 0.0, lock=True)        # [input]
             right_gripper_value = Value('d', 0.0, lock=True)       # [input]
             dual_gripper_data_lock = Lock()
             dual_gripper_state_array = Array('d', 2, lock=False)   # current left, right gripper state(2) data.
             dual_gripper_action_array = Array('d', 2, lock=False)  # current left, right gripper action(2) data.
-            gripper_ctrl = Dex1_1_Gripper_Controller(left_gripper_value, right_gripper_value, dual_gripper_data_lock, dual_gripper_state_array, dual_gripper_action_array, simulation_mode=args.sim)
+            gripper_ctrl = Dex1_1_Gripper_Controller(left_gripper_value, right_gripper_value, dual_gripper_data_lock, dual_gripper_state_array, dual_gripper_action_array, simulation_mode=args.sim, dds_interface=args.network_interface,
+                                                     smoothing_filter=args.gripper_filter, smoothing_params=parse_smoothing_params(args.gripper_filter_params) or None)
         elif args.ee == "inspire1":
-            left_hand_pos_array = Array('d', 75, lock = True)      # [input]
-            right_hand_pos_array = Array('d', 75, lock = True)     # [input]
-            dual_hand_data_lock = Lock()
-            dual_hand_state_array = Array('d', 12, lock = False)   # [output] current left, right hand state(12) data.
-            dual_hand_action_array = Array('d', 12, lock = False)  # [output] current left, right hand action(12) data.
-            hand_ctrl = Inspire_Controller(left_hand_pos_array, right_hand_pos_array, dual_hand_data_lock, dual_hand_state_array, dual_hand_action_array, simulation_mode=args.sim)
+            left_hand_pos_channel = ShmChannel((25, 3))            # [input]
+            right_hand_pos_channel = ShmChannel((25, 3))           # [input]
+            dual_hand_data_channel = ShmChannel((2, 12))           # [output] current left, right hand state(12) and action(12) data.
+            hand_ctrl = Inspire_Controller(left_hand_pos_channel, right_hand_pos_channel, dual_hand_data_channel, simulation_mode=args.sim,
+                                         dds_interface=args.network_interface, input_driven=args.hand_input_driven,
+                                         parallel_retargeting=args.hand_parallel_retarget)
         elif args.ee == "brainco":
-            left_hand_pos_array = Array('d', 75, lock = True)      # [input]
-            right_hand_pos_array = Array('d', 75, lock = True)     # [input]
-            dual_hand_data_lock = Lock()
-            dual_hand_state_array = Array('d', 12, lock = False)   # [output] current left, right hand state(12) data.
-            dual_hand_action_array = Array('d', 12, lock = False)  # [output] current left, right hand action(12) data.
-            hand_ctrl = Brainco_Controller(left_hand_pos_array, right_hand_pos_array, dual_hand_data_lock, dual_hand_state_array, dual_hand_action_array, simulation_mode=args.sim)
+            left_hand_pos_channel = ShmChannel((25, 3))            # [input]
+            right_hand_pos_channel = ShmChannel((25, 3))           # [input]
+            dual_hand_data_channel = ShmChannel((2, 12))           # [output] current left, right hand state(12) and action(12) data.
+            hand_ctrl = Brainco_Controller(left_hand_pos_channel, right_hand_pos_channel, dual_hand_data_channel, simulation_mode=args.sim,
+                                         dds_interface=args.network_interface, input_driven=args.hand_input_driven,
+                                         parallel_retargeting=args.hand_parallel_retarget)
         else:
             pass
         
@@ -266,6 +325,30 @@ if __name__ == '__main__':
             time.sleep(0.01)
         logger_mp.info("start program.")
         arm_ctrl.speed_gradual_max()
+        IK_FEED = args.ik_async and args.ik_rate > 0.0
+        if IK_FEED:
+            # the worker's feed loop solves the latest wrist poses of the main loop and commands the arms at --ik-rate,
+            # the main loop only samples the XR data and records
+            tele_data = tv_wrapper.get_motion_state_data()
+            wrist_pose_lock = threading.Lock()
+            wrist_poses = [tele_data.left_arm_pose, tele_data.right_arm_pose]
+
+            def ik_request():
+                with wrist_pose_lock:
+                    left_arm_pose, right_arm_pose = wrist_poses
+                if WRIST_PREDICTOR is not None:
+                    left_arm_pose, right_arm_pose = WRIST_PREDICTOR.predict(left_arm_pose, right_arm_pose)
+                return left_arm_pose, right_arm_pose, arm_ctrl.get_current_dual_arm_q(), arm_ctrl.get_current_dual_arm_dq()
+
+            def on_ik_solution(sol_q, sol_tauff, sol_seq, sol_timestamp):
+                arm_ctrl.ctrl_dual_arm(sol_q, sol_tauff)
+                if WRIST_PREDICTOR is not None:
+                    latency = time.time() - sol_timestamp
+                    if arm_ctrl.interpolator is not None:
+                        latency += arm_ctrl.interpolator.period
+                    WRIST_PREDICTOR.measured_latency.update(latency)
+
+            arm_ik_worker.start_feed(ik_request, on_ik_solution, args.ik_rate)
         while not STOP:
             start_time = time.time()
 
@@ -300,20 +383,20 @@ if __name__ == '__main__':
 
             # get input data
             tele_data = tv_wrapper.get_motion_state_data()
+            time_sample = time.time()
+            if IK_FEED:
+                with wrist_pose_lock:
+                    wrist_poses[:] = tele_data.left_arm_pose, tele_data.right_arm_pose
 
             # print(f"Left Arm Pose:{tele_data.left_arm_pose}")
             # print(f"Left Hand Pose: (first 5): {tele_data.left_hand_pos.flatten()[0:5]}")
 
             if (args.ee == "dex3" or args.ee == "inspire1" or args.ee == "brainco") and args.xr_mode == "hand":
-                with left_hand_pos_array.get_lock():
-                    left_hand_pos_array[:] = tele_data.left_hand_pos.flatten()
-                with right_hand_pos_array.get_lock():
-                    right_hand_pos_array[:] = tele_data.right_hand_pos.flatten()
+                left_hand_pos_channel.write(tele_data.left_hand_pos)
+                right_hand_pos_channel.write(tele_data.right_hand_pos)
             # elif args.ee == "dex3"  and args.xr_mode == "controller":
-            #     with left_hand_pos_array.get_lock():
-            #         left_hand_pos_array[:] = tele_data.left_hand_pos.flatten()
-            #     with right_hand_pos_array.get_lock():
-            #         right_hand_pos_array[:] = tele_data.right_hand_pos.flatten()
+            #     left_hand_pos_channel.write(tele_data.left_hand_pos)
+            #     right_hand_pos_channel.write(tele_data.right_hand_pos)
             elif args.ee == "dex1" and args.xr_mode == "controller":
                 with left_gripper_value.get_lock():
                     left_gripper_value.value = tele_data.left_trigger_value
@@ -345,12 +428,36 @@ if __name__ == '__main__':
             current_lr_arm_q  = arm_ctrl.get_current_dual_arm_q()
             current_lr_arm_dq = arm_ctrl.get_current_dual_arm_dq()
 
+            # compensate the latency between the wrist pose sample and the arm command
+            left_arm_pose, right_arm_pose = tele_data.left_arm_pose, tele_data.right_arm_pose
+            if WRIST_PREDICTOR is not None and not IK_FEED:
+                left_arm_pose, right_arm_pose = WRIST_PREDICTOR.predict(left_arm_pose, right_arm_pose)
+
             # solve ik using motor data and wrist pose, then use ik results to control arms.
             time_ik_start = time.time()
-            sol_q, sol_tauff  = arm_ik.solve_ik(tele_data.left_arm_pose, tele_data.right_arm_pose, current_lr_arm_q, current_lr_arm_dq)
+            if IK_FEED:
+                # solved and sent to the arms by the feed loop, record its latest solution
+                sol_q, sol_tauff = arm_ik_worker.sol_q, arm_ik_worker.sol_tauff
+                if sol_q is None:
+                    sol_q, sol_tauff = current_lr_arm_q, np.zeros_like(current_lr_arm_q)
+            elif args.ik_async:
+                ik_seq = arm_ik_worker.submit(left_arm_pose, right_arm_pose, current_lr_arm_q, current_lr_arm_dq)
+                sol_q, sol_tauff, sol_seq, sol_timestamp = arm_ik_worker.get_solution()
+                if sol_q is None:  # no solution before the first request is solved, hold the current pose
+                    sol_q, sol_tauff = current_lr_arm_q, np.zeros_like(current_lr_arm_q)
+                logger_mp.debug(f"ik lag:\t{ik_seq - sol_seq} requests, {arm_ik_worker.dropped_requests} dropped")
+            else:
+                sol_q, sol_tauff  = arm_ik.solve_ik(left_arm_pose, right_arm_pose, current_lr_arm_q, current_lr_arm_dq)
             time_ik_end = time.time()
             logger_mp.debug(f"ik:\t{round(time_ik_end - time_ik_start, 6)}")
-            arm_ctrl.ctrl_dual_arm(sol_q, sol_tauff)
+            if not IK_FEED:
+                arm_ctrl.ctrl_dual_arm(sol_q, sol_tauff)
+            if WRIST_PREDICTOR is not None and not IK_FEED:
+                # the async solution answers a request sent sol_timestamp, the interpolator adds one target period
+                latency = time.time() - (sol_timestamp if args.ik_async and sol_timestamp > 0.0 else time_sample)
+                if arm_ctrl.interpolator is not None:
+                    latency += arm_ctrl.interpolator.period
+                WRIST_PREDICTOR.measured_latency.update(latency)
 
             # if tele_data.tele_state.right_trigger_state:
                 #logger_mp.debug("trigger_ok")
@@ -363,21 +470,21 @@ if __name__ == '__main__':
                 RECORD_READY = recorder.is_ready()
                 # dex hand or gripper
                 if args.ee == "dex3" and args.xr_mode == "hand":
-                    with dual_hand_data_lock:
-                        left_ee_state = dual_hand_state_array[:7]
-                        right_ee_state = dual_hand_state_array[-7:]
-                        left_hand_action = dual_hand_action_array[:7]
-                        right_hand_action = dual_hand_action_array[-7:]
-                        current_body_state = []
-                        current_body_action = []
+                    hand_data, _, _ = dual_hand_data_channel.read()
+                    left_ee_state = hand_data[0, :7].tolist()
+                    right_ee_state = hand_data[0, -7:].tolist()
+                    left_hand_action = hand_data[1, :7].tolist()
+                    right_hand_action = hand_data[1, -7:].tolist()
+                    current_body_state = []
+                    current_body_action = []
                 elif args.ee == "dex3" and args.xr_mode == "controller":
-                    with dual_hand_data_lock:
-                        left_ee_state = dual_hand_state_array[:7]
-                        right_ee_state = dual_hand_state_array[-7:]
-                        left_hand_action = dual_hand_action_array[:7]
-                        right_hand_action = dual_hand_action_array[-7:]
-                        current_body_state = []
-                        current_body_action = []
+                    hand_data, _, _ = dual_hand_data_channel.read()
+                    left_ee_state = hand_data[0, :7].tolist()
+                    right_ee_state = hand_data[0, -7:].tolist()
+                    left_hand_action = hand_data[1, :7].tolist()
+                    right_hand_action = hand_data[1, -7:].tolist()
+                    current_body_state = []
+                    current_body_action = []
                 elif args.ee == "dex1" and args.xr_mode == "hand":
                     with dual_gripper_data_lock:
                         left_ee_state = [dual_gripper_state_array[0]]
@@ -397,13 +504,13 @@ if __name__ == '__main__':
                                                -tele_data.tele_state.left_thumbstick_value[0]  * 0.3,
                                                -tele_data.tele_state.right_thumbstick_value[0] * 0.3]
                 elif (args.ee == "inspire1" or args.ee == "brainco") and args.xr_mode == "hand":
-                    with dual_hand_data_lock:
-                        left_ee_state = dual_hand_state_array[:6]
-                        right_ee_state = dual_hand_state_array[-6:]
-                        left_hand_action = dual_hand_action_array[:6]
-                        right_hand_action = dual_hand_action_array[-6:]
-                        current_body_state = []
-                        current_body_action = []
+                    hand_data, _, _ = dual_hand_data_channel.read()
+                    left_ee_state = hand_data[0, :6].tolist()
+                    right_ee_state = hand_data[0, -6:].tolist()
+                    left_hand_action = hand_data[1, :6].tolist()
+                    right_hand_action = hand_data[1, -6:].tolist()
+                    current_body_state = []
+                    current_body_action = []
                 else:
                     left_ee_state = []
                     right_ee_state = []
@@ -500,7 +607,18 @@ if __name__ == '__main__':
     except KeyboardInterrupt:
         logger_mp.info("KeyboardInterrupt, exiting program...")
     finally:
-        arm_ctrl.ctrl_dual_arm_go_home()
+        # the feed loop of the IK worker would interrupt homing, stop it first
+        if args.ik_async:
+            arm_ik_worker.stop()
+        # homing runs in the arm control loop while the rest shuts down
+        go_home_future = arm_ctrl.go_home()
+        if IK_TELEMETRY is not None:
+            logger_mp.info(f"IK telemetry: {IK_TELEMETRY.summary()}")
+        logger_mp.info(f"DDS subscriptions: {subscription_metrics()}")
+        if ARM_CONTROL_LOOP is not None:
+            logger_mp.info(f"Arm control loop: {ARM_CONTROL_LOOP.stats()}")
+        if WRIST_PREDICTOR is not None:
+            logger_mp.info(f"Wrist predictor: {WRIST_PREDICTOR.summary()}")
 
         if args.ipc:
             ipc_server.stop()
@@ -515,8 +633,16 @@ if __name__ == '__main__':
         if WRIST:
             wrist_img_shm.close()
             wrist_img_shm.unlink()
+        if args.ee in ("dex3", "inspire1", "brainco"):
+            left_hand_pos_channel.close()
+            right_hand_pos_channel.close()
+            dual_hand_data_channel.close()
 
         if args.record:
             recorder.close()
+        try:
+            go_home_future.result(timeout = 10.0)
+        except FutureTimeoutError:
+            logger_mp.warning("Arms did not reach the home position within 10 s.")
         logger_mp.info("Finally, exiting program.")
         exit(0)
@@ -9,7 +9,7 @@ import numpy as np
 import time
 import argparse
 import cv2
-from multiprocessing import shared_memory, Value, Array, Lock
+from multiprocessing import shared_memory, Value, Array
 import threading
 import logging_mp
 logging_mp.basic_config(level=logging_mp.INFO)
@@ -29,6 +29,7 @@ from teleop.robot_control.robot_hand_brainco import Brainco_Controller
 from teleop.image_server.image_client import ImageClient
 from teleop.utils.episode_writer import EpisodeWriter
 from teleop.utils.ipc import IPC_Server
+from teleop.utils.shm_channel import ShmChannel
 from sshkeyboard import listen_keyboard, stop_listening
 
 from dex_dds_helper import DexDDSTeleopHelper
@@ -226,17 +227,14 @@ if __name__ == '__main__':
 
         # end-effector
         if args.ee == "dex3":
-            left_hand_pos_array = Array('d', 75, lock = True)      # [input]
-            right_hand_pos_array = Array('d', 75, lock = True)     # [input]
-            dual_hand_data_lock = Lock()
-            dual_hand_state_array = Array('d', 14, lock = False)   # [output] current left, right hand state(14) data.
-            dual_hand_action_array = Array('d', 14, lock = False)  # [output] current left, right hand action(14) data.
+            left_hand_pos_channel = ShmChannel((25, 3))            # [input]
+            right_hand_pos_channel = ShmChannel((25, 3))           # [input]
+            dual_hand_data_channel = ShmChannel((2, 14))           # [output] current left, right hand state(14) and action(14) data.
             right_hand_override = Array('d', 1, lock = True)
             right_hand_override[0] = 0.0
             left_hand_override = Array('d', 1, lock = True)
             left_hand_override[0] = 0.0
-            hand_ctrl = Dex3_1_Controller(left_hand_pos_array, right_hand_pos_array,
-                                          dual_hand_data_lock, dual_hand_state_array, dual_hand_action_array, 
+            hand_ctrl = Dex3_1_Controller(left_hand_pos_channel, right_hand_pos_channel, dual_hand_data_channel,
                                           simulation_mode=args.sim, right_hand_override=right_hand_override, left_hand_override=left_hand_override,
                                           dds_interface=args.iface)
             
@@ -287,15 +285,16 @@ if __name__ == '__main__':
             left_hold_active = False
             right_hold_q = np.zeros(7, dtype=np.float64)
             left_hold_q = np.zeros(7, dtype=np.float64)
+            # the controller does not write the action of an overridden hand, the commands sent here are recorded instead
+            hand_action_q14 = np.zeros(14, dtype=np.float64)
 
 
         elif args.ee == "fake_dex":
-            left_hand_pos_array = Array('d', 75, lock = True)      # [input]
-            right_hand_pos_array = Array('d', 75, lock = True)     # [input]
-            dual_hand_data_lock = Lock()
-            dual_hand_state_array = Array('d', 14, lock = False)   # [output] current left, right hand state(14) data.
-            dual_hand_action_array = Array('d', 14, lock = False)  # [output] current left, right hand action(14) data.
+            left_hand_pos_channel = ShmChannel((25, 3))            # [input]
+            right_hand_pos_channel = ShmChannel((25, 3))           # [input]
+            dual_hand_data_channel = ShmChannel((2, 14))           # [output] current left, right hand state(14) and action(14) data.
             hand_ctrl = None
+            hand_action_q14 = np.zeros(14, dtype=np.float64)
 
             dex3_left_pub = ChannelPublisher("rt/dex3/left/cmd", HandCmd_)
             dex3_left_pub.Init()
@@ -420,15 +419,11 @@ if __name__ == '__main__':
             tele_data = tv_wrapper.get_motion_state_data()
 
             if (args.ee == "dex3" or args.ee == "inspire1" or args.ee == "brainco") and args.xr_mode == "hand":
-                with left_hand_pos_array.get_lock():
-                    left_hand_pos_array[:] = tele_data.left_hand_pos.flatten()
-                with right_hand_pos_array.get_lock():
-                    right_hand_pos_array[:] = tele_data.right_hand_pos.flatten()
+                left_hand_pos_channel.write(tele_data.left_hand_pos)
+                right_hand_pos_channel.write(tele_data.right_hand_pos)
             # elif args.ee == "dex3"  and args.xr_mode == "controller":
-            #     with left_hand_pos_array.get_lock():
-            #         left_hand_pos_array[:] = tele_data.left_hand_pos.flatten()
-            #     with right_hand_pos_array.get_lock():
-            #         right_hand_pos_array[:] = tele_data.right_hand_pos.flatten()
+            #     left_hand_pos_channel.write(tele_data.left_hand_pos)
+            #     right_hand_pos_channel.write(tele_data.right_hand_pos)
             else:
                 pass        
             
@@ -568,9 +563,8 @@ if __name__ == '__main__':
 
                 fake_q14[-7:] = grab_pose_right
 
-                with dual_hand_data_lock:
-                    dual_hand_action_array[:] = fake_q14
-                    dual_hand_state_array[:] = fake_q14
+                dual_hand_data_channel.write((fake_q14, fake_q14))
+                hand_action_q14 = fake_q14
 
                 left7 = fake_q14[:7]
                 for i, jid in enumerate(Dex3_1_Left_JointIndex):
@@ -578,7 +572,8 @@ if __name__ == '__main__':
                 dex3_left_pub.Write(dex3_left_msg)
                 
             elif args.ee == "dex3":
-                q14 = np.array(dual_hand_action_array[:], dtype=np.float64)
+                hand_state_q14 = dual_hand_data_channel.read()[0][0]
+                q14 = hand_action_q14.copy()
 
                 # contact detection
                 # (use corrected pressure if available)
@@ -598,8 +593,7 @@ if __name__ == '__main__':
                         if not right_hold_active:
                             right_hold_active = True
                             # snap near current state and hold
-                            with dual_hand_data_lock:
-                                cur_r = np.array(dual_hand_state_array[-7:], dtype=np.float64)
+                            cur_r = hand_state_q14[-7:]
                             right_hold_q = cur_r + SQUEEZE_OFFSET * np.sign(grab_pose_right - cur_r)
                         q14[-7:] = right_hold_q
 
@@ -609,8 +603,7 @@ if __name__ == '__main__':
                             dex3_right_msg.motor_cmd[jid].kd = KD_HOLD
                     else:
                         right_hold_active = False
-                        with dual_hand_data_lock:
-                            cur = np.array(dual_hand_state_array[-7:], dtype=np.float64)
+                        cur = hand_state_q14[-7:]
 
                         target = grab_pose_right
                         dt = 1.0 / args.frequency
@@ -645,8 +638,7 @@ if __name__ == '__main__':
                     if left_contact:
                         if not left_hold_active:
                             left_hold_active = True
-                            with dual_hand_data_lock:
-                                cur_l = np.array(dual_hand_state_array[:7], dtype=np.float64)
+                            cur_l = hand_state_q14[:7]
                             left_hold_q = cur_l + SQUEEZE_OFFSET * np.sign(grab_pose_left - cur_l)
                         q14[:7] = left_hold_q
 
@@ -655,8 +647,7 @@ if __name__ == '__main__':
                             dex3_left_msg.motor_cmd[jid].kd = KD_HOLD
                     else:
                         left_hold_active = False
-                        with dual_hand_data_lock:
-                            cur = np.array(dual_hand_state_array[:7], dtype=np.float64)
+                        cur = hand_state_q14[:7]
 
                         target = grab_pose_left
                         dt = 1.0 / args.frequency
@@ -694,8 +685,7 @@ if __name__ == '__main__':
                 dex3_left_pub.Write(dex3_left_msg)
 
                 # keep recorded actions in sync with the commands we just sent
-                with dual_hand_data_lock:
-                    dual_hand_action_array[:] = q14
+                hand_action_q14 = q14
             else:
                 pass
             
@@ -735,13 +725,13 @@ if __name__ == '__main__':
                 #     right_hand_action = []
                 #     current_body_state = []
                 #     current_body_action = []
-                with dual_hand_data_lock:
-                    left_ee_state = dual_hand_state_array[:7]
-                    right_ee_state = dual_hand_state_array[-7:]
-                    left_hand_action = dual_hand_action_array[:7]
-                    right_hand_action = dual_hand_action_array[-7:]
-                    current_body_state = []
-                    current_body_action = []
+                hand_state_q14 = dual_hand_data_channel.read()[0][0]
+                left_ee_state = hand_state_q14[:7].tolist()
+                right_ee_state = hand_state_q14[-7:].tolist()
+                left_hand_action = hand_action_q14[:7].tolist()
+                right_hand_action = hand_action_q14[-7:].tolist()
+                current_body_state = []
+                current_body_action = []
                 # head image
                 current_tv_image = tv_img_array.copy()
                 # wrist image
@@ -847,6 +837,10 @@ if __name__ == '__main__':
         if WRIST:
             wrist_img_shm.close()
             wrist_img_shm.unlink()
+        if args.ee in ("dex3", "fake_dex"):
+            left_hand_pos_channel.close()
+            right_hand_pos_channel.close()
+            dual_hand_data_channel.close()
 
         if args.record:
             recorder.close()
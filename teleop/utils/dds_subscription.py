@@ -0,0 +1,98 @@
+import threading
+import time
+import numpy as np
+from unitree_sdk2py.core.channel import ChannelSubscriber
+
+import logging_mp
+logger_mp = logging_mp.get_logger(__name__)
+
+
+class StateSubscription:
+    """
+    Event driven DDS subscription of one topic, using the handler mode of the SDK instead of polling Read().
+
+    handler(msg) is called as soon as a sample arrives, from the DDS listener thread (queue_len = 0) or from the
+    reader thread of the SDK (queue_len > 0), so it should only copy the sample into a state store.
+    Every arrival is recorded for the per-topic metrics: arrival rate, inter-arrival intervals and staleness.
+    """
+    def __init__(self, topic, msg_type, handler = None, queue_len = 0, window_size = 200):
+        """
+        topic: DDS topic name, e.g. "rt/lowstate".
+        msg_type: idl type of the topic.
+        handler: called with every new sample, may be None to only keep the latest sample.
+        queue_len: length of the SDK's sample queue, 0 calls handler directly in the DDS listener thread.
+        window_size: number of inter-arrival intervals kept for the metrics.
+        """
+        self.topic = topic
+        self.handler = handler
+        self.latest = None         # latest sample
+        self.count = 0             # number of samples received
+        self.handler_errors = 0
+        self.last_arrival = None   # time.monotonic() of the latest sample
+        self._window_size = window_size
+        self._intervals = np.zeros(window_size)
+        self._index = 0
+        self._lock = threading.Lock()
+        self._first_sample = threading.Event()
+
+        self.subscriber = ChannelSubscriber(topic, msg_type)
+        self.subscriber.Init(self._on_sample, queue_len)
+        with _registry_lock:
+            _registry.append(self)
+
+    def _on_sample(self, msg):
+        now = time.monotonic()
+        try:
+            if self.handler is not None:
+                self.handler(msg)
+        except Exception as e:
+            self.handler_errors += 1
+            if self.handler_errors == 1:
+                logger_mp.error(f"[StateSubscription] Handler of {self.topic} failed: {e}")
+        with self._lock:
+            if self.last_arrival is not None:
+                self._intervals[self._index] = now - self.last_arrival
+                self._index = (self._index + 1) % self._window_size
+            self.last_arrival = now
+            self.latest = msg
+            self.count += 1
+        self._first_sample.set()
+
+    def wait_for_sample(self, timeout = None):
+        """Block until the first sample arrived, return False on timeout."""
+        return self._first_sample.wait(timeout)
+
+    def staleness(self):
+        """Seconds since the latest sample, inf before the first one."""
+        last_arrival = self.last_arrival
+        return float("inf") if last_arrival is None else time.monotonic() - last_arrival
+
+    def metrics(self):
+        """Return a JSON serializable dict with the sample count, arrival rate, intervals and staleness of the topic."""
+        with self._lock:
+            count = self.count
+            intervals = self._intervals[:min(max(count - 1, 0), self._window_size)].copy()
+        metrics = {"samples": count, "handler_errors": self.handler_errors}
+        if count > 0:
+            metrics["staleness_ms"] = self.staleness() * 1e3
+        if len(intervals) > 0:
+            p50, p99 = np.percentile(intervals, [50, 99]) * 1e3
+            metrics["rate_hz"] = float(1.0 / max(np.mean(intervals), 1e-9))
+            metrics["interval_ms"] = {"p50": float(p50), "p99": float(p99), "max": float(np.max(intervals) * 1e3)}
+        return metrics
+
+    def close(self):
+        self.subscriber.Close()
+        with _registry_lock:
+            if self in _registry:
+                _registry.remove(self)
+
+
+_registry = []
+_registry_lock = threading.Lock()
+
+def subscription_metrics():
+    """Return the metrics of all open subscriptions of this process, keyed by topic."""
+    with _registry_lock:
+        subscriptions = list(_registry)
+    return {subscription.topic: subscription.metrics() for subscription in subscriptions}
@@ -0,0 +1,85 @@
+import threading
+import numpy as np
+
+
+class IKTelemetry:
+    """
+    Rolling record of arm IK solves: wall time, solver iterations, final residuals and which path produced the solution.
+
+    record() only writes into preallocated ring buffers, percentiles are computed on demand by summary(),
+    which may be called from another thread (e.g. the IPC heartbeat).
+    """
+    PATHS = ("dls", "ipopt", "failed")
+
+    def __init__(self, window_size = 1000):
+        self._window_size = window_size
+        self._solve_time = np.zeros(window_size)
+        self._iterations = np.zeros(window_size)
+        self._translation_residual = np.zeros(window_size)
+        self._rotation_residual = np.zeros(window_size)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._index = 0
+            self._count = 0
+            self.total_solves = 0
+            self.path_counts = dict.fromkeys(self.PATHS, 0)
+            self.dls_fallbacks = 0   # damped least squares fast path rejected, ipopt was run
+            self.last = None
+
+    def record(self, solve_time, iterations, translation_residual, rotation_residual, path, dls_fallback = False):
+        """
+        solve_time: wall time of the solve in seconds.
+        path: "dls", "ipopt" or "failed" (ipopt did not converge and solve_ik returned the fallback).
+        """
+        with self._lock:
+            i = self._index
+            self._solve_time[i] = solve_time
+            self._iterations[i] = iterations
+            self._translation_residual[i] = translation_residual
+            self._rotation_residual[i] = rotation_residual
+            self._index = (i + 1) % self._window_size
+            self._count = min(self._count + 1, self._window_size)
+            self.total_solves += 1
+            self.path_counts[path] += 1
+            if dls_fallback:
+                self.dls_fallbacks += 1
+            self.last = (solve_time, iterations, translation_residual, rotation_residual, path)
+
+    @staticmethod
+    def _percentiles(values, scale = 1.0):
+        p50, p95, p99 = np.percentile(values, [50, 95, 99]) * scale
+        return {"p50": float(p50), "p95": float(p95), "p99": float(p99), "max": float(np.max(values) * scale)}
+
+    def summary(self):
+        """Return a JSON serializable dict with counters and p50/p95/p99/max over the last window_size solves."""
+        with self._lock:
+            count = self._count
+            solve_time = self._solve_time[:count].copy()
+            iterations = self._iterations[:count].copy()
+            translation_residual = self._translation_residual[:count].copy()
+            rotation_residual = self._rotation_residual[:count].copy()
+            summary = {
+                "solves": self.total_solves,
+                "paths": dict(self.path_counts),
+                "dls_fallbacks": self.dls_fallbacks,
+            }
+            last = self.last
+
+        if count == 0:
+            return summary
+        summary["window"] = count
+        summary["solve_time_ms"] = self._percentiles(solve_time, 1e3)
+        summary["iterations"] = self._percentiles(iterations)
+        summary["translation_residual"] = self._percentiles(translation_residual)
+        summary["rotation_residual"] = self._percentiles(rotation_residual)
+        summary["last"] = {
+            "solve_time_ms": float(last[0] * 1e3),
+            "iterations": int(last[1]),
+            "translation_residual": float(last[2]),
+            "rotation_residual": float(last[3]),
+            "path": last[4],
+        }
+        return summary
@@ -55,9 +55,20 @@ logger_mp = logging_mp.get_logger(__name__, level=logging_mp.INFO)
         "STOP" : True | False,          # whether exit program
         "RECORD_RUNNING": True | False, # whether is recording
         "RECORD_READY": True | False,   # whether ready to record
+        "IK": {...},                    # optional, with --ik-telemetry: IKTelemetry.summary() of the arm IK
+        "DDS": {...},                   # StateSubscription.metrics() of every subscribed state topic, keyed by topic
+        "ARM_LOOP": {...},              # RealtimeLoop.stats() of the 250 Hz arm command loop
+        "PREDICTOR": {...},             # optional, with --wrist-predict: WristPosePredictor.summary(), prediction errors
     }
 """
 
+def ipc_endpoints(name=None):
+    """Return the data and heartbeat IPC socket paths, name (e.g. the robot name in fleet mode) makes them per instance."""
+    rd = os.environ.get("XDG_RUNTIME_DIR") or "/tmp"
+    suffix = f"{os.getuid()}-{name}" if name else f"{os.getuid()}"
+    return (os.path.join(rd, f"xr-teleoperate-data-{suffix}.ipc"),
+            os.path.join(rd, f"xr-teleoperate-hb-{suffix}.ipc"))
+
 
 class IPC_Server:
     """
@@ -72,13 +83,14 @@ class IPC_Server:
         "CMD_RECORD_TOGGLE": "s",  # start & stop (toggle record)
     }
 
-    def __init__(self, on_press=None, on_info=None, get_state=None, hb_fps=10.0):
+    def __init__(self, on_press=None, on_info=None, get_state=None, hb_fps=10.0, name=None):
         """
         Args:
             on_press  : callback(cmd:str), called for every command
             on_info   : callback(data:dict), only handle CMD_RECORD_TOGGLE's task info
             hb_fps    : heartbeat publish frequency
             get_state : callback() -> dict, provides current heartbeat state
+            name      : instance name of the IPC endpoints, None for the default ones
         """
         if callable(on_press):
             self.on_press = on_press
@@ -94,10 +106,9 @@ class IPC_Server:
         self._data_loop_thread = None
         self._hb_loop_thread = None
 
-        rd = os.environ.get("XDG_RUNTIME_DIR") or "/tmp"
+        self.data_ipc, self.hb_ipc = ipc_endpoints(name)
         self.ctx = zmq.Context.instance()
         # data IPC (REQ/REP): required
-        self.data_ipc = os.path.join(rd, f"xr-teleoperate-data-{os.getuid()}.ipc")
         self.rep_socket = self.ctx.socket(zmq.REP)
         try:
             if os.path.exists(self.data_ipc):
@@ -108,7 +119,6 @@ class IPC_Server:
         logger_mp.info(f"[IPC_Server] Listening to Data at ipc://{self.data_ipc}")
 
         # heartbeat IPC (PUB/SUB)
-        self.hb_ipc = os.path.join(rd, f"xr-teleoperate-hb-{os.getuid()}.ipc")
         self.pub_socket = self.ctx.socket(zmq.PUB)
         try:
             if os.path.exists(self.hb_ipc):
@@ -235,10 +245,13 @@ class IPC_Client:
     - Send command/info via REQ
     - Subscribe heartbeat via SUB
     """
-    def __init__(self, hb_fps=10.0):
-        """hb_fps: heartbeat subscribe frequency, should match server side."""
-        rd = os.environ.get("XDG_RUNTIME_DIR") or "/tmp"
-        self.ctx = zmq.Context.instance()
+    def __init__(self, hb_fps=10.0, name=None):
+        """
+        hb_fps: heartbeat subscribe frequency, should match server side.
+        name: instance name of the server's IPC endpoints, None for the default ones.
+        """
+        self.data_ipc, self.hb_ipc = ipc_endpoints(name)
+        self.ctx = zmq.Context()  # own context, stop() terminates it without affecting other clients of the process
 
         # heartbeat IPC (PUB/SUB)
         self._hb_running = True
@@ -248,7 +261,6 @@ class IPC_Client:
         self._hb_interval = 1.0 / float(hb_fps)     # expected heartbeat interval
         self._hb_lock = threading.Lock()            # lock for heartbeat state
         self._hb_timeout = 5.0 * self._hb_interval  # timeout to consider offline
-        self.hb_ipc = os.path.join(rd, f"xr-teleoperate-hb-{os.getuid()}.ipc")
         self.sub_socket = self.ctx.socket(zmq.SUB)
         self.sub_socket.setsockopt(zmq.RCVHWM, 1)
         self.sub_socket.connect(f"ipc://{self.hb_ipc}")
@@ -258,7 +270,6 @@ class IPC_Client:
         self._hb_thread.start()
 
         # data IPC (REQ/REP)
-        self.data_ipc = os.path.join(rd, f"xr-teleoperate-data-{os.getuid()}.ipc")
         self.req_socket = self.ctx.socket(zmq.REQ)
         self.req_socket.connect(f"ipc://{self.data_ipc}")
         logger_mp.info(f"[IPC_Client] Connected to Data at ipc://{self.data_ipc}")
@@ -0,0 +1,187 @@
+import argparse
+import threading
+import time
+import os
+import sys
+import numpy as np
+from unitree_sdk2py.core.channel import ChannelPublisher, ChannelFactoryInitialize
+from unitree_sdk2py.idl.unitree_hg.msg.dds_ import LowCmd_ as hg_LowCmd, HandCmd_
+from unitree_sdk2py.idl.unitree_go.msg.dds_ import LowCmd_ as go_LowCmd, MotorCmds_, MotorStates_
+from unitree_sdk2py.idl.unitree_hg.msg.dds_ import LowState_ as hg_LowState, HandState_
+from unitree_sdk2py.idl.unitree_go.msg.dds_ import LowState_ as go_LowState
+from unitree_sdk2py.idl.default import (unitree_hg_msg_dds__LowState_, unitree_go_msg_dds__LowState_,
+                                        unitree_hg_msg_dds__HandState_, unitree_go_msg_dds__MotorState_)
+
+parent2_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(parent2_dir)
+from teleop.utils.dds_subscription import StateSubscription, subscription_metrics
+from teleop.utils.realtime_loop import RealtimeLoop
+
+import logging_mp
+logger_mp = logging_mp.get_logger(__name__)
+
+"""
+Loopback stand-in of the robot for benchmarks without hardware or Isaac sim: every simulated device subscribes to the
+command topic(s) of a controller of robot_control/, moves its motors towards the commanded q with first order dynamics
+(time constant --time-constant) and publishes their q / dq on the state topic at its own rate.
+Received commands are recorded with their arrival time (time.monotonic()) and saved with --record.
+
+    python utils/loopback_robot.py --arm G1_29 --ee dex3                     # then run the controllers with --sim
+    python utils/loopback_robot.py --arm G1_29 --network-interface lo --domain 0   # or with --network-interface lo
+"""
+
+
+class LoopbackDevice:
+    """
+    One simulated device: command topic(s) -> first order motors -> state topic.
+
+    cmd_field, state_field: name of the motor list in the command / state message ("motor_cmd", "cmds", ...).
+    state_msg: state message published at rate Hz, its motor list is updated in place.
+    """
+    def __init__(self, name, cmd_topics, cmd_type, cmd_field, state_topic, state_type, state_msg, state_field, num_motors,
+                 rate = 500.0, time_constant = 0.02, q0 = None, record_size = 0):
+        """
+        q0: initial motor positions, zeros by default.
+        record_size: number of commands kept for records(), 0 to not record.
+        """
+        self.name = name
+        self.num_motors = num_motors
+        self.cmd_field = cmd_field
+        self.state_field = state_field
+        self.state_msg = state_msg
+        self.time_constant = time_constant
+        self.q = np.zeros(num_motors) if q0 is None else np.array(q0, dtype=np.float64)
+        self.dq = np.zeros(num_motors)
+        self.q_target = self.q.copy()
+        self._lock = threading.Lock()
+        self._last_step = None
+
+        self._record_t = np.zeros(record_size)
+        self._record_q = np.zeros((record_size, num_motors))
+        self.recorded = 0
+
+        self.publisher = ChannelPublisher(state_topic, state_type)
+        self.publisher.Init()
+        self.subscriptions = [StateSubscription(topic, cmd_type, self._on_cmd) for topic in cmd_topics]
+        self.loop = RealtimeLoop(1.0 / rate, self._step, name = f"Loopback_{name}")
+
+    def _on_cmd(self, msg):
+        now = time.monotonic()
+        q_target = np.array([cmd.q for cmd in getattr(msg, self.cmd_field)[:self.num_motors]])
+        with self._lock:
+            self.q_target[:len(q_target)] = q_target
+            if self.recorded < len(self._record_t):
+                self._record_t[self.recorded] = now
+                self._record_q[self.recorded, :len(q_target)] = q_target
+                self.recorded += 1
+
+    def _step(self):
+        now = time.monotonic()
+        dt = 0.0 if self._last_step is None else now - self._last_step
+        self._last_step = now
+        with self._lock:
+            q_target = self.q_target.copy()
+        if dt > 0.0:
+            q = q_target + (self.q - q_target) * np.exp(-dt / self.time_constant)
+            self.dq = (q - self.q) / dt
+            self.q = q
+        for state, q_i, dq_i in zip(getattr(self.state_msg, self.state_field), self.q.tolist(), self.dq.tolist()):
+            state.q = q_i
+            state.dq = dq_i
+        if hasattr(self.state_msg, "tick"):
+            self.state_msg.tick = int(now * 1e3) & 0xFFFFFFFF
+        self.publisher.Write(self.state_msg)
+
+    def start(self):
+        self.loop.start()
+
+    def stop(self):
+        self.loop.stop()
+        for subscription in self.subscriptions:
+            subscription.close()
+
+    def records(self):
+        """Return the arrival times and commanded q of the recorded commands."""
+        with self._lock:
+            return self._record_t[:self.recorded].copy(), self._record_q[:self.recorded].copy()
+
+
+def _motor_states(num_motors):
+    msg = MotorStates_()
+    msg.states = [unitree_go_msg_dds__MotorState_() for _ in range(num_motors)]
+    return msg
+
+def create_devices(arm, ee, arm_rate = 500.0, hand_rate = 100.0, time_constant = 0.02, mode_machine = 5, record_size = 0):
+    """Return the LoopbackDevices standing in for the arm (one of G1_29, G1_23, H1_2, H1) and ee (dex1, dex3, inspire1, brainco or None)."""
+    devices = []
+    kwargs = dict(time_constant = time_constant, record_size = record_size)
+    if arm == "H1":
+        devices.append(LoopbackDevice("lowstate", ["rt/lowcmd"], go_LowCmd, "motor_cmd", "rt/lowstate", go_LowState,
+                                      unitree_go_msg_dds__LowState_(), "motor_state", 20, rate = arm_rate, **kwargs))
+    else:
+        lowstate = unitree_hg_msg_dds__LowState_()
+        lowstate.mode_machine = mode_machine
+        devices.append(LoopbackDevice("lowstate", ["rt/lowcmd", "rt/arm_sdk"], hg_LowCmd, "motor_cmd", "rt/lowstate", hg_LowState,
+                                      lowstate, "motor_state", 35, rate = arm_rate, **kwargs))
+
+    hand_kwargs = dict(rate = hand_rate, **kwargs)
+    if ee == "dex3":
+        for side in ("left", "right"):
+            devices.append(LoopbackDevice(f"dex3_{side}", [f"rt/dex3/{side}/cmd"], HandCmd_, "motor_cmd", f"rt/dex3/{side}/state",
+                                          HandState_, unitree_hg_msg_dds__HandState_(), "motor_state", 7, **hand_kwargs))
+    elif ee == "dex1":
+        for side in ("left", "right"):
+            devices.append(LoopbackDevice(f"dex1_{side}", [f"rt/dex1/{side}/cmd"], MotorCmds_, "cmds", f"rt/dex1/{side}/state",
+                                          MotorStates_, _motor_states(1), "states", 1, **hand_kwargs))
+    elif ee == "inspire1":
+        # normalized positions, 1.0 is open
+        devices.append(LoopbackDevice("inspire", ["rt/inspire/cmd"], MotorCmds_, "cmds", "rt/inspire/state",
+                                      MotorStates_, _motor_states(12), "states", 12, q0 = np.ones(12), **hand_kwargs))
+    elif ee == "brainco":
+        for side in ("left", "right"):
+            devices.append(LoopbackDevice(f"brainco_{side}", [f"rt/brainco/{side}/cmd"], MotorCmds_, "cmds", f"rt/brainco/{side}/state",
+                                          MotorStates_, _motor_states(6), "states", 6, **hand_kwargs))
+    return devices
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Publish simulated robot states and integrate the received commands.")
+    parser.add_argument('--arm', type=str, choices=['G1_29', 'G1_23', 'H1_2', 'H1'], default='G1_29', help='Simulated arm controller robot')
+    parser.add_argument('--ee', type=str, choices=['dex1', 'dex3', 'inspire1', 'brainco'], default=None, help='Simulated end effector')
+    parser.add_argument('--arm-rate', type=float, default=500.0, help='rt/lowstate publish rate (Hz)')
+    parser.add_argument('--hand-rate', type=float, default=100.0, help='End effector state publish rate (Hz)')
+    parser.add_argument('--time-constant', type=float, default=0.02, help='Time constant of the first order motor response (s)')
+    parser.add_argument('--domain', type=int, default=1, help='DDS domain, 1 is the one of the controllers in simulation mode')
+    parser.add_argument('--network-interface', type=str, default=None, help='DDS network interface, e.g. lo')
+    parser.add_argument('--record', type=str, default=None, help='Save the received commands to this .npz file on exit')
+    parser.add_argument('--record-size', type=int, default=500000, help='Maximum number of recorded commands per device')
+    parser.add_argument('--duration', type=float, default=None, help='Exit after this many seconds')
+    args = parser.parse_args()
+
+    if args.network_interface is None:
+        ChannelFactoryInitialize(args.domain)
+    else:
+        ChannelFactoryInitialize(args.domain, args.network_interface)
+    devices = create_devices(args.arm, args.ee, args.arm_rate, args.hand_rate, args.time_constant,
+                             record_size = args.record_size if args.record else 0)
+    for device in devices:
+        device.start()
+    logger_mp.info(f"[LoopbackRobot] Publishing {', '.join(device.name for device in devices)}")
+
+    start_time = time.monotonic()
+    try:
+        while args.duration is None or time.monotonic() - start_time < args.duration:
+            time.sleep(0.1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        logger_mp.info(f"[LoopbackRobot] Commands received: {subscription_metrics()}")
+        for device in devices:
+            device.stop()
+            logger_mp.info(f"[LoopbackRobot] {device.name} publish loop: {device.loop.stats()}")
+        if args.record:
+            records = {}
+            for device in devices:
+                records[f"{device.name}_t"], records[f"{device.name}_q"] = device.records()
+            np.savez(args.record, **records)
+            logger_mp.info(f"[LoopbackRobot] Saved the received commands to {args.record}")
@@ -0,0 +1,254 @@
+import threading
+import time
+from collections import deque
+import numpy as np
+
+"""
+Latency compensation of the XR wrist poses: each wrist pose (4x4 homogeneous matrix) is extrapolated along its
+estimated linear and angular velocity by the end-to-end latency, before it is given to the arm IK.
+
+- constant_velocity: velocities are exponential moving averages of the finite differences between samples.
+- kalman:            position is tracked by a constant velocity Kalman filter per axis, the angular velocity
+                     by a random walk Kalman filter, which adapts the smoothing to the sample rate.
+
+XR tracking may run slower than the loop calling predict(): a pose identical to the last one is a repeat of the same
+sample, not a new one with zero displacement, so it does not update the velocities, and the prediction extrapolates
+from the time of the last new sample.
+
+Every prediction is later compared with the pose actually measured at the predicted time, the errors (and those
+of not predicting at all) are kept for summary().
+"""
+
+PREDICTION_METHODS = ("constant_velocity", "kalman")
+
+
+def _so3_exp(rotvec):
+    angle = np.linalg.norm(rotvec)
+    if angle < 1e-9:
+        return np.eye(3)
+    axis = rotvec / angle
+    K = np.array([[0.0, -axis[2], axis[1]],
+                  [axis[2], 0.0, -axis[0]],
+                  [-axis[1], axis[0], 0.0]])
+    return np.eye(3) + np.sin(angle) * K + (1.0 - np.cos(angle)) * (K @ K)
+
+def _so3_log(R):
+    cos_angle = np.clip((np.trace(R) - 1.0) * 0.5, -1.0, 1.0)
+    angle = np.arccos(cos_angle)
+    axis = np.array([R[2, 1] - R[1, 2], R[0, 2] - R[2, 0], R[1, 0] - R[0, 1]])
+    if angle < 1e-6:
+        return 0.5 * axis
+    if np.pi - angle < 1e-4:
+        # near pi the antisymmetric part vanishes, take the axis from the symmetric part
+        i = np.argmax(np.diag(R))
+        axis = (R[:, i] + np.eye(3)[i]) / np.sqrt(2.0 * (1.0 + R[i, i]))
+        return angle * axis
+    return angle / (2.0 * np.sin(angle)) * axis
+
+def _limit_norm(vector, limit):
+    norm = np.linalg.norm(vector)
+    return vector * (limit / norm) if norm > limit else vector
+
+
+class SE3Predictor:
+    """Velocity estimate and extrapolation of one pose stream."""
+    def __init__(self, method = "constant_velocity", velocity_smoothing = 0.5, process_noise = 50.0,
+                 position_noise = 1e-4, angular_noise = 1.0, max_linear_speed = 3.0, max_angular_speed = 10.0):
+        """
+        velocity_smoothing: constant_velocity only, weight of the newest finite difference in the velocity average.
+        process_noise: kalman only, variance rate of the acceleration (position) / angular velocity random walk.
+        position_noise: kalman only, variance of the measured position (m^2).
+        angular_noise: kalman only, variance of the angular velocity finite difference ((rad/s)^2).
+        max_linear_speed, max_angular_speed: clamp of the velocities used for extrapolation (m/s, rad/s).
+        """
+        if method not in PREDICTION_METHODS:
+            raise ValueError(f"[SE3Predictor] method must be one of {PREDICTION_METHODS}, got {method}")
+        self.method = method
+        self.velocity_smoothing = velocity_smoothing
+        self.process_noise = process_noise
+        self.position_noise = position_noise
+        self.angular_noise = angular_noise
+        self.max_linear_speed = max_linear_speed
+        self.max_angular_speed = max_angular_speed
+        self.reset()
+
+    def reset(self):
+        self.pose = None
+        self.timestamp = None
+        self.position = np.zeros(3)
+        self.linear_velocity = np.zeros(3)
+        self.angular_velocity = np.zeros(3)
+        self._P = np.eye(2)          # covariance of [position, velocity], shared by the three axes
+        self._angular_P = 1.0
+
+    def update(self, pose, timestamp):
+        """Add the pose sampled at timestamp, return False if it repeats the last pose (and was ignored)."""
+        pose = np.asarray(pose, dtype=np.float64)
+        if self.pose is not None and np.array_equal(pose, self.pose):
+            return False
+        if self.pose is None or timestamp <= self.timestamp:
+            if self.pose is None:
+                self.position = pose[:3, 3].copy()
+            self.pose = pose
+            self.timestamp = timestamp
+            return True
+        dt = timestamp - self.timestamp
+        angular_velocity = _so3_log(pose[:3, :3] @ self.pose[:3, :3].T) / dt
+
+        if self.method == "constant_velocity":
+            linear_velocity = (pose[:3, 3] - self.pose[:3, 3]) / dt
+            self.position = pose[:3, 3].copy()
+            self.linear_velocity += self.velocity_smoothing * (linear_velocity - self.linear_velocity)
+            self.angular_velocity += self.velocity_smoothing * (angular_velocity - self.angular_velocity)
+        else:
+            F = np.array([[1.0, dt], [0.0, 1.0]])
+            Q = self.process_noise * np.array([[dt ** 3 / 3.0, dt ** 2 / 2.0], [dt ** 2 / 2.0, dt]])
+            position = self.position + self.linear_velocity * dt
+            P = F @ self._P @ F.T + Q
+            gain = P[:, 0] / (P[0, 0] + self.position_noise)
+            innovation = pose[:3, 3] - position
+            self.position = position + gain[0] * innovation
+            self.linear_velocity = self.linear_velocity + gain[1] * innovation
+            self._P = P - np.outer(gain, P[0, :])
+
+            angular_P = self._angular_P + self.process_noise * dt
+            angular_gain = angular_P / (angular_P + self.angular_noise)
+            self.angular_velocity += angular_gain * (angular_velocity - self.angular_velocity)
+            self._angular_P = (1.0 - angular_gain) * angular_P
+
+        self.pose = pose
+        self.timestamp = timestamp
+        return True
+
+    def predict(self, horizon):
+        """Return the pose extrapolated horizon seconds after the last update (the last pose before any update)."""
+        if self.pose is None:
+            return None
+        predicted = self.pose.copy()
+        predicted[:3, 3] = self.position + _limit_norm(self.linear_velocity, self.max_linear_speed) * horizon
+        rotvec = _limit_norm(self.angular_velocity, self.max_angular_speed) * horizon
+        predicted[:3, :3] = _so3_exp(rotvec) @ self.pose[:3, :3]
+        return predicted
+
+
+class LatencyEstimate:
+    """
+    Moving average of the latency measured from the pose sample to the arm command, shared by the thread that
+    measures it and the one that predicts with it.
+    """
+    def __init__(self, smoothing = 0.1):
+        """
+        smoothing: weight of a new measurement in the moving average.
+        """
+        self.smoothing = smoothing
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def value(self):
+        with self._lock:
+            return self._value
+
+    def update(self, latency):
+        with self._lock:
+            self._value += self.smoothing * (latency - self._value)
+
+
+class WristPosePredictor:
+    """
+    Predicts the left and right wrist poses latency seconds ahead, and measures the prediction error.
+
+    latency: end-to-end latency from the XR pose sample to the motors (s). predict() adds the part measured
+             at run time (e.g. the IK solve time), fed to measured_latency.update().
+    """
+    def __init__(self, method = "constant_velocity", latency = 0.05, max_horizon = 0.2, window_size = 1000, **kwargs):
+        """
+        max_horizon: upper bound of the prediction horizon (s).
+        window_size: number of prediction errors kept for summary().
+        kwargs: SE3Predictor arguments.
+        """
+        self.latency = latency
+        self.measured_latency = LatencyEstimate()
+        self.max_horizon = max_horizon
+        self.left = SE3Predictor(method, **kwargs)
+        self.right = SE3Predictor(method, **kwargs)
+        self._pending = deque()
+        self._window_size = window_size
+        self._errors = np.zeros((window_size, 4))  # translation, rotation, baseline translation, baseline rotation
+        self._index = 0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def predict(self, left_pose, right_pose, timestamp = None, extra_latency = None):
+        """
+        left_pose, right_pose: measured wrist poses, timestamp: their time.monotonic() sample time, defaults to now.
+        extra_latency: latency measured at run time, added to self.latency, defaults to measured_latency.value.
+        return: predicted left_pose, right_pose.
+        """
+        now = time.monotonic() if timestamp is None else timestamp
+        if extra_latency is None:
+            extra_latency = self.measured_latency.value
+        left_pose = np.asarray(left_pose, dtype=np.float64)
+        right_pose = np.asarray(right_pose, dtype=np.float64)
+        left_new = self.left.update(left_pose, now)
+        right_new = self.right.update(right_pose, now)
+        if not (left_new or right_new):
+            # repeated sample: same prediction target, extrapolated further from the time of the sample
+            return self._extrapolate(now, extra_latency)
+        self._score(left_pose, right_pose, now)
+        left_predicted, right_predicted = self._extrapolate(now, extra_latency)
+        horizon = min(max(self.latency + extra_latency, 0.0), self.max_horizon)
+        self._pending.append((now + horizon, left_predicted, right_predicted, left_pose, right_pose))
+        return left_predicted, right_predicted
+
+    def _extrapolate(self, now, extra_latency):
+        # each stream from the time of its last new sample
+        latency = max(self.latency + extra_latency, 0.0)
+        return (self.left.predict(min(now - self.left.timestamp + latency, self.max_horizon)),
+                self.right.predict(min(now - self.right.timestamp + latency, self.max_horizon)))
+
+    @staticmethod
+    def _pose_error(predicted, actual):
+        translation = np.linalg.norm(predicted[:3, 3] - actual[:3, 3])
+        rotation = np.linalg.norm(_so3_log(predicted[:3, :3].T @ actual[:3, :3]))
+        return translation, rotation
+
+    def _score(self, left_pose, right_pose, now):
+        # compare every prediction whose time has come with the pose measured now
+        while self._pending and self._pending[0][0] <= now:
+            _, left_predicted, right_predicted, left_sample, right_sample = self._pending.popleft()
+            for predicted, sample, actual in ((left_predicted, left_sample, left_pose), (right_predicted, right_sample, right_pose)):
+                with self._lock:
+                    self._errors[self._index, :2] = self._pose_error(predicted, actual)
+                    self._errors[self._index, 2:] = self._pose_error(sample, actual)
+                    self._index = (self._index + 1) % self._window_size
+                    self._count = min(self._count + 1, self._window_size)
+
+    def reset(self):
+        self.left.reset()
+        self.right.reset()
+        self._pending.clear()
+        with self._lock:
+            self._index = 0
+            self._count = 0
+
+    @staticmethod
+    def _percentiles(values, scale):
+        p50, p95 = np.percentile(values, [50, 95]) * scale
+        return {"p50": float(p50), "p95": float(p95), "max": float(np.max(values) * scale)}
+
+    def summary(self):
+        """
+        Return a JSON serializable dict with the predicted-vs-actual translation (mm) and rotation (deg) errors,
+        and the same errors without prediction (baseline) for comparison.
+        """
+        with self._lock:
+            errors = self._errors[:self._count].copy()
+        summary = {"latency_ms": self.latency * 1e3, "measured_latency_ms": self.measured_latency.value * 1e3, "samples": len(errors)}
+        if len(errors) == 0:
+            return summary
+        summary["translation_error_mm"] = self._percentiles(errors[:, 0], 1e3)
+        summary["rotation_error_deg"] = self._percentiles(errors[:, 1], 180.0 / np.pi)
+        summary["baseline_translation_error_mm"] = self._percentiles(errors[:, 2], 1e3)
+        summary["baseline_rotation_error_deg"] = self._percentiles(errors[:, 3], 180.0 / np.pi)
+        return summary
@@ -0,0 +1,154 @@
+import bisect
+import ctypes
+import ctypes.util
+import os
+import threading
+import time
+
+import logging_mp
+logger_mp = logging_mp.get_logger(__name__)
+
+_CLOCK_MONOTONIC = 1
+_TIMER_ABSTIME = 1
+
+class _timespec(ctypes.Structure):
+    _fields_ = [("tv_sec", ctypes.c_long), ("tv_nsec", ctypes.c_long)]
+
+def _load_clock_nanosleep():
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        clock_nanosleep = libc.clock_nanosleep
+    except (OSError, AttributeError, TypeError):
+        return None
+    clock_nanosleep.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.POINTER(_timespec), ctypes.POINTER(_timespec)]
+    clock_nanosleep.restype = ctypes.c_int
+    return clock_nanosleep
+
+# time.monotonic_ns() reads CLOCK_MONOTONIC on linux, so its deadlines can be passed to clock_nanosleep as they are
+_clock_nanosleep = _load_clock_nanosleep() if os.name == "posix" and os.uname().sysname == "Linux" else None
+
+def sleep_until(deadline_ns):
+    """Sleep until the absolute time.monotonic_ns() deadline_ns."""
+    if _clock_nanosleep is not None:
+        ts = _timespec(deadline_ns // 1000000000, deadline_ns % 1000000000)
+        while _clock_nanosleep(_CLOCK_MONOTONIC, _TIMER_ABSTIME, ctypes.byref(ts), None) == 4: # EINTR
+            pass
+    else:
+        delay_ns = deadline_ns - time.monotonic_ns()
+        if delay_ns > 0:
+            time.sleep(delay_ns * 1e-9)
+
+
+class RealtimeLoop:
+    """
+    Runs step() in a thread every period seconds, on absolute monotonic deadlines (clock_nanosleep with TIMER_ABSTIME
+    on linux), so the rate does not drift with the duration of step() or late wake-ups.
+
+    A cycle whose step() ends after the next deadline is counted as an overrun, and the schedule skips the missed
+    deadlines instead of running step() back to back to catch up. An exception raised by step() is counted as an error
+    (the first one is logged with its traceback) and does not stop the loop.
+    stats() reports the wake-up jitter (start of step() minus its deadline) and the step duration as histograms.
+    """
+    HISTOGRAM_EDGES_US = (10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+
+    def __init__(self, period, step, name = "RealtimeLoop", cpu = None, priority = None):
+        """
+        period: loop period in seconds.
+        step: callable run once per period.
+        cpu: pin the loop thread to this cpu core, None to keep the affinity of the process.
+        priority: SCHED_FIFO priority (1-99) of the loop thread, None to keep the default scheduler.
+                  Needs CAP_SYS_NICE (or root), a warning is logged and the loop runs normally otherwise.
+        """
+        self.period_ns = int(round(period * 1e9))
+        self.step = step
+        self.name = name
+        self.cpu = cpu
+        self.priority = priority
+        self._lock = threading.Lock()
+        self._running = False
+        self._thread = None
+        self.reset_stats()
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name=self.name)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self, timeout = 1.0):
+        self._running = False
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+
+    def reset_stats(self):
+        with self._lock:
+            self.cycles = 0
+            self.overruns = 0
+            self.errors = 0
+            self.max_jitter_us = 0.0
+            self.max_step_us = 0.0
+            self._jitter_counts = [0] * (len(self.HISTOGRAM_EDGES_US) + 1)
+            self._step_counts = [0] * (len(self.HISTOGRAM_EDGES_US) + 1)
+
+    def _setup_thread(self):
+        # pid 0 applies to the calling thread on linux
+        if self.cpu is not None:
+            try:
+                os.sched_setaffinity(0, {self.cpu})
+            except (OSError, AttributeError) as e:
+                logger_mp.warning(f"[{self.name}] Failed to pin the loop to cpu {self.cpu}: {e}")
+        if self.priority is not None:
+            try:
+                os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(self.priority))
+            except (OSError, AttributeError) as e:
+                logger_mp.warning(f"[{self.name}] Failed to set SCHED_FIFO priority {self.priority}: {e}")
+
+    def _run(self):
+        self._setup_thread()
+        period_ns = self.period_ns
+        deadline_ns = time.monotonic_ns()
+        while self._running:
+            start_ns = time.monotonic_ns()
+            try:
+                self.step()
+                error = False
+            except Exception:
+                error = True
+                if self.errors == 0:
+                    logger_mp.exception(f"[{self.name}] step() raised, the loop keeps running (further errors are only counted)")
+            end_ns = time.monotonic_ns()
+
+            jitter_us = (start_ns - deadline_ns) * 1e-3
+            step_us = (end_ns - start_ns) * 1e-3
+            deadline_ns += period_ns
+            overrun = end_ns > deadline_ns
+            if overrun:
+                deadline_ns += ((end_ns - deadline_ns) // period_ns + 1) * period_ns
+            with self._lock:
+                self.cycles += 1
+                self.overruns += overrun
+                self.errors += error
+                self.max_jitter_us = max(self.max_jitter_us, jitter_us)
+                self.max_step_us = max(self.max_step_us, step_us)
+                self._jitter_counts[bisect.bisect_right(self.HISTOGRAM_EDGES_US, jitter_us)] += 1
+                self._step_counts[bisect.bisect_right(self.HISTOGRAM_EDGES_US, step_us)] += 1
+
+            sleep_until(deadline_ns)
+
+    def _histogram(self, counts):
+        labels = [f"<{edge}us" for edge in self.HISTOGRAM_EDGES_US] + [f">={self.HISTOGRAM_EDGES_US[-1]}us"]
+        return dict(zip(labels, counts))
+
+    def stats(self):
+        """Return a JSON serializable dict with cycle, overrun and error counters and the jitter / step duration histograms."""
+        with self._lock:
+            return {
+                "period_ms": self.period_ns * 1e-6,
+                "cycles": self.cycles,
+                "overruns": self.overruns,
+                "errors": self.errors,
+                "max_jitter_us": self.max_jitter_us,
+                "max_step_us": self.max_step_us,
+                "jitter_us": self._histogram(self._jitter_counts),
+                "step_us": self._histogram(self._step_counts),
+            }
@@ -0,0 +1,199 @@
+import os
+import time
+import weakref
+import platform
+from multiprocessing import shared_memory, get_context
+import numpy as np
+
+"""
+Single producer frame channel over shared memory, for the hand skeletons, states and actions exchanged between the
+main loop, the DDS subscriber threads and the hand control processes.
+
+Memory layout: [seq (uint64), timestamp (float64), frame]. The producer makes seq odd, writes the frame and its
+timestamp, then makes seq even again (a seqlock): it never waits, and a consumer copies the whole frame with one numpy
+copy and retries if seq was odd or changed meanwhile, so neither side takes a cross-process lock. read() returns the
+frame number (seq / 2) and timestamp with the frame, which tells the consumer whether the frame is new or stale.
+
+    channel = ShmChannel((25, 3))                # producer, owns the shared memory
+    channel.write(hand_pos)                      # timestamp defaults to time.monotonic()
+    frame, seq, timestamp = channel.read()       # any process the channel was passed to (fork, spawn or pickle)
+
+A channel must have one producer only, two writers would break the sequence counter.
+
+The seqlock relies on the stores of the producer becoming visible to the consumers in program order, and on the loads
+of a consumer not being reordered, which x86 guarantees (total store order) and numpy has no fences to enforce. On
+other architectures (e.g. the aarch64 Jetson of the robot PC) the frame stores could become visible after the even
+seq, and a torn frame would pass the seq check, so there write() and read() hold a multiprocessing lock of the channel
+instead, whose acquire and release order the memory accesses.
+
+ShmChannelReader keeps the latest frame of a channel on the consumer side and tells whether its content changed,
+wait_for_frames() waits for a new frame on any of several channels.
+"""
+
+
+# total store order: stores are seen in program order and loads are not reordered with each other
+LOCK_FREE = platform.machine().lower() in ("x86_64", "amd64", "i386", "i686", "x86")
+
+
+def _unlink(shm, owner_pid):
+    # forked children inherit the channel object, only the creating process unlinks
+    if os.getpid() == owner_pid:
+        shm.unlink()
+
+
+class ShmChannel:
+    _HEADER_SIZE = 16
+
+    def __init__(self, shape, dtype = np.float64, name = None, lock = None):
+        """
+        shape, dtype: frame shape and dtype.
+        name: attach to the existing shared memory of this name, None to create it (this process then owns it and
+              unlinks it in close()).
+        lock: lock of the channel to attach to, required on the platforms that are not LOCK_FREE (it is passed along
+              when the channel is given to a process, attaching by name alone only works on LOCK_FREE platforms).
+        """
+        self.shape = (shape,) if isinstance(shape, int) else tuple(shape)
+        self.dtype = np.dtype(dtype)
+        size = self._HEADER_SIZE + int(np.prod(self.shape)) * self.dtype.itemsize
+        if name is None:
+            self._shm = shared_memory.SharedMemory(create = True, size = size)
+            # unlinked by close(), or at exit of the creating process if close() was not called
+            self._unlink = weakref.finalize(self, _unlink, self._shm, os.getpid())
+        else:
+            self._shm = shared_memory.SharedMemory(name = name)
+            self._unlink = None
+        if LOCK_FREE:
+            self._lock = None
+        elif name is None:
+            # a spawn context lock can also be passed to spawned processes, a fork context one only to forked ones
+            self._lock = get_context("spawn").Lock()
+        elif lock is None:
+            raise ValueError(f"[ShmChannel] {name}: attaching needs the lock of the channel on {platform.machine()}")
+        else:
+            self._lock = lock
+        self._seq = np.ndarray((1,), dtype = np.uint64, buffer = self._shm.buf, offset = 0)
+        self._timestamp = np.ndarray((1,), dtype = np.float64, buffer = self._shm.buf, offset = 8)
+        self._frame = np.ndarray(self.shape, dtype = self.dtype, buffer = self._shm.buf, offset = self._HEADER_SIZE)
+        if name is None:
+            self._seq[0] = 0
+            self._timestamp[0] = 0.0
+            self._frame[...] = 0
+
+    @property
+    def name(self):
+        return self._shm.name
+
+    def __reduce__(self):
+        # a pickled channel (e.g. Process args under spawn) attaches to the same shared memory
+        return (ShmChannel, (self.shape, self.dtype.str, self.name, self._lock))
+
+    @property
+    def seq(self):
+        """Number of the latest complete frame, 0 before the first write. Does not read the frame."""
+        return int(self._seq[0]) >> 1
+
+    def write(self, frame, timestamp = None):
+        """
+        Publish frame (anything broadcastable to shape), timestamp: its time.monotonic() time, defaults to now.
+        return: number of the published frame.
+        """
+        if self._lock is not None:
+            with self._lock:
+                return self._write(frame, timestamp)
+        return self._write(frame, timestamp)
+
+    def _write(self, frame, timestamp):
+        seq = int(self._seq[0])
+        self._seq[0] = seq + 1
+        self._frame[...] = frame
+        self._timestamp[0] = time.monotonic() if timestamp is None else timestamp
+        self._seq[0] = seq + 2
+        return (seq + 2) >> 1
+
+    def read(self, out = None, timeout = 1.0):
+        """
+        Copy the latest complete frame into out (a new array if None).
+        timeout: seconds to retry while the producer is writing, TimeoutError if it never finishes (died mid-write).
+        return: frame, frame number, timestamp.
+        """
+        if out is None:
+            out = np.empty(self.shape, dtype = self.dtype)
+        if self._lock is not None:
+            if not self._lock.acquire(timeout = timeout):
+                raise TimeoutError(f"[ShmChannel] {self.name}: lock not acquired within {timeout}s")
+            try:
+                out[...] = self._frame
+                return out, int(self._seq[0]) >> 1, float(self._timestamp[0])
+            finally:
+                self._lock.release()
+        deadline = None
+        while True:
+            seq = int(self._seq[0])
+            if not seq & 1:
+                out[...] = self._frame
+                timestamp = float(self._timestamp[0])
+                if int(self._seq[0]) == seq:
+                    return out, seq >> 1, timestamp
+            if deadline is None:
+                deadline = time.monotonic() + timeout
+            elif time.monotonic() > deadline:
+                raise TimeoutError(f"[ShmChannel] {self.name}: no complete frame within {timeout}s")
+            time.sleep(0)
+
+    def read_new(self, last_seq, out = None, timeout = 1.0):
+        """Same as read(), but return None without copying when the latest frame number is still last_seq."""
+        if self.seq == last_seq:
+            return None
+        return self.read(out, timeout)
+
+    def close(self):
+        """Detach from the shared memory, and unlink it if this process created it."""
+        if self._shm is None:
+            return
+        # the numpy views export the buffer, they must go before it can be closed
+        del self._seq, self._timestamp, self._frame
+        self._shm.close()
+        if self._unlink is not None:
+            self._unlink()
+        self._shm = None
+
+
+class ShmChannelReader:
+    """
+    Consumer side copy of the latest frame of a channel: poll() only copies a frame whose number changed, and reports a
+    change only if its content differs from the previous frame (producers may republish an unchanged input).
+    """
+    def __init__(self, channel):
+        self.channel = channel
+        self.seq = 0
+        self.timestamp = 0.0
+        self.frame = np.zeros(channel.shape, dtype = channel.dtype)
+        self._next = np.zeros(channel.shape, dtype = channel.dtype)
+
+    def has_new(self):
+        """Whether a frame newer than the last polled one was written (content not compared)."""
+        return self.channel.seq != self.seq
+
+    def poll(self):
+        """Read the latest frame into self.frame if it is new, return True if its content changed."""
+        if not self.has_new():
+            return False
+        _, self.seq, self.timestamp = self.channel.read(out = self._next)
+        if np.array_equal(self._next, self.frame):
+            return False
+        self.frame, self._next = self._next, self.frame
+        return True
+
+
+def wait_for_frames(readers, deadline, poll_interval = 0.001):
+    """
+    Wait until any of the readers has a new frame, or until the time.monotonic() deadline.
+    return: True if a new frame was written, False on deadline.
+    """
+    while True:
+        if any(reader.has_new() for reader in readers):
+            return True
+        remaining = deadline - time.monotonic()
+        if remaining <= 0.0:
+            return False
+        time.sleep(min(poll_interval, remaining))
@@ -8,11 +8,17 @@ Subscribe to rt/sim_state_cmd topic and write to shared memory
 import threading
 import time
 import json
+import os
+import sys
 from multiprocessing import shared_memory
 from typing import Any, Dict, Optional
-from unitree_sdk2py.core.channel import ChannelSubscriber, ChannelFactoryInitialize
+from unitree_sdk2py.core.channel import ChannelFactoryInitialize
 from unitree_sdk2py.idl.std_msgs.msg.dds_ import String_
 
+parent2_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(parent2_dir)
+from teleop.utils.dds_subscription import StateSubscription
+
 import logging_mp
 logger_mp = logging_mp.get_logger(__name__)
 
@@ -131,8 +137,7 @@ class SimStateSubscriber:
         self.shm_name = shm_name
         self.shm_size = shm_size
         self.running = False
-        self.subscriber = None
-        self.subscribe_thread = None
+        self.subscription = None
         self.shared_memory = None
         
         # initialize shared memory
@@ -155,39 +160,20 @@ class SimStateSubscriber:
             return
         
         try:
-            self.subscriber = ChannelSubscriber("rt/sim_state", String_)
-            self.subscriber.Init()
+            self.subscription = StateSubscription("rt/sim_state", String_, self._on_sim_state)
             self.running = True
 
-            self.subscribe_thread = threading.Thread(target=self._subscribe_sim_state, daemon=True)
-            self.subscribe_thread.start()
-
             logger_mp.info(f"[SimStateSubscriber] Started subscribing to rt/sim_state")
             
         except Exception as e:
             logger_mp.error(f"[SimStateSubscriber] Failed to start subscribing: {e}")
             self.running = False
 
-    def _subscribe_sim_state(self):
-        """Subscribe loop thread"""
-        logger_mp.debug(f"[SimStateSubscriber] Subscribe thread started")
-        
-        while self.running:
-            try:
-                if self.subscriber:
-                    msg = self.subscriber.Read()
-                    if msg:
-                        data = json.loads(msg.data)
-                    else:
-                        logger_mp.warning("[SimStateSubscriber] Received None message")
-                    if self.shared_memory and data:
-                        self.shared_memory.write_data(data)
-                else:
-                    logger_mp.error("[SimStateSubscriber] Subscriber is not initialized")
-                time.sleep(0.002)
-            except Exception as e:
-                logger_mp.error(f"[SimStateSubscriber] Error in subscribe loop: {e}")
-                time.sleep(0.01)
+    def _on_sim_state(self, msg):
+        """Write every received sim state into shared memory"""
+        data = json.loads(msg.data)
+        if self.shared_memory and data:
+            self.shared_memory.write_data(data)
 
     def stop_subscribe(self):
         """Stop subscribing"""
@@ -196,9 +182,9 @@ class SimStateSubscriber:
             return
 
         self.running = False
-        # wait for thread to finish
-        if self.subscribe_thread:
-            self.subscribe_thread.join(timeout=1.0)
+        if self.subscription:
+            self.subscription.close()
+            self.subscription = None
 
         if self.shared_memory:
             self.shared_memory.cleanup()
@@ -0,0 +1,139 @@
+import time
+import numpy as np
+import os
+import sys
+parent2_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(parent2_dir)
+
+from teleop.utils.weighted_moving_filter import WeightedMovingFilter
+
+"""
+Smoothing filters sharing the WeightedMovingFilter interface:
+
+    filter.add_data(new_data)    # new_data: [data_size]
+    filter.filtered_data         # [data_size]
+
+- weighted:          WeightedMovingFilter, fixed weights over the last len(weights) samples (fixed lag).
+- one_euro:          One-Euro filter, the cutoff frequency rises with speed: smooth when still, low lag when moving.
+- critically_damped: second order low pass (critically damped spring toward the input), no overshoot.
+- savgol:            causal Savitzky-Golay, least squares polynomial fit over the window evaluated at the newest sample.
+
+The time based filters (one_euro, critically_damped) use the wall clock between add_data calls,
+unless a timestamp is given.
+"""
+
+SMOOTHING_FILTERS = ("weighted", "one_euro", "critically_damped", "savgol")
+
+
+class OneEuroFilter:
+    def __init__(self, data_size, min_cutoff = 1.0, beta = 0.3, d_cutoff = 1.0):
+        """
+        min_cutoff: cutoff frequency (Hz) when the signal is still, lower means smoother.
+        beta: increase of the cutoff frequency per unit of speed, higher means less lag on fast motions.
+        d_cutoff: cutoff frequency (Hz) of the speed estimate.
+        """
+        self._data_size = data_size
+        self._min_cutoff = min_cutoff
+        self._beta = beta
+        self._d_cutoff = d_cutoff
+        self._filtered_data = np.zeros(self._data_size)
+        self._dx = np.zeros(self._data_size)
+        self._last_time = None
+
+    @staticmethod
+    def _alpha(cutoff, dt):
+        tau = 1.0 / (2.0 * np.pi * cutoff)
+        return 1.0 / (1.0 + tau / dt)
+
+    def add_data(self, new_data, timestamp = None):
+        assert len(new_data) == self._data_size
+        now = time.monotonic() if timestamp is None else timestamp
+        if self._last_time is None:
+            self._filtered_data = np.array(new_data, dtype=np.float64)
+            self._last_time = now
+            return
+        dt = now - self._last_time
+        if dt <= 0.0:
+            return
+        self._last_time = now
+
+        self._dx += self._alpha(self._d_cutoff, dt) * ((new_data - self._filtered_data) / dt - self._dx)
+        cutoff = self._min_cutoff + self._beta * np.abs(self._dx)
+        self._filtered_data = self._filtered_data + self._alpha(cutoff, dt) * (new_data - self._filtered_data)
+
+    @property
+    def filtered_data(self):
+        return self._filtered_data
+
+
+class CriticallyDampedFilter:
+    def __init__(self, data_size, frequency = 5.0):
+        """
+        frequency: natural frequency (Hz) of the critically damped spring pulling the output toward the input.
+        """
+        self._data_size = data_size
+        self._omega = 2.0 * np.pi * frequency
+        self._filtered_data = np.zeros(self._data_size)
+        self._velocity = np.zeros(self._data_size)
+        self._last_time = None
+
+    def add_data(self, new_data, timestamp = None):
+        assert len(new_data) == self._data_size
+        now = time.monotonic() if timestamp is None else timestamp
+        if self._last_time is None:
+            self._filtered_data = np.array(new_data, dtype=np.float64)
+            self._last_time = now
+            return
+        dt = now - self._last_time
+        if dt <= 0.0:
+            return
+        self._last_time = now
+
+        # exact solution over dt with the input held constant, stable for any dt
+        error = self._filtered_data - new_data
+        temp = (self._velocity + self._omega * error) * dt
+        decay = np.exp(-self._omega * dt)
+        self._filtered_data = new_data + (error + temp) * decay
+        self._velocity = (self._velocity - self._omega * temp) * decay
+
+    @property
+    def filtered_data(self):
+        return self._filtered_data
+
+
+class SavitzkyGolayFilter(WeightedMovingFilter):
+    def __init__(self, data_size, window_size = 7, poly_order = 2):
+        """
+        window_size: number of samples in the least squares fit.
+        poly_order: polynomial order of the fit, must be lower than window_size.
+        """
+        assert poly_order < window_size, "[SavitzkyGolayFilter] poly_order must be lower than window_size!"
+        # sample times -(window_size - 1) .. 0, newest first, the fit evaluated at t = 0 is a fixed weighting of the window
+        t = -np.arange(window_size, dtype=np.float64)
+        weights = np.linalg.pinv(np.vander(t, poly_order + 1, increasing=True))[0]
+        super().__init__(weights, data_size)
+
+
+def create_smoothing_filter(kind, data_size, **kwargs):
+    """
+    kind: one of SMOOTHING_FILTERS.
+    kwargs: constructor arguments of the filter, e.g. weights for "weighted", min_cutoff and beta for "one_euro".
+    """
+    if kind == "weighted":
+        return WeightedMovingFilter(kwargs.pop("weights", np.array([0.4, 0.3, 0.2, 0.1])), data_size, **kwargs)
+    if kind == "one_euro":
+        return OneEuroFilter(data_size, **kwargs)
+    if kind == "critically_damped":
+        return CriticallyDampedFilter(data_size, **kwargs)
+    if kind == "savgol":
+        return SavitzkyGolayFilter(data_size, **kwargs)
+    raise ValueError(f"[create_smoothing_filter] kind must be one of {SMOOTHING_FILTERS}, got {kind}")
+
+
+def parse_smoothing_params(text):
+    """Parse "key=value,key=value" (e.g. "min_cutoff=0.5,beta=0.1" or "window_size=9") into constructor arguments."""
+    params = {}
+    for item in filter(None, (item.strip() for item in (text or "").split(","))):
+        key, value = item.split("=")
+        params[key.strip()] = int(value) if value.strip().lstrip("-").isdigit() else float(value)
+    return params
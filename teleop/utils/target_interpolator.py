@@ -0,0 +1,180 @@
+import time
+import numpy as np
+
+"""
+Upsampling of low rate joint targets (e.g. 30 Hz IK solutions) to the control rate (250 Hz):
+
+    interpolator.set_target(q, dq = None)   # new target, reached one target period later
+    interpolator.sample()                   # commanded q at the current time
+
+Each new target starts a segment from the current commanded position and velocity, that ends at the target after the
+estimated target period (moving average of the intervals between set_target calls), so motion is continuous across
+targets at the cost of one target period of delay. A target arriving late (jitter of the target loop against the
+control loop) is covered by continuing with the end velocity for up to max_extrapolation periods, then the last
+position is held.
+
+- linear:   straight line to the target, continuous position only.
+- hermite:  cubic Hermite, continuous velocity. The end velocity is dq if given (e.g. IK velocities),
+            otherwise the finite difference of the last two targets.
+- min_jerk: quintic (minimum jerk) with the same end velocity and zero end acceleration, continuous acceleration.
+
+sample() limits the speed of the commanded q to max_velocity, scaling all joints together to keep the direction of
+motion, and its acceleration to max_acceleration per joint. With an acceleration limit, each joint approaches the
+interpolated q and the target no faster than it can still brake on them (speed <= sqrt(2 * max_acceleration *
+distance), plus the end velocity at the target), so a joint lagging behind a fast segment catches up without
+overshooting and ringing around the target.
+"""
+
+INTERPOLATION_METHODS = ("linear", "hermite", "min_jerk")
+
+
+class TargetInterpolator:
+    def __init__(self, data_size, method = "hermite", max_velocity = None, max_acceleration = None,
+                 default_period = 1.0 / 30.0, min_period = 0.004, max_period = 0.2, period_smoothing = 0.1,
+                 max_extrapolation = 0.5):
+        """
+        method: one of INTERPOLATION_METHODS.
+        max_velocity: joint speed limit (rad/s) of the commanded q, None for no limit.
+        max_acceleration: joint acceleration limit (rad/s^2) of the commanded q, None for no limit.
+        default_period: segment duration until the target period is measured.
+        min_period, max_period: bounds of the estimated target period.
+        period_smoothing: weight of the newest interval in the moving average of the target period.
+        max_extrapolation: time past the end of a segment, in target periods, during which the end velocity is kept.
+        """
+        if method not in INTERPOLATION_METHODS:
+            raise ValueError(f"[TargetInterpolator] method must be one of {INTERPOLATION_METHODS}, got {method}")
+        self._data_size = data_size
+        self.method = method
+        self.max_velocity = max_velocity
+        self.max_acceleration = max_acceleration
+        self.min_period = min_period
+        self.max_period = max_period
+        self.period_smoothing = period_smoothing
+        self.max_extrapolation = max_extrapolation
+        self.period = default_period
+        self.reset(np.zeros(data_size))
+
+    def reset(self, q, timestamp = None):
+        """Hold q from now on, forgetting the previous targets and motion."""
+        now = time.monotonic() if timestamp is None else timestamp
+        self._q = np.array(q, dtype=np.float64)
+        self._dq = np.zeros(self._data_size)
+        self._ddq = np.zeros(self._data_size)
+        self._last_sample_time = None
+        self._last_target = None
+        self._last_target_time = None
+        self._start_time = now
+        self._duration = self.period
+        self._coeffs = self._q[np.newaxis].copy()
+        self._end_q = self._q.copy()
+        self._end_m = np.zeros(self._data_size)
+        self._end_dq = np.zeros(self._data_size)
+
+    def set_target(self, q, dq = None, timestamp = None):
+        """
+        q: new target, dq: velocity at the target (optional, hermite and min_jerk only).
+        timestamp: time.monotonic() of the target, defaults to now.
+        """
+        now = time.monotonic() if timestamp is None else timestamp
+        q = np.asarray(q, dtype=np.float64)
+        if self._last_target_time is not None:
+            interval = now - self._last_target_time
+            if interval > 0.0:
+                self.period += self.period_smoothing * (min(max(interval, self.min_period), self.max_period) - self.period)
+
+        T = self.period
+        if dq is not None:
+            v1 = np.asarray(dq, dtype=np.float64)
+        elif self._last_target is not None and self.min_period <= now - self._last_target_time <= self.max_period:
+            # only regular intervals give a velocity, a burst or a pause between targets would give a wild one
+            v1 = (q - self._last_target) / (now - self._last_target_time)
+        else:
+            v1 = np.zeros(self._data_size)
+        self._last_target = q.copy()
+        self._last_target_time = now
+
+        # segment from the last commanded state, in normalized time s = (t - start) / T
+        start = now if self._last_sample_time is None else min(self._last_sample_time, now)
+        p0 = self._q
+        delta = q - p0
+        m0 = self._dq * T
+        m1 = v1 * T
+        if self.method == "linear":
+            m1 = delta
+            self._coeffs = np.stack([p0, delta])
+        elif self.method == "hermite":
+            self._coeffs = np.stack([p0, m0, 3.0 * delta - 2.0 * m0 - m1, -2.0 * delta + m0 + m1])
+        else:
+            a0 = self._ddq * T * T
+            self._coeffs = np.stack([p0, m0, 0.5 * a0,
+                                     10.0 * delta - 6.0 * m0 - 4.0 * m1 - 1.5 * a0,
+                                     -15.0 * delta + 8.0 * m0 + 7.0 * m1 + 1.5 * a0,
+                                     6.0 * delta - 3.0 * m0 - 3.0 * m1 - 0.5 * a0])
+        self._end_q = q
+        self._end_m = m1
+        self._end_dq = v1
+        self._start_time = start
+        self._duration = T
+
+    def _evaluate(self, t):
+        """Return the interpolated q and its velocity at t."""
+        s = (t - self._start_time) / self._duration
+        if s >= 1.0:
+            if s - 1.0 >= self.max_extrapolation:
+                return self._end_q + self._end_m * self.max_extrapolation, np.zeros(self._data_size)
+            return self._end_q + self._end_m * (s - 1.0), self._end_m / self._duration
+        s = max(s, 0.0)
+        q = self._coeffs[-1].copy()
+        dq = np.zeros(self._data_size)
+        for c in self._coeffs[-2::-1]:
+            dq *= s
+            dq += q
+            q *= s
+            q += c
+        return q, dq / self._duration
+
+    @staticmethod
+    def _limit(vector, limit):
+        if limit is None:
+            return vector
+        scale = np.max(np.abs(vector)) / limit
+        return vector / scale if scale > 1.0 else vector
+
+    def sample(self, timestamp = None):
+        """Return the commanded q at timestamp (time.monotonic(), defaults to now)."""
+        now = time.monotonic() if timestamp is None else timestamp
+        q, ref_dq = self._evaluate(now)
+        if self._last_sample_time is None or now <= self._last_sample_time:
+            self._last_sample_time = now
+            self._q = q
+            return q.copy()
+
+        dt = now - self._last_sample_time
+        error = q - self._q
+        dq = error / dt
+        if self.max_acceleration is not None:
+            # close the distance to q no faster than braking at max_acceleration (one step of a * dt per tick) can
+            # stop on it
+            a = self.max_acceleration
+            half_step = 0.5 * a * dt
+            closing = np.sqrt(half_step * half_step + 2.0 * a * np.abs(error)) - half_step
+            dq = np.clip(dq, ref_dq - closing, ref_dq + closing)
+            # approach the target no faster than braking can slow down to its end velocity there, and move away from
+            # it no faster than that end velocity: a segment started from a fast lagging command would otherwise swing
+            # past the target
+            to_target = self._end_q - self._q
+            direction = np.sign(to_target)
+            end_speed = self._end_dq * direction
+            approach = np.sqrt(half_step * half_step + np.square(np.maximum(end_speed, 0.0)) + 2.0 * a * np.abs(to_target)) - half_step
+            dq = np.where(direction == 0.0, dq, direction * np.clip(dq * direction, np.minimum(end_speed, 0.0), approach))
+        dq = self._limit(dq, self.max_velocity)
+        if self.max_acceleration is not None:
+            ddq = np.clip((dq - self._dq) / dt, -self.max_acceleration, self.max_acceleration)
+            dq = self._dq + ddq * dt
+        else:
+            ddq = (dq - self._dq) / dt
+        self._q = self._q + dq * dt
+        self._dq = dq
+        self._ddq = ddq
+        self._last_sample_time = now
+        return self._q.copy()
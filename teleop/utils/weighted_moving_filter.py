@@ -1,38 +1,62 @@
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
 import matplotlib.pyplot as plt
 
 
 class WeightedMovingFilter:
+    """
+    Causal weighted moving average, the newest sample is weighted by weights[0].
+
+    Samples are kept in a preallocated (window, data_size) ring buffer and every update is a single weighted dot product.
+    Until the window is full the filtered data is the newest sample, and a sample equal to the previous one is skipped.
+    """
     def __init__(self, weights, data_size = 14):
         self._window_size = len(weights)
         self._weights = np.array(weights)
         assert np.isclose(np.sum(self._weights), 1.0), "[WeightedMovingFilter] the sum of weights list must be 1.0!"
         self._data_size = data_size
         self._filtered_data = np.zeros(self._data_size)
-        self._data_queue = []
-
-    def _apply_filter(self):
-        if len(self._data_queue) < self._window_size:
-            return self._data_queue[-1]
-
-        data_array = np.array(self._data_queue)
-        temp_filtered_data = np.zeros(self._data_size)
-        for i in range(self._data_size):
-            temp_filtered_data[i] = np.convolve(data_array[:, i], self._weights, mode='valid')[-1]
-        
-        return temp_filtered_data
+        self._buffer = np.zeros((self._window_size, self._data_size))
+        self._head = -1   # row of the newest sample
+        self._count = 0
+        # _ring_weights[h] weights the buffer rows when the newest sample is in row h
+        self._ring_weights = np.array([np.roll(self._weights[::-1], h + 1) for h in range(self._window_size)])
 
     def add_data(self, new_data):
         assert len(new_data) == self._data_size
 
-        if len(self._data_queue) > 0 and np.array_equal(new_data, self._data_queue[-1]):
+        if self._count > 0 and np.array_equal(new_data, self._buffer[self._head]):
             return  # skip duplicate data
-        
-        if len(self._data_queue) >= self._window_size:
-            self._data_queue.pop(0)
 
-        self._data_queue.append(new_data)
-        self._filtered_data = self._apply_filter()
+        self._head = (self._head + 1) % self._window_size
+        self._buffer[self._head] = new_data
+        if self._count < self._window_size:
+            self._count += 1
+
+        if self._count < self._window_size:
+            self._filtered_data = self._buffer[self._head].copy()
+        else:
+            self._filtered_data = self._ring_weights[self._head] @ self._buffer
+
+    def apply(self, sequence):
+        """
+        Filter a whole [N, data_size] sequence offline, e.g. recorded actions, without touching the filter state.
+        The result equals the filtered_data of a fresh filter after each add_data call, duplicates included.
+        """
+        sequence = np.asarray(sequence, dtype=np.float64)
+        assert sequence.ndim == 2 and sequence.shape[1] == self._data_size
+        if len(sequence) == 0:
+            return sequence.copy()
+
+        keep = np.ones(len(sequence), dtype=bool)
+        keep[1:] = np.any(sequence[1:] != sequence[:-1], axis=1)
+        samples = sequence[keep]
+
+        filtered = samples.copy()
+        if len(samples) >= self._window_size:
+            windows = sliding_window_view(samples, self._window_size, axis=0)   # [M - window + 1, data_size, window], oldest first
+            filtered[self._window_size - 1:] = windows @ self._weights[::-1]
+        return filtered[np.cumsum(keep) - 1]
 
     @property
     def filtered_data(self):